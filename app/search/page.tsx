@@ -10,12 +10,16 @@ import { Button } from "@/components/ui/button"
 import { Badge } from "@/components/ui/badge"
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
 import { Search, Filter, User, Briefcase, Video, MessageSquare } from "lucide-react"
+import { apiClient } from "@/lib/api"
 
 interface SearchResult {
-  id: string
+  id: number
   type: "campaign" | "user" | "video-request" | "message"
+  rank: number
   title: string
   description: string
+  // Escaped by the API; the only markup is <mark> around matched terms
+  highlight: string
   metadata: Record<string, any>
 }
 
@@ -38,49 +42,8 @@ export default function SearchPage() {
 
     setLoading(true)
     try {
-      // Simulate API call
-      await new Promise((resolve) => setTimeout(resolve, 1000))
-
-      // Mock search results
-      const mockResults: SearchResult[] = [
-        {
-          id: "1",
-          type: "campaign",
-          title: "Summer Product Launch",
-          description: "Marketing campaign for new product line targeting millennials",
-          metadata: { client: "TechCorp Inc.", budget: "$5,000", status: "Active" },
-        },
-        {
-          id: "2",
-          type: "user",
-          title: "Sarah Johnson",
-          description: "Video producer specializing in corporate content",
-          metadata: { rating: 4.9, completedProjects: 45, location: "New York" },
-        },
-        {
-          id: "3",
-          type: "video-request",
-          title: "Product Demo Video",
-          description: "2-minute demonstration video for mobile app",
-          metadata: { budget: "$2,500", deadline: "2024-02-15", priority: "High" },
-        },
-        {
-          id: "4",
-          type: "campaign",
-          title: "Brand Awareness Campaign",
-          description: "Multi-platform brand awareness initiative",
-          metadata: { client: "Fashion Brand", budget: "$3,200", status: "In Review" },
-        },
-      ]
-
-      // Filter results based on search query
-      const filteredResults = mockResults.filter(
-        (result) =>
-          result.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          result.description.toLowerCase().includes(searchQuery.toLowerCase()),
-      )
-
-      setResults(filteredResults)
+      const response = await apiClient.search(searchQuery)
+      setResults(response.status === 200 ? response.data.results : [])
     } catch (error) {
       console.error("Search error:", error)
     } finally {
@@ -187,20 +150,23 @@ export default function SearchPage() {
               <TabsList>
                 <TabsTrigger value="all">All ({results.length})</TabsTrigger>
                 <TabsTrigger value="campaign">Campaigns ({counts.campaign || 0})</TabsTrigger>
-                <TabsTrigger value="user">Users ({counts.user || 0})</TabsTrigger>
                 <TabsTrigger value="video-request">Videos ({counts["video-request"] || 0})</TabsTrigger>
+                <TabsTrigger value="message">Messages ({counts.message || 0})</TabsTrigger>
               </TabsList>
 
               <TabsContent value={activeTab} className="space-y-4 mt-6">
                 {filteredResults.map((result) => (
-                  <Card key={result.id} className="hover:shadow-md transition-shadow cursor-pointer">
+                  <Card key={`${result.type}-${result.id}`} className="hover:shadow-md transition-shadow cursor-pointer">
                     <CardHeader>
                       <div className="flex items-start justify-between">
                         <div className="flex items-center space-x-3">
                           {getResultIcon(result.type)}
                           <div>
                             <CardTitle className="text-lg">{result.title}</CardTitle>
-                            <CardDescription className="mt-1">{result.description}</CardDescription>
+                            <CardDescription
+                              className="mt-1"
+                              dangerouslySetInnerHTML={{ __html: result.highlight || "" }}
+                            />
                           </div>
                         </div>
                         <Badge className={getTypeColor(result.type)}>{result.type.replace("-", " ")}</Badge>
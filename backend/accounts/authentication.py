@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# One-to-ones joined into the authentication query. Only the profile is cached
+# with the user: wallet balances and presence change too often to serve stale
+HYDRATED_RELATIONS = ('profile', 'wallet', 'online_status')
+CACHED_RELATIONS = ('profile',)
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that loads the user and its one-to-ones in one query
+
+    With AUTH_USER_CACHE_TIMEOUT > 0 the user and profile are served from the
+    cache, keyed by user id, for that many seconds. Saving a User or Profile
+    drops the entry (see accounts.signals). Suspended users are rejected.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 0)
+        user = cache.get(user_cache_key(user_id)) if timeout else None
+        if user is None:
+            user = self.load_user(user_id)
+            if timeout:
+                self.cache_user(user_id, user, timeout)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if user.is_suspended:
+            raise AuthenticationFailed(_('User is suspended'), code='user_suspended')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+    def load_user(self, user_id):
+        try:
+            return self.user_model.objects.select_related(*HYDRATED_RELATIONS).get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+    def cache_user(self, user_id, user, timeout):
+        fields_cache = user._state.fields_cache
+        user._state.fields_cache = {name: value for name, value in fields_cache.items() if name in CACHED_RELATIONS}
+        try:
+            cache.set(user_cache_key(user_id), user, timeout)
+        finally:
+            user._state.fields_cache = fields_cache
+
+class QueryTokenJWTAuthentication(CachedJWTAuthentication):
+    """Authenticate from a ``?token=<access token>`` query parameter
+
+    For media URLs loaded by <img> and <video> elements, which cannot set an
+    Authorization header (the websocket middleware does the same). Only views
+    that list it accept it.
+    """
+
+    def authenticate(self, request):
+        raw_token = request.query_params.get('token')
+        if not raw_token:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_user(validated_token), validated_token
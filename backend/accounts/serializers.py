@@ -1,14 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from files.serializers import ImageVariantsField
 from .models import Profile
 
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
+    avatar_variants = ImageVariantsField(source='avatar')
+    
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
-                 'user_type', 'avatar', 'bio', 'phone', 'is_verified', 'created_at']
+                 'user_type', 'avatar', 'avatar_variants', 'bio', 'phone', 'is_verified', 'created_at']
         read_only_fields = ['id', 'created_at', 'is_verified']
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import Rollup, RollupWatermark
+
+@admin.register(Rollup)
+class RollupAdmin(admin.ModelAdmin):
+    list_display = ('metric', 'granularity', 'bucket', 'user', 'dimension', 'count', 'amount')
+    list_filter = ('metric', 'granularity')
+    search_fields = ('user__username', 'dimension')
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('metric', 'processed_until', 'updated_at')
@@ -0,0 +1,44 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+
+User = get_user_model()
+
+class Rollup(models.Model):
+    """Pre-aggregated count and amount for one metric bucket
+
+    Rows with no user are platform-wide totals. Filled by the
+    ``rollup_analytics`` command from the raw tables.
+    """
+    GRANULARITIES = (
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    )
+    
+    metric = models.CharField(max_length=30)
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES)
+    bucket = models.DateTimeField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups')
+    dimension = models.CharField(max_length=60, blank=True)
+    count = models.PositiveBigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    
+    class Meta:
+        ordering = ['bucket']
+        indexes = [
+            models.Index(fields=['metric', 'granularity', 'user', 'bucket']),
+            models.Index(fields=['metric', 'bucket']),
+        ]
+    
+    def __str__(self):
+        scope = self.user_id or 'platform'
+        return f"{self.metric} {self.granularity} {self.bucket:%Y-%m-%d %H:00} ({scope})"
+
+class RollupWatermark(models.Model):
+    """How far each metric's source rows have been rolled up"""
+    metric = models.CharField(max_length=30, unique=True)
+    processed_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.metric} until {self.processed_until}"
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import CharField, Count, F, Sum, Value
+from django.db.models.functions import Concat, TruncDay, TruncHour
+from django.utils import timezone
+
+from campaigns.models import Campaign
+from video_requests.models import VideoRequest
+from wallet.models import Transaction
+
+from .models import Rollup, RollupWatermark
+
+# Rows committed slightly out of timestamp order are picked up by re-reading
+# this much before the watermark; recomputing a bucket is idempotent
+WATERMARK_LAG = timedelta(minutes=5)
+INSERT_BATCH_SIZE = 5000
+
+# Longest run of days recomputed in one pass (aggregated in memory and
+# replaced in one transaction), so a first run or rebuild stays bounded
+MAX_RANGE_DAYS = 31
+
+# Every metric buckets its source rows by created_at. ``changed`` lists the
+# timestamps that move when a row is inserted or updated, so buckets touched
+# since the watermark can be found and recomputed; each needs an index.
+METRICS = {
+    'transactions': {
+        'model': Transaction,
+        'user': 'wallet__user_id',
+        'dimension': Concat(
+            'transaction_type', Value(':'), 'category', Value(':'), 'status',
+            output_field=CharField(),
+        ),
+        'amount': 'amount',
+        'changed': ('created_at', 'processed_at'),
+    },
+    'campaigns': {
+        'model': Campaign,
+        'user': 'client_id',
+        'dimension': F('status'),
+        'amount': 'budget',
+        'changed': ('updated_at',),
+    },
+    'campaign_spend': {
+        'model': Campaign,
+        'user': 'client_id',
+        'dimension': F('campaign_type'),
+        'amount': 'spent_amount',
+        'changed': ('updated_at',),
+    },
+    'video_requests': {
+        'model': VideoRequest,
+        'user': 'client_id',
+        'dimension': F('status'),
+        'amount': 'budget',
+        'changed': ('updated_at',),
+    },
+}
+
+def _dirty_days(spec, since):
+    """UTC days whose buckets contain a row inserted or updated since ``since``
+
+    One query per ``changed`` field rather than an OR of them, so each can
+    use that field's index.
+    """
+    queryset = spec['model'].objects.order_by()
+    filters = [{}] if since is None else [{f'{field}__gte': since} for field in spec['changed']]
+    days = set()
+    for changed in filters:
+        days.update(queryset.filter(**changed).annotate(
+            day=TruncDay('created_at', tzinfo=dt_timezone.utc)
+        ).values_list('day', flat=True).distinct())
+    return sorted(days)
+
+def _ranges(days):
+    """Merge sorted days into contiguous [start, end) ranges of at most MAX_RANGE_DAYS"""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day and day - ranges[-1][0] < timedelta(days=MAX_RANGE_DAYS):
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return ranges
+
+def _rollups(metric, spec, start, end):
+    """Hourly and daily rows, per user and platform-wide, for one range of days"""
+    rows = spec['model'].objects.filter(created_at__gte=start, created_at__lt=end).annotate(
+        hour=TruncHour('created_at', tzinfo=dt_timezone.utc),
+        rollup_user=F(spec['user']),
+        rollup_dimension=spec['dimension'],
+    ).values('hour', 'rollup_user', 'rollup_dimension').annotate(
+        rollup_count=Count('pk'),
+        rollup_amount=Sum(spec['amount']),
+    ).order_by()
+
+    totals = defaultdict(lambda: [0, Decimal('0.00')])
+    for row in rows.iterator():
+        day = row['hour'].replace(hour=0)
+        for granularity, bucket in (('hour', row['hour']), ('day', day)):
+            for user_id in (row['rollup_user'], None):
+                key = (granularity, bucket, user_id, row['rollup_dimension'] or '')
+                totals[key][0] += row['rollup_count']
+                totals[key][1] += row['rollup_amount'] or 0
+
+    return [
+        Rollup(metric=metric, granularity=granularity, bucket=bucket, user_id=user_id,
+               dimension=dimension, count=count, amount=amount)
+        for (granularity, bucket, user_id, dimension), (count, amount) in totals.items()
+    ]
+
+def refresh_metric(metric, rebuild=False):
+    """Bring one metric's rollups up to date and return the number of days recomputed
+
+    Only days containing rows inserted or updated since the watermark are
+    recomputed, each from scratch, so updates such as a transaction settling
+    are reflected and reruns are harmless.
+    """
+    spec = METRICS[metric]
+    watermark, _ = RollupWatermark.objects.get_or_create(metric=metric)
+    started = timezone.now()
+    since = None if rebuild or watermark.processed_until is None else watermark.processed_until - WATERMARK_LAG
+
+    days = _dirty_days(spec, since)
+    ranges = _ranges(days)
+    for start, end in ranges:
+        rollups = _rollups(metric, spec, start, end)
+        with transaction.atomic():
+            Rollup.objects.filter(metric=metric, bucket__gte=start, bucket__lt=end).delete()
+            Rollup.objects.bulk_create(rollups, batch_size=INSERT_BATCH_SIZE)
+
+    if rebuild:
+        # Drop buckets whose source rows no longer exist at all, one gap
+        # between recomputed ranges at a time
+        stale = Rollup.objects.filter(metric=metric)
+        previous_end = None
+        for start, end in ranges:
+            gap = stale.filter(bucket__lt=start)
+            if previous_end is not None:
+                gap = gap.filter(bucket__gte=previous_end)
+            gap.delete()
+            previous_end = end
+        if previous_end is not None:
+            stale = stale.filter(bucket__gte=previous_end)
+        stale.delete()
+
+    watermark.processed_until = started
+    watermark.save(update_fields=['processed_until', 'updated_at'])
+    return len(days)
@@ -0,0 +1,76 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import Rollup
+from .rollups import METRICS
+
+DEFAULT_RANGE = {'hour': timedelta(days=7), 'day': timedelta(days=90)}
+MAX_RANGE = {'hour': timedelta(days=31), 'day': timedelta(days=366 * 5)}
+
+def _day_start(value):
+    return timezone.make_aware(datetime.combine(value, time.min), dt_timezone.utc)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def analytics(request):
+    """Time series from the analytics rollup tables
+
+    Query parameters: ``metric`` (repeatable), ``granularity`` (hour or day),
+    ``start``/``end`` dates (end inclusive), ``dimension`` and
+    ``scope=platform`` for staff.
+    """
+    metrics = request.query_params.getlist('metric') or list(METRICS)
+    unknown = [metric for metric in metrics if metric not in METRICS]
+    if unknown:
+        return Response({'error': f'Unknown metric: {", ".join(unknown)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    granularity = request.query_params.get('granularity', 'day')
+    if granularity not in DEFAULT_RANGE:
+        return Response({'error': 'Invalid granularity'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        end = parse_date(request.query_params['end']) if 'end' in request.query_params else timezone.now().date()
+        end = _day_start(end) + timedelta(days=1)
+        if 'start' in request.query_params:
+            start = _day_start(parse_date(request.query_params['start']))
+        else:
+            start = end - DEFAULT_RANGE[granularity]
+    except (TypeError, ValueError):
+        return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if start >= end or end - start > MAX_RANGE[granularity]:
+        return Response({'error': 'Invalid date range'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    scope = request.query_params.get('scope', 'user')
+    if scope == 'platform' and not request.user.is_staff:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    rollups = Rollup.objects.filter(
+        metric__in=metrics,
+        granularity=granularity,
+        bucket__gte=start,
+        bucket__lt=end,
+    )
+    if scope == 'platform':
+        rollups = rollups.filter(user__isnull=True)
+    else:
+        rollups = rollups.filter(user=request.user)
+    if 'dimension' in request.query_params:
+        rollups = rollups.filter(dimension=request.query_params['dimension'])
+    
+    series = {metric: [] for metric in metrics}
+    for row in rollups.order_by('bucket').values('metric', 'bucket', 'dimension', 'count', 'amount'):
+        series[row.pop('metric')].append(row)
+    
+    return Response({
+        'granularity': granularity,
+        'scope': scope,
+        'start': start,
+        'end': end,
+        'series': series,
+    })
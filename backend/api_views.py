@@ -1,16 +1,14 @@
-from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Count, Sum
 from django.contrib.auth import get_user_model
-from django.utils import timezone
 
-from campaigns.models import Campaign
-from messages.models import Conversation, OnlineStatus
-from wallet.models import Wallet, Transaction
-from video_requests.models import VideoRequest
-from notifications.models import Notification
+from wallet.models import Transaction
+from dashboard.stats import get_dashboard_stats
+from messages.presence import get_presence, heartbeat
+from search.users import find_users
+from files.images import variant_urls
 
 User = get_user_model()
 
@@ -18,97 +16,7 @@ User = get_user_model()
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     """Get comprehensive dashboard statistics"""
-    user = request.user
-    
-    # Base stats for all users
-    stats = {
-        'user_type': user.user_type,
-        'verification_status': user.verification_status,
-        'member_since': user.created_at,
-    }
-    
-    # Wallet stats
-    try:
-        wallet = user.wallet
-        stats['wallet'] = {
-            'balance': wallet.balance,
-            'pending_balance': wallet.pending_balance,
-            'total_earned': wallet.total_earned,
-            'total_withdrawn': wallet.total_withdrawn,
-        }
-    except:
-        stats['wallet'] = {
-            'balance': 0,
-            'pending_balance': 0,
-            'total_earned': 0,
-            'total_withdrawn': 0,
-        }
-    
-    # Messages stats
-    conversations = Conversation.objects.filter(participants=user)
-    unread_messages = 0
-    for conv in conversations:
-        unread_messages += conv.messages.exclude(sender=user).exclude(read_by__user=user).count()
-    
-    stats['messages'] = {
-        'total_conversations': conversations.count(),
-        'unread_messages': unread_messages,
-    }
-    
-    # Notifications
-    notifications = user.notifications.filter(is_read=False)
-    stats['notifications'] = {
-        'unread_count': notifications.count(),
-        'urgent_count': notifications.filter(priority='urgent').count(),
-    }
-    
-    # Role-specific stats
-    if user.user_type == 'client':
-        campaigns = Campaign.objects.filter(client=user)
-        video_requests = VideoRequest.objects.filter(client=user)
-        
-        stats['campaigns'] = {
-            'total': campaigns.count(),
-            'active': campaigns.filter(status='active').count(),
-            'completed': campaigns.filter(status='completed').count(),
-            'total_budget': campaigns.aggregate(Sum('budget'))['budget__sum'] or 0,
-            'total_spent': campaigns.aggregate(Sum('spent_amount'))['spent_amount__sum'] or 0,
-        }
-        
-        stats['video_requests'] = {
-            'total': video_requests.count(),
-            'pending': video_requests.filter(status='pending').count(),
-            'in_progress': video_requests.filter(status='in_progress').count(),
-            'completed': video_requests.filter(status='completed').count(),
-        }
-        
-    elif user.user_type == 'creator':
-        assigned_campaigns = Campaign.objects.filter(creator=user)
-        assigned_videos = VideoRequest.objects.filter(creator=user)
-        
-        stats['assigned_work'] = {
-            'campaigns': assigned_campaigns.count(),
-            'video_requests': assigned_videos.count(),
-            'active_campaigns': assigned_campaigns.filter(status='active').count(),
-            'pending_videos': assigned_videos.filter(status='pending').count(),
-        }
-        
-        # Earnings this month
-        current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_earnings = Transaction.objects.filter(
-            wallet__user=user,
-            transaction_type='credit',
-            status='completed',
-            created_at__gte=current_month
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        stats['earnings'] = {
-            'this_month': monthly_earnings,
-            'average_rating': user.profile.average_rating if hasattr(user, 'profile') else 0,
-            'total_projects': user.profile.total_projects if hasattr(user, 'profile') else 0,
-        }
-    
-    return Response(stats)
+    return Response(get_dashboard_stats(request.user))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -158,53 +66,50 @@ def recent_activity(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_online_status(request):
-    """Update user's online status"""
+    """Update user's online status (heartbeat)"""
     is_online = request.data.get('is_online', True)
-    
-    online_status, created = OnlineStatus.objects.get_or_create(
-        user=request.user,
-        defaults={'is_online': is_online}
-    )
-    
-    if not created:
-        online_status.is_online = is_online
-        online_status.save()
-    
+    heartbeat(request.user.id, is_online=is_online not in (False, 'false', 'False', '0', 0))
     return Response({'status': 'updated'})
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_presence(request):
+    """Online status for a list of users (?ids=1,2,3)"""
+    try:
+        user_ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk]
+    except ValueError:
+        return Response({'error': 'ids must be a comma-separated list of user ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(user_ids) > 500:
+        return Response({'error': 'At most 500 ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    presence = get_presence(user_ids)
+    return Response({str(user_id): value for user_id, value in presence.items()})
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search_users(request):
     """Search for users (for adding to conversations, etc.)"""
-    query = request.GET.get('q', '')
+    query = request.GET.get('q', '').strip()
     user_type = request.GET.get('type', '')
     limit = int(request.GET.get('limit', 10))
     
     if not query:
         return Response([])
     
-    users = User.objects.filter(
-        Q(username__icontains=query) |
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(email__icontains=query)
-    ).exclude(id=request.user.id)
-    
-    if user_type:
-        users = users.filter(user_type=user_type)
-    
-    users = users[:limit]
+    users = find_users(query, exclude=request.user, user_type=user_type, limit=min(limit, 50))
     
     results = []
     for user in users:
+        online_status = getattr(user, 'online_status', None)
         results.append({
             'id': user.id,
             'username': user.username,
             'full_name': user.full_name,
             'user_type': user.user_type,
             'avatar': user.avatar.url if user.avatar else None,
+            'avatar_variants': variant_urls(user.avatar),
             'is_verified': user.is_verified,
-            'is_online': hasattr(user, 'online_status') and user.online_status.is_online,
+            'is_online': online_status is not None and online_status.is_online,
         })
     
     return Response(results)
@@ -12,10 +12,24 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from channels.security.websocket import AllowedHostsOriginValidator
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# Initialize Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from accounts.middleware import JWTAuthMiddleware
+from messages.routing import websocket_urlpatterns as messages_websocket_urlpatterns
+from notifications.routing import websocket_urlpatterns as notifications_websocket_urlpatterns
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    # Add WebSocket routing here later
+    "http": django_asgi_app,
+    "websocket": AllowedHostsOriginValidator(
+        AuthMiddlewareStack(
+            JWTAuthMiddleware(URLRouter(
+                messages_websocket_urlpatterns + notifications_websocket_urlpatterns
+            ))
+        )
+    ),
 })
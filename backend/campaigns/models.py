@@ -36,6 +36,13 @@ class Campaign(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-role lists and stats filtered by status (see audit_indexes)
+            models.Index(fields=['client', 'status']),
+            models.Index(fields=['creator', 'status']),
+            # Incremental analytics rollups (see analytics.rollups)
+            models.Index(fields=['updated_at']),
+        ]
     
     def __str__(self):
         return self.title
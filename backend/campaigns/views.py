@@ -3,24 +3,40 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Count
+from dashboard.aggregates import InvalidGrouping, count_where, status_buckets, summarize, total
+from search.filters import FullTextSearchFilter
 from .models import Campaign, CampaignMilestone
 from .serializers import CampaignSerializer, CampaignListSerializer, CampaignMilestoneSerializer
 
+STATS_METRICS = {
+    'total_campaigns': Count('pk'),
+    'active_campaigns': count_where(status='active'),
+    'completed_campaigns': count_where(status='completed'),
+    'total_budget': total('budget'),
+    'total_spent': total('spent_amount'),
+    **status_buckets(Campaign.STATUS_CHOICES),
+}
+
 class CampaignViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'campaign_type', 'client']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'start_date', 'budget']
     ordering = ['-created_at']
     
+    # Checked by monitoring.tests (with a cold cache, so including the authentication query)
+    query_budgets = {'list': 3, 'retrieve': 3, 'stats': 2}
+    
     def get_queryset(self):
         user = self.request.user
+        campaigns = Campaign.objects.select_related('client', 'creator')
         if user.user_type == 'client':
-            return Campaign.objects.filter(client=user)
+            return campaigns.filter(client=user)
         elif user.user_type == 'creator':
-            return Campaign.objects.filter(creator=user)
-        return Campaign.objects.all()
+            return campaigns.filter(creator=user)
+        return campaigns
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -61,15 +77,22 @@ class CampaignViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        user = request.user
-        queryset = self.get_queryset()
-        
-        stats = {
-            'total_campaigns': queryset.count(),
-            'active_campaigns': queryset.filter(status='active').count(),
-            'completed_campaigns': queryset.filter(status='completed').count(),
-            'total_budget': sum(c.budget for c in queryset),
-            'total_spent': sum(c.spent_amount for c in queryset),
-        }
+        """Totals and per-status counts in one query
+
+        ``?group_by=campaign_type`` (or ``status``) and ``?period=month`` split
+        the figures into groups.
+        """
+        try:
+            stats = summarize(
+                self.get_queryset(),
+                STATS_METRICS,
+                group_by=request.query_params.getlist('group_by'),
+                allowed_groups=('campaign_type', 'status'),
+                period=request.query_params.get('period'),
+            )
+        except InvalidGrouping as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+        if isinstance(stats, list):
+            return Response({'groups': stats})
         return Response(stats)
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import UserCounters
+
+@admin.register(UserCounters)
+class UserCountersAdmin(admin.ModelAdmin):
+    list_display = ('user', 'unread_messages', 'total_conversations', 'campaigns_total', 'reconciled_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('reconciled_at', 'updated_at')
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+
+MONEY_FIELD = DecimalField(max_digits=14, decimal_places=2)
+PERIODS = ('day', 'week', 'month', 'year')
+
+class InvalidGrouping(ValueError):
+    pass
+
+def count_where(**filters):
+    return Count('pk', filter=Q(**filters))
+
+def total(field, **filters):
+    return Coalesce(
+        Sum(field, filter=Q(**filters) if filters else None),
+        Value(Decimal('0.00')),
+        output_field=MONEY_FIELD,
+    )
+
+def status_buckets(choices, field='status'):
+    """One conditional count per status choice, named ``<field>_<value>``"""
+    return {f'{field}_{value}': count_where(**{field: value}) for value, _ in choices}
+
+def summarize(queryset, metrics, group_by=(), allowed_groups=(), period=None, date_field='created_at'):
+    """Compute every metric in one conditional-aggregate query
+
+    ``metrics`` maps output names to aggregate expressions. Without grouping
+    the result is a single dict; with ``group_by`` fields (checked against
+    ``allowed_groups``) and/or a ``period`` truncation of ``date_field`` it is
+    a list of dicts, one per group, ordered by the group keys.
+    """
+    group_by = list(group_by)
+    for field in group_by:
+        if field not in allowed_groups:
+            raise InvalidGrouping(f'Cannot group by {field!r}')
+    if period is not None and period not in PERIODS:
+        raise InvalidGrouping(f'Unknown period {period!r}')
+
+    queryset = queryset.order_by()
+    if not group_by and period is None:
+        return queryset.aggregate(**metrics)
+
+    if period is not None:
+        queryset = queryset.annotate(period=Trunc(date_field, period))
+        group_by.insert(0, 'period')
+    return list(queryset.values(*group_by).annotate(**metrics).order_by(*group_by))
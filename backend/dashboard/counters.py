@@ -0,0 +1,80 @@
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UserCounters
+from .stats import COUNTER_FIELDS, COUNTER_GROUPS, compute_counters
+
+_pending = threading.local()
+
+def rebuild_counters(user_ids, fields=COUNTER_FIELDS):
+    """Recompute counters for the given users and upsert their rows
+
+    Returns the freshly computed values keyed by user id.
+    """
+    computed = compute_counters(user_ids, fields)
+    now = timezone.now()
+
+    existing = {c.user_id: c for c in UserCounters.objects.filter(user_id__in=computed)}
+    to_update, to_create = [], []
+    for user_id, values in computed.items():
+        counters = existing.get(user_id) or UserCounters(user_id=user_id)
+        for name, value in values.items():
+            setattr(counters, name, value)
+        counters.reconciled_at = now
+        (to_update if counters.pk else to_create).append(counters)
+
+    if to_update:
+        UserCounters.objects.bulk_update(to_update, [*fields, 'reconciled_at'])
+    if to_create:
+        UserCounters.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    return computed
+
+def refresh_counters(user_ids, groups):
+    """Recompute some counter groups for users that already have a counters row"""
+    fields = tuple(name for group in groups for name in COUNTER_GROUPS[group])
+    user_ids = list(UserCounters.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    if user_ids:
+        rebuild_counters(user_ids, fields)
+
+def schedule_refresh(user_ids, groups):
+    """Queue a refresh for when the current transaction commits
+
+    Cascading deletes and m2m changes fire one signal per row; batching them
+    per transaction turns thousands of recomputes into one.
+    """
+    user_ids = {pk for pk in user_ids if pk}
+    if not user_ids:
+        return
+
+    batch = getattr(_pending, 'batch', None)
+    if batch is None:
+        batch = _pending.batch = defaultdict(set)
+    for group in groups:
+        batch[group].update(user_ids)
+
+    transaction.on_commit(_flush_pending)
+
+def _flush_pending():
+    batch = getattr(_pending, 'batch', None)
+    _pending.batch = None
+    if not batch:
+        return
+
+    by_users = defaultdict(set)
+    for group, user_ids in batch.items():
+        by_users[frozenset(user_ids)].add(group)
+    for user_ids, groups in by_users.items():
+        refresh_counters(user_ids, groups)
+
+def increment(user_ids, **deltas):
+    """Apply F() deltas to the counters of the given users, never going below zero"""
+    queryset = UserCounters.objects.filter(user_id__in=user_ids)
+    for name, delta in deltas.items():
+        if delta < 0:
+            queryset = queryset.filter(**{f'{name}__gte': -delta})
+    return queryset.update(**{name: F(name) + delta for name, delta in deltas.items()})
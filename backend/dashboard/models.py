@@ -0,0 +1,43 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+
+User = get_user_model()
+
+class UserCounters(models.Model):
+    """Denormalized per-user dashboard figures, kept current by dashboard.signals"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='counters')
+    
+    # Messages
+    total_conversations = models.PositiveIntegerField(default=0)
+    unread_messages = models.PositiveIntegerField(default=0)
+    
+    # Campaigns (as client)
+    campaigns_total = models.PositiveIntegerField(default=0)
+    campaigns_active = models.PositiveIntegerField(default=0)
+    campaigns_completed = models.PositiveIntegerField(default=0)
+    campaigns_budget = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    campaigns_spent = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    
+    # Campaigns (as creator)
+    assigned_campaigns = models.PositiveIntegerField(default=0)
+    assigned_active_campaigns = models.PositiveIntegerField(default=0)
+    
+    # Video requests (as client)
+    video_requests_total = models.PositiveIntegerField(default=0)
+    video_requests_pending = models.PositiveIntegerField(default=0)
+    video_requests_in_progress = models.PositiveIntegerField(default=0)
+    video_requests_completed = models.PositiveIntegerField(default=0)
+    
+    # Video requests (as creator)
+    assigned_video_requests = models.PositiveIntegerField(default=0)
+    assigned_pending_videos = models.PositiveIntegerField(default=0)
+    
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'User Counters'
+    
+    def __str__(self):
+        return f"{self.user.username}'s Counters"
@@ -0,0 +1,79 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from campaigns.models import Campaign
+from messages.models import Conversation, Message, MessageRead, messages_read
+from video_requests.models import VideoRequest
+
+from .counters import increment, schedule_refresh
+from .stats import counters_enabled
+
+# Messages
+
+@receiver(post_save, sender=Message)
+def count_new_message(sender, instance, created, **kwargs):
+    if not created or not counters_enabled():
+        return
+    recipients = Conversation.participants.through.objects.filter(
+        conversation_id=instance.conversation_id
+    ).exclude(user_id=instance.sender_id).values('user_id')
+    increment(recipients, unread_messages=1)
+
+@receiver(post_save, sender=MessageRead)
+def count_message_read(sender, instance, created, **kwargs):
+    if not created or not counters_enabled():
+        return
+    if instance.message.sender_id != instance.user_id:
+        increment([instance.user_id], unread_messages=-1)
+
+@receiver(messages_read, sender=Conversation)
+def recount_bulk_read(sender, conversation, user, **kwargs):
+    if counters_enabled():
+        schedule_refresh([user.pk], ['messages'])
+
+@receiver(post_delete, sender=Message)
+def recount_deleted_message(sender, instance, **kwargs):
+    if not counters_enabled():
+        return
+    participants = Conversation.participants.through.objects.filter(
+        conversation_id=instance.conversation_id
+    ).values_list('user_id', flat=True)
+    schedule_refresh(participants, ['messages'])
+
+@receiver(post_delete, sender=MessageRead)
+def recount_deleted_read(sender, instance, **kwargs):
+    if counters_enabled():
+        schedule_refresh([instance.user_id], ['messages'])
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def recount_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if not counters_enabled():
+        return
+    if action in ('post_add', 'post_remove'):
+        user_ids = [instance.pk] if reverse else pk_set
+    elif action == 'pre_clear':
+        user_ids = [instance.pk] if reverse else instance.participants.values_list('pk', flat=True)
+    else:
+        return
+    schedule_refresh(user_ids, ['messages'])
+
+# Campaigns and video requests
+
+@receiver(post_init, sender=Campaign)
+@receiver(post_init, sender=VideoRequest)
+def remember_assignment(sender, instance, **kwargs):
+    instance._counters_creator_id = instance.__dict__.get('creator_id')
+
+@receiver(post_save, sender=Campaign)
+@receiver(post_delete, sender=Campaign)
+@receiver(post_save, sender=VideoRequest)
+@receiver(post_delete, sender=VideoRequest)
+def recount_assignments(sender, instance, **kwargs):
+    if not counters_enabled():
+        return
+    group = 'campaigns' if sender is Campaign else 'video_requests'
+    schedule_refresh(
+        [instance.client_id, instance.creator_id, getattr(instance, '_counters_creator_id', None)],
+        [group],
+    )
+    instance._counters_creator_id = instance.creator_id
@@ -0,0 +1,209 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import DecimalField, F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from campaigns.models import Campaign
+from messages.models import Conversation, Message
+from notifications.delivery import get_counts as get_notification_counts
+from video_requests.models import VideoRequest
+from wallet.models import Transaction
+
+User = get_user_model()
+
+# Counter fields grouped by the model whose changes invalidate them
+COUNTER_GROUPS = {
+    'messages': ('total_conversations', 'unread_messages'),
+    'campaigns': (
+        'campaigns_total', 'campaigns_active', 'campaigns_completed',
+        'campaigns_budget', 'campaigns_spent',
+        'assigned_campaigns', 'assigned_active_campaigns',
+    ),
+    'video_requests': (
+        'video_requests_total', 'video_requests_pending',
+        'video_requests_in_progress', 'video_requests_completed',
+        'assigned_video_requests', 'assigned_pending_videos',
+    ),
+}
+
+COUNTER_FIELDS = tuple(name for fields in COUNTER_GROUPS.values() for name in fields)
+
+BASE_FIELDS = COUNTER_GROUPS['messages']
+
+ROLE_FIELDS = {
+    'client': BASE_FIELDS + (
+        'campaigns_total', 'campaigns_active', 'campaigns_completed',
+        'campaigns_budget', 'campaigns_spent',
+        'video_requests_total', 'video_requests_pending',
+        'video_requests_in_progress', 'video_requests_completed',
+    ),
+    'creator': BASE_FIELDS + (
+        'assigned_campaigns', 'assigned_active_campaigns',
+        'assigned_video_requests', 'assigned_pending_videos',
+    ),
+}
+
+MONEY_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+def counters_enabled():
+    return getattr(settings, 'DASHBOARD_COUNTERS_ENABLED', False)
+
+def _count(queryset):
+    """Correlated COUNT(*) subquery over a queryset filtered on OuterRef('pk')"""
+    return Coalesce(
+        Subquery(queryset.order_by().annotate(value=Func(F('pk'), function='COUNT')).values('value')),
+        0,
+    )
+
+def _sum(queryset, field):
+    """Correlated SUM(field) subquery over a queryset filtered on OuterRef('pk')"""
+    return Coalesce(
+        Subquery(
+            queryset.order_by().annotate(
+                value=Func(F(field), function='SUM', output_field=MONEY_FIELD)
+            ).values('value'),
+            output_field=MONEY_FIELD,
+        ),
+        Value(Decimal('0.00')),
+        output_field=MONEY_FIELD,
+    )
+
+def counter_expression(name):
+    """Return the expression computing one counter for the outer User row"""
+    user = OuterRef('pk')
+    client_campaigns = Campaign.objects.filter(client=user)
+    creator_campaigns = Campaign.objects.filter(creator=user)
+    client_videos = VideoRequest.objects.filter(client=user)
+    creator_videos = VideoRequest.objects.filter(creator=user)
+
+    expressions = {
+        'total_conversations': lambda: _count(Conversation.objects.filter(participants=user)),
+        'unread_messages': lambda: _count(
+            Message.objects.filter(conversation__participants=user).unread_by(user)
+        ),
+        'campaigns_total': lambda: _count(client_campaigns),
+        'campaigns_active': lambda: _count(client_campaigns.filter(status='active')),
+        'campaigns_completed': lambda: _count(client_campaigns.filter(status='completed')),
+        'campaigns_budget': lambda: _sum(client_campaigns, 'budget'),
+        'campaigns_spent': lambda: _sum(client_campaigns, 'spent_amount'),
+        'assigned_campaigns': lambda: _count(creator_campaigns),
+        'assigned_active_campaigns': lambda: _count(creator_campaigns.filter(status='active')),
+        'video_requests_total': lambda: _count(client_videos),
+        'video_requests_pending': lambda: _count(client_videos.filter(status='pending')),
+        'video_requests_in_progress': lambda: _count(client_videos.filter(status='in_progress')),
+        'video_requests_completed': lambda: _count(client_videos.filter(status='completed')),
+        'assigned_video_requests': lambda: _count(creator_videos),
+        'assigned_pending_videos': lambda: _count(creator_videos.filter(status='pending')),
+    }
+    return expressions[name]()
+
+def _alias(name):
+    # Some counter names (e.g. assigned_campaigns) clash with User reverse relations
+    return f'stat_{name}'
+
+def compute_counters(user_ids, fields=COUNTER_FIELDS):
+    """Compute counters for many users in a single query, keyed by user id"""
+    rows = User.objects.filter(pk__in=user_ids).annotate(
+        **{_alias(name): counter_expression(name) for name in fields}
+    ).values_list('pk', *map(_alias, fields))
+    return {row[0]: dict(zip(fields, row[1:])) for row in rows}
+
+def get_dashboard_stats(user, use_counters=None):
+    """Build the dashboard payload for a user in a constant number of queries
+
+    Everything is read in one query: either from the denormalized UserCounters
+    row, or computed with correlated aggregate subqueries when counters are
+    disabled. A missing counters row is rebuilt on first read. Notification
+    badge counts come from the notification delivery cache.
+    """
+    if use_counters is None:
+        use_counters = counters_enabled()
+
+    fields = ROLE_FIELDS.get(user.user_type, BASE_FIELDS)
+    values = [
+        'wallet__balance', 'wallet__pending_balance',
+        'wallet__total_earned', 'wallet__total_withdrawn',
+    ]
+    queryset = User.objects.filter(pk=user.pk)
+
+    if user.user_type == 'creator':
+        current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        queryset = queryset.annotate(earnings_this_month=_sum(
+            Transaction.objects.filter(
+                wallet__user=OuterRef('pk'),
+                transaction_type='credit',
+                status='completed',
+                created_at__gte=current_month,
+            ),
+            'amount',
+        ))
+        values += ['earnings_this_month', 'profile__average_rating', 'profile__total_projects']
+
+    if use_counters:
+        queryset = queryset.annotate(
+            counters_pk=F('counters__pk'),
+            **{_alias(name): F(f'counters__{name}') for name in fields}
+        )
+        values.append('counters_pk')
+    else:
+        queryset = queryset.annotate(**{_alias(name): counter_expression(name) for name in fields})
+
+    row = queryset.values(*values, *map(_alias, fields)).get()
+    for name in fields:
+        row[name] = row.pop(_alias(name))
+
+    if use_counters and row['counters_pk'] is None:
+        from .counters import rebuild_counters
+        row.update(rebuild_counters([user.pk])[user.pk])
+
+    return _build_stats(user, row)
+
+def _build_stats(user, row):
+    stats = {
+        'user_type': user.user_type,
+        'verification_status': user.verification_status,
+        'member_since': user.created_at,
+        'wallet': {
+            'balance': row['wallet__balance'] or 0,
+            'pending_balance': row['wallet__pending_balance'] or 0,
+            'total_earned': row['wallet__total_earned'] or 0,
+            'total_withdrawn': row['wallet__total_withdrawn'] or 0,
+        },
+        'messages': {
+            'total_conversations': row['total_conversations'],
+            'unread_messages': row['unread_messages'],
+        },
+        'notifications': get_notification_counts(user.pk),
+    }
+
+    if user.user_type == 'client':
+        stats['campaigns'] = {
+            'total': row['campaigns_total'],
+            'active': row['campaigns_active'],
+            'completed': row['campaigns_completed'],
+            'total_budget': row['campaigns_budget'],
+            'total_spent': row['campaigns_spent'],
+        }
+        stats['video_requests'] = {
+            'total': row['video_requests_total'],
+            'pending': row['video_requests_pending'],
+            'in_progress': row['video_requests_in_progress'],
+            'completed': row['video_requests_completed'],
+        }
+    elif user.user_type == 'creator':
+        stats['assigned_work'] = {
+            'campaigns': row['assigned_campaigns'],
+            'video_requests': row['assigned_video_requests'],
+            'active_campaigns': row['assigned_active_campaigns'],
+            'pending_videos': row['assigned_pending_videos'],
+        }
+        stats['earnings'] = {
+            'this_month': row['earnings_this_month'],
+            'average_rating': row['profile__average_rating'] or 0,
+            'total_projects': row['profile__total_projects'] or 0,
+        }
+
+    return stats
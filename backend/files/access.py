@@ -0,0 +1,79 @@
+import posixpath
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from messages.models import Message
+from video_requests.models import VideoSubmission
+
+# upload_to directory -> the model and field that store files there
+FIELDS = {
+    'video_submissions': (VideoSubmission, 'video_file'),
+    'video_thumbnails': (VideoSubmission, 'thumbnail'),
+    'video_previews': (VideoSubmission, 'preview'),
+    'message_files': (Message, 'file_attachment'),
+    'avatars': (get_user_model(), 'avatar'),
+}
+
+# upload_to directory -> the field on the same model holding the uploaded file name
+ORIGINAL_NAME_FIELDS = {
+    'video_submissions': 'file_name',
+    'message_files': 'file_name',
+}
+
+def clean_name(name):
+    """The storage name for a URL path, or None if it tries to leave MEDIA_ROOT"""
+    name = posixpath.normpath(name or '')
+    if name.startswith(('/', '..')) or name == '.':
+        return None
+    return name
+
+def storage_for(name):
+    """The storage holding ``name``, from the field that owns its directory"""
+    model, field = FIELDS.get(name.split('/', 1)[0], (None, None))
+    if model is None:
+        return default_storage
+    return model._meta.get_field(field).storage
+
+def _readable_rows(user, directory, name):
+    """Rows of the model owning ``directory`` that store ``name`` and that ``user`` may see"""
+    model, field = FIELDS[directory]
+    rows = model._default_manager.filter(**{field: name})
+    if user.is_staff or directory == 'avatars':
+        return rows
+    if model is VideoSubmission:
+        return rows.filter(Q(creator=user) | Q(video_request__client=user) | Q(video_request__creator=user))
+    if model is Message:
+        return rows.filter(conversation__participants=user)
+    return rows.none()
+
+def can_read(user, name):
+    """Whether ``user`` may download the stored file ``name``
+
+    Submission media is visible to the submitter and to the client and
+    creator of its video request; message attachments to the conversation's
+    participants; avatars to every signed-in user. Anything else (such as
+    in-progress upload parts) is staff only.
+    """
+    if user.is_staff:
+        return True
+    directory = name.split('/', 1)[0]
+    if directory == 'avatars':
+        return True
+    if directory not in FIELDS:
+        return False
+    return _readable_rows(user, directory, name).exists()
+
+def download_name(user, name):
+    """The name ``name`` was uploaded as, for Content-Disposition, if it is known
+
+    Identical uploads share one stored name, so only rows ``user`` may see
+    are consulted; another user's choice of file name never leaks.
+    """
+    directory = name.split('/', 1)[0]
+    name_field = ORIGINAL_NAME_FIELDS.get(directory)
+    if name_field is None:
+        return None
+    return _readable_rows(user, directory, name).exclude(
+        **{name_field: ''}
+    ).order_by('-pk').values_list(name_field, flat=True).first()
@@ -0,0 +1,165 @@
+import mimetypes
+import os
+import time
+import uuid
+from functools import lru_cache
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+from .signing import signed_query
+
+# Older mimetypes tables lack WebP, and serving.serve picks the Content-Type from the name
+mimetypes.add_type('image/webp', '.webp')
+
+# Rendered variants live under MEDIA_ROOT, so MEDIA_SENDFILE can hand them off too
+VARIANT_DIR = '.variants'
+
+# Per upload_to directory: variant -> (width, height, crop). Cropped variants
+# fill the box (square avatars); the others fit inside it, keeping their shape
+VARIANTS = {
+    'avatars': {'small': (48, 48, True), 'medium': (128, 128, True), 'large': (256, 256, True)},
+    'video_thumbnails': {'small': (320, 180, False), 'medium': (640, 360, False)},
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# A variant's mtime is its place in the LRU order; refreshed on use at most this often
+TOUCH_INTERVAL = 3600
+
+# Eviction walks the whole cache, so it runs at most once per this many seconds
+EVICT_INTERVAL = 300
+
+class VariantError(Exception):
+    pass
+
+@lru_cache(maxsize=None)
+def variant_storage():
+    return FileSystemStorage()
+
+def variants_for(name):
+    return VARIANTS.get(name.split('/', 1)[0], {})
+
+def get_variant(name, variant, fmt, source_storage):
+    """Name in variant_storage() of one variant of the image ``name``, rendered on first use
+
+    Returns None if the source file is missing. Source names are never
+    reused for other content, so a cached variant never goes stale.
+    """
+    box = variants_for(name).get(variant)
+    if box is None:
+        raise VariantError(f'Unknown variant: {variant}')
+    if fmt not in FORMATS:
+        raise VariantError(f'Unknown format: {fmt}')
+
+    target = f'{VARIANT_DIR}/{name}/{variant}.{fmt}'
+    path = variant_storage().path(target)
+    try:
+        age = time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        try:
+            render(name, source_storage, box, fmt, path)
+        except FileNotFoundError:
+            return None
+        evict_if_due()
+    else:
+        if age > TOUCH_INTERVAL:
+            os.utime(path)
+    return target
+
+def render(name, source_storage, box, fmt, path):
+    width, height, crop = box
+    pil_format, options = FORMATS[fmt]
+    try:
+        with source_storage.open(name, 'rb') as fh, Image.open(fh) as image:
+            image = ImageOps.exif_transpose(image)
+            if crop:
+                image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                image.thumbnail((width, height), Image.LANCZOS)
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+            if has_alpha and pil_format == 'JPEG':
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+    except FileNotFoundError:
+        raise
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise VariantError('Not a readable image')
+
+    # Rendered beside the target and renamed, so concurrent requests never see half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    try:
+        image.save(tmp_path, pil_format, **options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def warm_variants(field_file):
+    """Render every variant of a stored image ahead of its first request"""
+    for variant in variants_for(field_file.name):
+        for fmt in FORMATS:
+            try:
+                get_variant(field_file.name, variant, fmt, field_file.storage)
+            except VariantError:
+                # Not an image Pillow can read; requests for it will say so
+                return
+
+def evict_variants(max_size):
+    """Delete the least recently used variants until the cache fits in ``max_size`` bytes
+
+    Returns the number of files removed.
+    """
+    files = []
+    for root, _, filenames in os.walk(variant_storage().path(VARIANT_DIR)):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+def evict_if_due():
+    if cache.add('files:variants:evicted', True, EVICT_INTERVAL):
+        evict_variants(getattr(settings, 'IMAGE_VARIANT_CACHE_SIZE', 1024 ** 3))
+
+def variant_urls(field_file, request=None):
+    """``{variant: {format: url}}`` for a stored image, or None when there is none
+
+    Variants are always served by files.views.media, so the URLs are built
+    and signed here, whatever the field's storage: srcset and <img> cannot
+    send credentials.
+    """
+    if not field_file or not variants_for(field_file.name):
+        return None
+    url = f'{settings.MEDIA_URL}{quote(field_file.name)}?{signed_query(field_file.name)}'
+    if request is not None:
+        url = request.build_absolute_uri(url)
+    return {
+        variant: {fmt: f'{url}&{urlencode({"variant": f"{variant}.{fmt}"})}' for fmt in FORMATS}
+        for variant in variants_for(field_file.name)
+    }
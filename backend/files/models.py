@@ -0,0 +1,18 @@
+from django.db import models
+
+class Blob(models.Model):
+    """A file in content-addressed storage and how many fields refer to it (see files.storage)"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When refcount last changed; garbage collection waits a grace period after it drops to zero
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
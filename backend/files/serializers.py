@@ -0,0 +1,9 @@
+from rest_framework import serializers
+
+from .images import variant_urls
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of an image field's resized variants as ``{variant: {format: url}}`` (see files.images)"""
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
@@ -0,0 +1,134 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Stored names are never reused, so clients may keep what they fetched
+CACHE_CONTROL = 'private, max-age=86400'
+
+# Types a browser may render inline. Anything else, e.g. an uploaded .html or
+# .svg, is sent as a download so it never runs script on the API origin
+INLINE_TYPES = ('image/', 'video/', 'audio/')
+ACTIVE_TYPES = ('image/svg+xml',)
+
+# Block size when streaming part of a file
+RANGE_BLOCK_SIZE = 64 * 1024
+
+class FileRange:
+    """At most ``length`` bytes of an open file, read from its current position"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+def parse_range(header, size):
+    """The inclusive (start, end) of a single ``bytes=`` range
+
+    Returns None when the whole file should be sent (no header, or one this
+    does not handle, such as multiple ranges) and raises ValueError when the
+    range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # A suffix range: the last ``end`` bytes
+        length = int(end)
+        if not length:
+            raise ValueError('Empty suffix range')
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+def serve(request, name, storage=default_storage, filename=None):
+    """Send a stored file the caller has already been authorized to read
+
+    With MEDIA_SENDFILE set the web server sends the file (and handles
+    ranges) itself; otherwise Django streams it, honouring a single Range and
+    conditional headers. Storage without local paths redirects to its own URL.
+    ``filename`` is what the browser saves the file as; it defaults to the
+    stored name, which for deduplicated uploads is a content hash.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        return HttpResponseRedirect(storage.url(name))
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = http_date(stat.st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    inline = content_type.startswith(INLINE_TYPES) and content_type not in ACTIVE_TYPES
+    backend = getattr(settings, 'MEDIA_SENDFILE', '')
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(name)
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = stream(request, path, stat.st_size, content_type, etag, last_modified)
+
+    response['Content-Disposition'] = content_disposition_header(not inline, filename or os.path.basename(name))
+    # Even a file that does render is sandboxed: no script, no same-origin access
+    response['Content-Security-Policy'] = 'sandbox'
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def stream(request, path, size, content_type, etag, last_modified):
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    byte_range = None
+    if not if_range or if_range in (etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        # The whole file goes through wsgi.file_wrapper, which lets the server sendfile() it
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), content_type=content_type, status=206)
+        response.block_size = RANGE_BLOCK_SIZE
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
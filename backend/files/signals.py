@@ -0,0 +1,16 @@
+from django.apps import apps
+from django.db.models.signals import post_delete
+
+from .storage import content_addressed_fields
+
+def release_files(sender, instance, **kwargs):
+    """Drop the references held by a deleted row (cascades included)"""
+    for field in content_addressed_fields(sender):
+        name = getattr(instance, field.attname)
+        if name:
+            field.storage.delete(str(name))
+
+def connect():
+    for model in apps.get_models():
+        if content_addressed_fields(model):
+            post_delete.connect(release_files, sender=model, dispatch_uid=f'files.release:{model._meta.label}')
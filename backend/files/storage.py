@@ -0,0 +1,226 @@
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FileField, Q
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+from .models import Blob
+from .signing import SignedURLMixin
+
+# Incomplete writes; same filesystem as the blobs so they can be renamed into place
+TMP_DIR = '.tmp'
+
+# <upload_to directory>/<first two hex digits>/<sha256><extension>
+BLOB_NAME_RE = re.compile(r'^(?P<directory>.+)/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(\.[^/]*)?$')
+
+class SignedFileSystemStorage(SignedURLMixin, FileSystemStorage):
+    """The default storage: MEDIA_ROOT, with signed URLs"""
+
+class ContentAddressedStorage(SignedURLMixin, FileSystemStorage):
+    """Stores each distinct file once, named by the SHA-256 of its content
+
+    Uploads are hashed while they stream to a temporary file, which is then
+    renamed into place, or dropped if that content is already stored. Names
+    keep the upload_to directory (``avatars/3f/3fa9...c1.png``), so access
+    rules by directory still apply and identical bytes are shared within a
+    directory.
+
+    Every save adds a reference in files.models.Blob and ``delete`` only
+    drops one; the gc_blobs command removes files once nothing refers to
+    them.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal content, so an existing file is never clobbered
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        tmp_name = os.path.join(TMP_DIR, uuid.uuid4().hex)
+        tmp_path = self.path(tmp_name)
+        os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            # O_EXCL with the default mode, so the umask applies as it does for FileSystemStorage
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    fh.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = f'{directory}/{hexdigest[:2]}/{hexdigest}{extension}'
+            # Take the reference before looking for the file: gc_blobs only removes
+            # files whose row it has locked at zero references
+            add_reference(name, size)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+    def delete(self, name):
+        if name:
+            release(name)
+
+    def purge(self, name):
+        """Remove the file itself; only for garbage collection"""
+        super().delete(name)
+
+def add_reference(name, size):
+    now = timezone.now()
+    if Blob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            Blob.objects.create(name=name, size=size, refcount=1, updated_at=now)
+    except IntegrityError:
+        Blob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=now)
+
+def release(name):
+    Blob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1, updated_at=timezone.now())
+
+@lru_cache(maxsize=None)
+def content_addressed_storage():
+    return ContentAddressedStorage()
+
+def upload_storage():
+    """Storage for user uploads: content-addressed unless DEDUPLICATE_UPLOADS is off"""
+    if getattr(settings, 'DEDUPLICATE_UPLOADS', True):
+        return content_addressed_storage()
+    return default_storage
+
+@deconstructible
+class KeepUploadName:
+    """An ``upload_to`` that also records the uploaded file name on the instance
+
+    Content-addressed names are hashes, so the name a user uploaded is kept
+    in ``name_field`` for the Content-Disposition of downloads. Every way of
+    saving a file (a form, ``FieldFile.save``) goes through ``upload_to``.
+    """
+
+    def __init__(self, directory, name_field='file_name'):
+        self.directory = directory
+        self.name_field = name_field
+
+    def __call__(self, instance, filename):
+        setattr(instance, self.name_field, os.path.basename(filename)[:255])
+        return posixpath.join(self.directory, filename)
+
+    def __eq__(self, other):
+        return isinstance(other, KeepUploadName) and (self.directory, self.name_field) == (other.directory, other.name_field)
+
+def content_addressed_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+def recount_references(dry_run=False):
+    """Set every Blob's refcount from the rows that use it; returns the number corrected
+
+    Covers what the counters cannot see: a file replaced on save, rows
+    removed by raw SQL or queryset updates, or a save whose transaction
+    rolled back after counting.
+    """
+    counts = {}
+    for model in apps.get_models():
+        for field in content_addressed_fields(model):
+            rows = model._base_manager.exclude(Q(**{field.attname: ''}) | Q(**{f'{field.attname}__isnull': True}))
+            rows = rows.values_list(field.attname).annotate(references=Count('pk')).order_by()
+            for name, references in rows.iterator():
+                if BLOB_NAME_RE.match(name):
+                    counts[name] = counts.get(name, 0) + references
+
+    now = timezone.now()
+    corrected = 0
+    # Changing a count restarts its grace period, so a save racing this is never collected
+    for pk, name, refcount in list(Blob.objects.values_list('pk', 'name', 'refcount').iterator()):
+        references = counts.pop(name, 0)
+        if references != refcount:
+            corrected += 1
+            if not dry_run:
+                Blob.objects.filter(pk=pk).update(refcount=references, updated_at=now)
+
+    storage = content_addressed_storage()
+    for name, references in counts.items():
+        if not storage.exists(name):
+            continue
+        corrected += 1
+        if not dry_run:
+            Blob.objects.get_or_create(name=name, defaults={
+                'size': storage.size(name), 'refcount': references, 'updated_at': now,
+            })
+    return corrected
+
+def collect_garbage(grace, dry_run=False):
+    """Remove blobs unreferenced for longer than ``grace``, then stray files older than it
+
+    Stray files are blobs with no row (their save rolled back) and abandoned
+    temporary files. Returns the number of files removed and bytes freed.
+    """
+    storage = content_addressed_storage()
+    cutoff = timezone.now() - grace
+    removed = freed = 0
+
+    candidates = Blob.objects.filter(refcount=0, updated_at__lt=cutoff)
+    for pk in list(candidates.values_list('pk', flat=True)):
+        with transaction.atomic():
+            # Re-checked under the row lock: a save takes its reference before reusing a file
+            blob = candidates.select_for_update().filter(pk=pk).first()
+            if blob is None:
+                continue
+            if not dry_run:
+                storage.purge(blob.name)
+                blob.delete()
+        removed += 1
+        freed += blob.size
+
+    directories = {TMP_DIR}
+    for model in apps.get_models():
+        for field in content_addressed_fields(model):
+            if isinstance(field.upload_to, str):
+                directories.add(field.upload_to.strip('/'))
+    for directory in sorted(directories):
+        for root, _, filenames in os.walk(storage.path(directory)):
+            names = {
+                os.path.relpath(os.path.join(root, filename), storage.location).replace(os.sep, '/'): filename
+                for filename in filenames
+            }
+            if directory != TMP_DIR:
+                names = {name: filename for name, filename in names.items() if BLOB_NAME_RE.match(name)}
+                known = set(Blob.objects.filter(name__in=list(names)).values_list('name', flat=True))
+                names = {name: filename for name, filename in names.items() if name not in known}
+            for name, filename in names.items():
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff.timestamp():
+                    continue
+                if not dry_run:
+                    os.remove(path)
+                removed += 1
+                freed += stat.st_size
+    return removed, freed
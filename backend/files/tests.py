@@ -0,0 +1,45 @@
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .images import variant_storage, variant_urls
+
+User = get_user_model()
+
+class SignedMediaTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        variant_storage.cache_clear()
+        self.addCleanup(variant_storage.cache_clear)
+        
+        self.user = User.objects.create_user(username='alice', password='password123')
+        image = io.BytesIO()
+        Image.new('RGB', (300, 200), 'red').save(image, 'PNG')
+        self.user.avatar.save('avatar.png', ContentFile(image.getvalue()))
+        # <img> and srcset requests carry no credentials
+        self.anonymous = APIClient()
+    
+    def test_signed_avatar_and_variant_urls_load_without_credentials(self):
+        response = self.anonymous.get(self.user.avatar.url, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        
+        url = variant_urls(self.user.avatar)['small']['webp']
+        response = self.anonymous.get(url, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+    
+    def test_unsigned_or_tampered_urls_need_credentials(self):
+        url = variant_urls(self.user.avatar)['small']['webp']
+        for bad in (url.split('?')[0], url.replace('signature=', 'signature=x'), url.replace('expires=', 'expires=9')):
+            response = self.anonymous.get(bad, HTTP_HOST='localhost')
+            self.assertEqual(response.status_code, 401)
@@ -0,0 +1,50 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from accounts.authentication import CachedJWTAuthentication, QueryTokenJWTAuthentication
+from .access import can_read, clean_name, download_name, storage_for
+from .images import VariantError, get_variant, variant_storage
+from .serving import serve
+from .signing import check_signature
+
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication, QueryTokenJWTAuthentication])
+@permission_classes([AllowAny])
+def media(request, name):
+    """A file under MEDIA_ROOT, if the user may see it
+
+    The signed URLs the API hands out (files.signing) need no other
+    credentials; without a valid signature the user must be signed in.
+    ``?variant=<name>.webp`` (or ``.jpeg``) serves a resized copy of an image
+    instead (see files.images); not ``format``, which DRF reserves. Files the user may not see are reported as
+    missing, so names do not leak.
+    """
+    name = clean_name(name)
+    signed = bool(name) and check_signature(
+        name, request.query_params.get('expires'), request.query_params.get('signature')
+    )
+    if not signed and not request.user.is_authenticated:
+        raise NotAuthenticated()
+    if not name or not (signed or can_read(request.user, name)):
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    storage = storage_for(name)
+    # The original file name is looked up among rows the user may see, so a
+    # signed download by an anonymous client keeps the stored name
+    filename = download_name(request.user, name) if request.user.is_authenticated else None
+    variant = request.query_params.get('variant')
+    if variant:
+        variant, _, fmt = variant.partition('.')
+        try:
+            name = get_variant(name, variant, fmt or 'webp', storage)
+        except VariantError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        storage, filename = variant_storage(), None
+
+    response = serve(request, name, storage, filename) if name else None
+    if response is None:
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+    return response
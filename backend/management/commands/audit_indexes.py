@@ -0,0 +1,256 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection, connections, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from campaigns.models import Campaign
+from messages.models import Conversation, Message, MessageRead
+from notifications.models import Notification
+from video_requests.models import VideoRequest
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import json
+import random
+import re
+import statistics
+import time
+
+User = get_user_model()
+
+# Composite indexes under audit: dropped for the "before" run, kept for "after"
+HOT_INDEXES = [
+    (Campaign, ['client', 'status']),
+    (Campaign, ['creator', 'status']),
+    (VideoRequest, ['client', 'status']),
+    (VideoRequest, ['creator', 'status']),
+    (Notification, ['recipient', 'is_read', '-created_at']),
+    (Notification, ['recipient', 'is_read', 'priority']),
+    (Message, ['conversation', 'created_at', 'id']),
+    (MessageRead, ['user', 'message']),
+]
+
+# Replayed once per synthetic client and creator; {conversation} is filled in
+SYNTHETIC_WORKLOAD = [
+    '/api/campaigns/',
+    '/api/campaigns/?status=active',
+    '/api/campaigns/stats/',
+    '/api/video-requests/',
+    '/api/video-requests/?status=pending',
+    '/api/video-requests/stats/',
+    '/api/notifications/',
+    '/api/notifications/unread_count/',
+    '/api/conversations/',
+    '/api/conversations/{conversation}/messages/',
+    '/api/dashboard/stats/',
+]
+
+class Command(BaseCommand):
+    help = 'Replay an API workload, EXPLAIN every query, flag sequential scans and time it with and without the hot indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workload', help='JSON file of [{"user": <id>, "path": "/api/..."}] to replay '
+                                               'instead of generating synthetic data')
+        parser.add_argument('--users', type=int, default=100,
+                            help='Synthetic clients and creators (each)')
+        parser.add_argument('--rows-per-user', type=int, default=50,
+                            help='Synthetic campaigns, video requests and notifications per user')
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Alias of a scratch copy of the database to audit')
+        parser.add_argument('--i-know', action='store_true',
+                            help='Run against the default database anyway')
+
+    def handle(self, *args, **options):
+        # The baseline run drops the hot indexes inside one long transaction;
+        # on PostgreSQL that holds ACCESS EXCLUSIVE locks on the busiest tables
+        # until the replay ends, so never do it to a live database by accident
+        alias = options['database']
+        if alias == DEFAULT_DB_ALIAS and not options['i_know']:
+            raise CommandError(
+                'audit_indexes drops indexes and locks the hot tables while it runs. Point --database '
+                'at a scratch copy, or pass --i-know to run against the default database.'
+            )
+        if alias not in connections:
+            raise CommandError(f'Unknown database alias: {alias}')
+
+        # The API views use the default connection, so the scratch copy stands in for it
+        default = connections[DEFAULT_DB_ALIAS]
+        connections[DEFAULT_DB_ALIAS] = connections[alias]
+        try:
+            self._audit(options)
+        finally:
+            connections[DEFAULT_DB_ALIAS] = default
+
+    def _audit(self, options):
+        # Everything, including the dropped indexes, is rolled back at the end
+        with transaction.atomic():
+            if options['workload']:
+                workload = self._load(options['workload'])
+            else:
+                started = time.perf_counter()
+                workload = self._synthesize(options['users'], options['rows_per_user'])
+                self.stdout.write(f'Generated synthetic data in {time.perf_counter() - started:.1f}s')
+
+            with transaction.atomic():
+                dropped = self._drop_hot_indexes()
+                self.stdout.write(f'Dropped {dropped} hot indexes for the baseline run')
+                before = self._replay(workload, options['iterations'])
+                transaction.set_rollback(True)
+            after = self._replay(workload, options['iterations'])
+
+            self._report(before, after)
+            transaction.set_rollback(True)
+
+    def _load(self, path):
+        with open(path) as f:
+            entries = json.load(f)
+        users = User.objects.in_bulk({entry['user'] for entry in entries})
+        try:
+            return [(users[entry['user']], entry['path']) for entry in entries]
+        except KeyError as e:
+            raise CommandError(f'Unknown user {e} in workload')
+
+    def _synthesize(self, count, rows_per_user):
+        tag = timezone.now().strftime('%H%M%S%f')
+        clients = User.objects.bulk_create([
+            User(username=f'audit_client_{tag}_{i}', user_type='client') for i in range(count)
+        ])
+        creators = User.objects.bulk_create([
+            User(username=f'audit_creator_{tag}_{i}', user_type='creator') for i in range(count)
+        ])
+        if clients[0].pk is None:
+            clients = list(User.objects.filter(username__startswith=f'audit_client_{tag}_'))
+            creators = list(User.objects.filter(username__startswith=f'audit_creator_{tag}_'))
+
+        today = timezone.now().date()
+        campaign_statuses = [value for value, _ in Campaign.STATUS_CHOICES]
+        video_statuses = [value for value, _ in VideoRequest.STATUS_CHOICES]
+        priorities = [value for value, _ in Notification.PRIORITY_CHOICES]
+        Campaign.objects.bulk_create([
+            Campaign(title='Audit campaign', description='', client=client, creator=random.choice(creators),
+                     status=random.choice(campaign_statuses), campaign_type='influencer',
+                     budget=Decimal('500.00'), start_date=today, end_date=today + timedelta(days=30))
+            for client in clients for _ in range(rows_per_user)
+        ], batch_size=5000)
+        VideoRequest.objects.bulk_create([
+            VideoRequest(title='Audit video', description='', client=client, creator=random.choice(creators),
+                         status=random.choice(video_statuses), budget=Decimal('200.00'),
+                         deadline=timezone.now() + timedelta(days=14))
+            for client in clients for _ in range(rows_per_user)
+        ], batch_size=5000)
+        Notification.objects.bulk_create([
+            Notification(recipient=user, notification_type='system', title='Audit', message='',
+                         priority=random.choice(priorities), is_read=random.random() < 0.7)
+            for user in clients + creators for _ in range(rows_per_user)
+        ], batch_size=5000)
+
+        conversations = {}
+        for client in clients:
+            conversation = Conversation.objects.create()
+            creator = random.choice(creators)
+            conversation.participants.add(client, creator)
+            conversations[client.pk] = conversations[creator.pk] = conversation
+            Message.objects.bulk_create([
+                Message(conversation=conversation, sender=random.choice((client, creator)), content='Audit message')
+                for _ in range(rows_per_user)
+            ])
+            conversation.mark_as_read(client)
+
+        workload = []
+        for user in (clients[0], creators[0]):
+            for path in SYNTHETIC_WORKLOAD:
+                conversation = conversations.get(user.pk)
+                if '{conversation}' in path and conversation is None:
+                    continue
+                workload.append((user, path.format(conversation=conversation.pk if conversation else '')))
+        return workload
+
+    def _drop_hot_indexes(self):
+        dropped = 0
+        with connection.cursor() as cursor:
+            for model, fields in HOT_INDEXES:
+                for index in model._meta.indexes:
+                    if index.fields == fields:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+                        dropped += 1
+        return dropped
+
+    def _replay(self, workload, iterations):
+        results = {}
+        for user, path in workload:
+            client = APIClient()
+            client.force_authenticate(user)
+            timings = []
+            # The debug query log is a bounded deque; a full one breaks capturing
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(path, HTTP_HOST='localhost')
+            if response.status_code != 200:
+                self.stderr.write(f'{path} as {user.username}: HTTP {response.status_code}')
+            for _ in range(iterations):
+                started = time.perf_counter()
+                client.get(path, HTTP_HOST='localhost')
+                timings.append((time.perf_counter() - started) * 1000)
+
+            scans = defaultdict(int)
+            tables = set(connection.introspection.table_names())
+            for query in captured.captured_queries:
+                for table in self._sequential_scans(query['sql']):
+                    # Ignore scans of subqueries and other derived tables
+                    if table in tables:
+                        scans[table] += 1
+            results[(user.user_type, path)] = {
+                'queries': len(captured.captured_queries),
+                'p50': statistics.median(timings),
+                'scans': dict(scans),
+            }
+        return results
+
+    def _sequential_scans(self, sql):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return []
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                details = [row[-1] for row in cursor.fetchall()]
+                return [
+                    detail.split()[1] for detail in details
+                    if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail
+                ]
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+                return re.findall(r'Seq Scan on (\w+)', '\n'.join(row[0] for row in cursor.fetchall()))
+        return []
+
+    def _report(self, before, after):
+        self.stdout.write('')
+        self.stdout.write(
+            f"{'role':<8} {'path':<44} {'queries':>7} {'before ms':>10} {'after ms':>10}  sequential scans (before -> after)"
+        )
+        flagged = 0
+        for key, result in after.items():
+            role, path = key
+            baseline = before[key]
+            scans_before = ', '.join(f'{t}x{n}' for t, n in sorted(baseline['scans'].items())) or '-'
+            scans_after = ', '.join(f'{t}x{n}' for t, n in sorted(result['scans'].items())) or '-'
+            flagged += bool(result['scans'])
+            self.stdout.write(
+                f"{role:<8} {path[:44]:<44} {result['queries']:>7} {baseline['p50']:>10.2f} {result['p50']:>10.2f}  "
+                f"{scans_before} -> {scans_after}"
+            )
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(f'{flagged} of {len(after)} requests still run sequential scans'))
+
+        # Only a drop in scans is evidence for the hot indexes; timings alone are noisy
+        scans_before = sum(sum(result['scans'].values()) for result in before.values())
+        scans_after = sum(sum(result['scans'].values()) for result in after.values())
+        if scans_before > scans_after:
+            self.stdout.write(f'The hot indexes removed {scans_before - scans_after} sequential scans')
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Without the hot indexes the workload ran {scans_before} sequential scans, with them '
+                f'{scans_after}: other indexes (such as the foreign key ones) already cover these queries, '
+                'so this run does not show that the hot indexes are needed'
+            ))
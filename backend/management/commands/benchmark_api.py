@@ -0,0 +1,249 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client
+from campaigns.models import Campaign
+from messages.models import Conversation
+from video_requests.models import VideoRequest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import json
+import math
+import random
+import subprocess
+import time
+
+User = get_user_model()
+
+# (name, method, path, weight, body); {placeholders} are filled per user, endpoints
+# whose placeholder the user has no object for are skipped for that user
+MIX = [
+    ('campaigns.list', 'GET', '/api/campaigns/', 10, None),
+    ('campaigns.detail', 'GET', '/api/campaigns/{campaign}/', 5, None),
+    ('campaigns.stats', 'GET', '/api/campaigns/stats/', 3, None),
+    ('video_requests.list', 'GET', '/api/video-requests/', 6, None),
+    ('video_requests.detail', 'GET', '/api/video-requests/{video_request}/', 3, None),
+    ('video_requests.stats', 'GET', '/api/video-requests/stats/', 2, None),
+    ('conversations.list', 'GET', '/api/conversations/', 10, None),
+    ('conversations.messages', 'GET', '/api/conversations/{conversation}/messages/', 15, None),
+    ('conversations.send_message', 'POST', '/api/conversations/{conversation}/send_message/', 4,
+     {'content': 'Benchmark message'}),
+    ('conversations.mark_as_read', 'POST', '/api/conversations/{conversation}/mark_as_read/', 2, {}),
+    ('wallet.balance', 'GET', '/api/wallet/balance/', 5, None),
+    ('transactions.list', 'GET', '/api/transactions/', 4, None),
+    ('notifications.list', 'GET', '/api/notifications/', 8, None),
+    ('notifications.unread_count', 'GET', '/api/notifications/unread_count/', 8, None),
+    ('dashboard.stats', 'GET', '/api/dashboard/stats/', 6, None),
+    ('dashboard.activity', 'GET', '/api/dashboard/activity/', 3, None),
+    ('users.online_status', 'POST', '/api/users/online-status/', 5, {'is_online': True}),
+    ('users.search', 'GET', '/api/users/search/?q={name}', 2, None),
+    ('search', 'GET', '/api/search/?q={term}', 3, None),
+]
+
+SEARCH_TERMS = ['video', 'campaign', 'launch', 'review', 'brand', 'product']
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+class Command(BaseCommand):
+    help = 'Drive a weighted request mix against the API as JWT-authenticated users and report latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='load',
+                            help='Username prefix of the synthetic users (see generate_load_data)')
+        parser.add_argument('--password', default='password123')
+        parser.add_argument('--users', type=int, default=20, help='Synthetic users to sample')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run this endpoint from the mix (repeatable)')
+        parser.add_argument('--read-only', action='store_true', help='Skip POST endpoints')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://localhost:8000; '
+                                          'runs in-process through the test client when omitted')
+        parser.add_argument('--concurrency', type=int, default=8, help='Worker threads for --url')
+        parser.add_argument('--host', default='localhost', help='Host header for the in-process client')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Print the change against a previous --output file')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        mix = [entry for entry in MIX if not options['endpoints'] or entry[0] in options['endpoints']]
+        if options['read_only']:
+            mix = [entry for entry in mix if entry[1] == 'GET']
+        if not mix:
+            raise CommandError('No endpoints left in the mix')
+
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}_").order_by('pk'))
+        if not users:
+            raise CommandError(f"No users prefixed \"{options['prefix']}_\"; run generate_load_data first")
+        users = rng.sample(users, min(options['users'], len(users)))
+
+        if options['url']:
+            send = self._http_sender(options['url'].rstrip('/'))
+        else:
+            send = self._client_sender(options['host'])
+
+        # Writes from the in-process run are rolled back; a live server keeps them
+        with nullcontext() if options['url'] else transaction.atomic():
+            sessions = [self._login(send, user, options['password']) for user in users]
+            plan = self._plan(rng, sessions, mix, options['requests'])
+
+            started = time.perf_counter()
+            if options['url']:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    samples = list(pool.map(lambda call: (call[0], send(*call[1:])), plan))
+            else:
+                samples = [(call[0], send(*call[1:])) for call in plan]
+            elapsed = time.perf_counter() - started
+            if not options['url']:
+                transaction.set_rollback(True)
+
+        results = self._summarize(samples, elapsed, options)
+        self._print(results)
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self._print_comparison(json.load(fh), results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    # Transport
+
+    def _client_sender(self, host):
+        client = Client(HTTP_HOST=host)
+
+        def send(method, path, token, body):
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+            started = time.perf_counter()
+            if method == 'GET':
+                response = client.get(path, **headers)
+            else:
+                response = client.post(path, json.dumps(body or {}), content_type='application/json', **headers)
+            latency = time.perf_counter() - started
+            # Set by monitoring.middleware.QueryMetricsMiddleware when metrics are enabled
+            return response.status_code, latency, getattr(response, 'query_count', None), response.content
+        return send
+
+    def _http_sender(self, base_url):
+        def send(method, path, token, body):
+            request = Request(
+                base_url + path,
+                data=json.dumps(body or {}).encode() if method != 'GET' else None,
+                method=method,
+                headers={'Content-Type': 'application/json',
+                         **({'Authorization': f'Bearer {token}'} if token else {})},
+            )
+            started = time.perf_counter()
+            try:
+                with urlopen(request) as response:
+                    status, content = response.status, response.read()
+            except HTTPError as error:
+                status, content = error.code, error.read()
+            return status, time.perf_counter() - started, None, content
+        return send
+
+    # Workload
+
+    def _login(self, send, user, password):
+        status, _, _, content = send('POST', '/api/auth/login/', None,
+                                     {'username': user.username, 'password': password})
+        if status != 200:
+            raise CommandError(f'Login failed for {user.username} ({status}); check --password')
+        # Objects the viewsets will show this user: clients see their own, creators their assignments
+        role = {'client': user} if user.user_type == 'client' else {'creator': user}
+        return {
+            'token': json.loads(content)['access'],
+            'campaign': Campaign.objects.filter(**role).values_list('pk', flat=True).first(),
+            'video_request': VideoRequest.objects.filter(**role).values_list('pk', flat=True).first(),
+            'conversation': Conversation.objects.filter(participants=user).values_list('pk', flat=True).first(),
+            'name': user.first_name[:3] or user.username[:3],
+        }
+
+    def _plan(self, rng, sessions, mix, count):
+        """Pick every request up front so both runners replay the same sequence"""
+        plan = []
+        weights = [entry[3] for entry in mix]
+        while len(plan) < count:
+            session = rng.choice(sessions)
+            name, method, path, _, body = rng.choices(mix, weights=weights)[0]
+            values = {**session, 'term': rng.choice(SEARCH_TERMS)}
+            if any(value is None and f'{{{key}}}' in path for key, value in values.items()):
+                continue
+            plan.append((name, method, path.format(**values), session['token'], body))
+        return plan
+
+    # Reporting
+
+    def _summarize(self, samples, elapsed, options):
+        by_endpoint = {}
+        for name, (status, latency, queries, _) in samples:
+            by_endpoint.setdefault(name, []).append((status, latency, queries))
+
+        endpoints = {}
+        for name, rows in sorted(by_endpoint.items()):
+            latencies = sorted(latency * 1000 for _, latency, _ in rows)
+            queries = [count for _, _, count in rows if count is not None]
+            endpoints[name] = {
+                'requests': len(rows),
+                'errors': sum(1 for status, _, _ in rows if status >= 400),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'queries_mean': round(sum(queries) / len(queries), 1) if queries else None,
+                'queries_max': max(queries) if queries else None,
+            }
+
+        return {
+            'commit': self._commit(),
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'runner': 'http' if options['url'] else 'in-process',
+            'users': options['users'],
+            'requests': len(samples),
+            'seconds': round(elapsed, 3),
+            'throughput': round(len(samples) / elapsed, 1) if elapsed else None,
+            'endpoints': endpoints,
+        }
+
+    def _commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _print(self, results):
+        self.stdout.write(f"{'endpoint':<30} {'reqs':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'queries':>8}")
+        for name, row in results['endpoints'].items():
+            queries = '-' if row['queries_mean'] is None else f"{row['queries_mean']:g}"
+            self.stdout.write(
+                f"{name:<30} {row['requests']:>6} {row['errors']:>6} {row['p50_ms']:>8.2f} "
+                f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {queries:>8}"
+            )
+        self.stdout.write(f"{results['requests']} requests in {results['seconds']:.2f}s "
+                          f"({results['throughput']} req/s, {results['runner']})")
+
+    def _print_comparison(self, baseline, results):
+        self.stdout.write(f"\nAgainst {baseline.get('commit') or 'baseline'}:")
+        self.stdout.write(f"{'endpoint':<30} {'p50 ms':>16} {'p95 ms':>16} {'queries':>12}")
+        for name, row in results['endpoints'].items():
+            old = baseline['endpoints'].get(name)
+            if old is None:
+                continue
+
+            def change(key, fmt):
+                if row[key] is None or old[key] is None:
+                    return '-'
+                return f'{old[key]:{fmt}} -> {row[key]:{fmt}}'
+
+            self.stdout.write(f"{name:<30} {change('p50_ms', '.1f'):>16} {change('p95_ms', '.1f'):>16} "
+                              f"{change('queries_mean', 'g'):>12}")
+        if baseline.get('throughput') and results['throughput']:
+            self.stdout.write(f"throughput {baseline['throughput']} -> {results['throughput']} req/s")
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from dashboard.stats import get_dashboard_stats
+from dashboard.counters import rebuild_counters
+from messages.models import Conversation, Message
+import statistics
+import time
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Benchmark dashboard_stats query count and latency as conversations grow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                            help='Conversation counts to measure')
+        parser.add_argument('--messages-per-conversation', type=int, default=3)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Everything is created inside a transaction that is rolled back
+        with transaction.atomic():
+            user = User.objects.create(username='bench_dashboard_user', user_type='client')
+            peer = User.objects.create(username='bench_dashboard_peer', user_type='creator')
+
+            self.stdout.write(f"{'conversations':>14} {'mode':>10} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+            created = 0
+            for size in sorted(options['sizes']):
+                self._grow(user, peer, size - created, options['messages_per_conversation'])
+                created = size
+                rebuild_counters([user.pk])
+
+                for mode, use_counters in (('aggregate', False), ('counters', True)):
+                    queries, timings = self._measure(user, use_counters, options['iterations'])
+                    self.stdout.write(
+                        f'{size:>14} {mode:>10} {queries:>8} '
+                        f'{statistics.median(timings):>8.2f} {max(timings):>8.2f}'
+                    )
+
+            transaction.set_rollback(True)
+
+    def _grow(self, user, peer, count, messages_per_conversation):
+        if count <= 0:
+            return
+        conversations = Conversation.objects.bulk_create(
+            [Conversation(created_by=user) for _ in range(count)]
+        )
+        if not conversations[0].pk:
+            conversations = list(Conversation.objects.filter(created_by=user).order_by('-pk')[:count])
+
+        Through = Conversation.participants.through
+        Through.objects.bulk_create(
+            [Through(conversation_id=c.pk, user_id=u.pk) for c in conversations for u in (user, peer)],
+            batch_size=1000,
+        )
+        Message.objects.bulk_create(
+            [
+                Message(conversation=c, sender=peer if i % 2 == 0 else user, content=f'Message {i}')
+                for c in conversations for i in range(messages_per_conversation)
+            ],
+            batch_size=1000,
+        )
+
+    def _measure(self, user, use_counters, iterations):
+        timings = []
+        reset_queries()
+        with CaptureQueriesContext(connection) as context:
+            get_dashboard_stats(user, use_counters=use_counters)
+        queries = len(context.captured_queries)
+
+        for _ in range(iterations):
+            started = time.perf_counter()
+            get_dashboard_stats(user, use_counters=use_counters)
+            timings.append((time.perf_counter() - started) * 1000)
+        return queries, timings
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from campaigns.models import Campaign
+from search.backends import get_backend
+from search.documents import index_objects, search
+from datetime import timedelta
+from decimal import Decimal
+import random
+import statistics
+import time
+
+User = get_user_model()
+
+WORDS = (
+    'launch brand video social product summer winter holiday tutorial review unboxing '
+    'influencer fitness travel food music gaming tech fashion beauty education finance '
+    'podcast livestream teaser trailer interview behind scenes story reel short campaign'
+).split()
+
+SYLLABLES = 'ka lo mi nu re sa ti vo xe zu ba de fi go hu'.split()
+
+class Command(BaseCommand):
+    help = 'Benchmark full-text campaign search against the icontains scan it replaces'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--queries', nargs='+', default=['fitness', 'holiday teaser', 'unbox'])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Backend: {type(get_backend()).__name__}')
+        # Everything is created inside a transaction that is rolled back
+        with transaction.atomic():
+            user = User.objects.create(username='bench_search_admin', user_type='admin')
+            started = time.perf_counter()
+            self._populate(user, options['rows'], options['batch_size'])
+            self.stdout.write(f"Indexed {options['rows']} campaigns in {time.perf_counter() - started:.1f}s")
+
+            self.stdout.write(f"{'query':>16} {'variant':>10} {'p50 ms':>10} {'max ms':>10}")
+            for query in options['queries']:
+                icontains = Q()
+                for term in query.split():
+                    icontains &= Q(title__icontains=term) | Q(description__icontains=term)
+                cases = (
+                    ('icontains', lambda: list(Campaign.objects.filter(icontains).order_by('-created_at')[:20])),
+                    ('fulltext', lambda: search(user, query, ['campaign'], 20)),
+                )
+                for name, run in cases:
+                    timings = self._measure(run, options['iterations'])
+                    self.stdout.write(
+                        f'{query:>16} {name:>10} {statistics.median(timings):>10.2f} {max(timings):>10.2f}'
+                    )
+
+            transaction.set_rollback(True)
+
+    def _text(self, words):
+        # Zipf-like vocabulary so common words are frequent and the query words are not
+        if not hasattr(self, '_vocabulary'):
+            filler = {''.join(random.choices(SYLLABLES, k=3)) for _ in range(5000)}
+            self._vocabulary = sorted(filler) + WORDS
+            self._weights = [1 / rank for rank in range(1, len(self._vocabulary) + 1)]
+        return ' '.join(random.choices(self._vocabulary, self._weights, k=words))
+
+    def _populate(self, client, rows, batch_size):
+        today = timezone.now().date()
+        for offset in range(0, rows, batch_size):
+            campaigns = Campaign.objects.bulk_create([
+                Campaign(
+                    title=self._text(4).title(),
+                    description=self._text(30),
+                    client=client,
+                    campaign_type='video_marketing',
+                    budget=Decimal('100.00'),
+                    start_date=today,
+                    end_date=today + timedelta(days=30),
+                )
+                for _ in range(min(batch_size, rows - offset))
+            ])
+            if campaigns[0].pk is None:
+                # Databases that can't return primary keys from bulk inserts
+                campaigns = Campaign.objects.filter(client=client).order_by('-pk')[:len(campaigns)]
+            index_objects('campaign', campaigns)
+
+    def _measure(self, run, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
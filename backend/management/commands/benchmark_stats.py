@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.db.models.functions import Mod
+from django.utils import timezone
+from campaigns.models import Campaign
+from campaigns.views import STATS_METRICS
+from dashboard.aggregates import summarize
+from datetime import timedelta
+from decimal import Decimal
+import random
+import statistics
+import time
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Benchmark campaign stats: Python-side sums versus one conditional aggregate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help='Do not time the old row-loading implementation')
+
+    def handle(self, *args, **options):
+        # Everything is created inside a transaction that is rolled back
+        with transaction.atomic():
+            client = User.objects.create(username='bench_stats_client', user_type='client')
+            started = time.perf_counter()
+            self._populate(client, options['rows'], options['batch_size'])
+            self.stdout.write(f"Inserted {options['rows']} campaigns in {time.perf_counter() - started:.1f}s")
+
+            # Fresh querysets per run so the legacy variant cannot reuse a result cache
+            queryset = Campaign.objects.all()
+            cases = [
+                ('aggregate', lambda: summarize(queryset.all(), STATS_METRICS)),
+                ('by type', lambda: summarize(queryset.all(), STATS_METRICS, ['campaign_type'], ['campaign_type'])),
+                ('by month', lambda: summarize(queryset.all(), STATS_METRICS, period='month')),
+            ]
+            if not options['skip_legacy']:
+                cases.insert(0, ('legacy', lambda: self._legacy(Campaign.objects.all())))
+
+            self.stdout.write(f"{'variant':>10} {'queries':>8} {'p50 ms':>10} {'max ms':>10}")
+            for name, run in cases:
+                queries, timings = self._measure(run, options['iterations'])
+                self.stdout.write(
+                    f'{name:>10} {queries:>8} {statistics.median(timings):>10.1f} {max(timings):>10.1f}'
+                )
+
+            transaction.set_rollback(True)
+
+    def _populate(self, client, rows, batch_size):
+        statuses = [value for value, _ in Campaign.STATUS_CHOICES]
+        types = [value for value, _ in Campaign.CAMPAIGN_TYPES]
+        today = timezone.now().date()
+        for offset in range(0, rows, batch_size):
+            Campaign.objects.bulk_create([
+                Campaign(
+                    title=f'Benchmark campaign {i}',
+                    description='',
+                    client=client,
+                    status=random.choice(statuses),
+                    campaign_type=random.choice(types),
+                    budget=Decimal(random.randint(100, 100_000)),
+                    spent_amount=Decimal(random.randint(0, 100)),
+                    start_date=today,
+                    end_date=today + timedelta(days=30),
+                )
+                for i in range(offset, min(offset + batch_size, rows))
+            ])
+        # auto_now_add stamps every row with the same time; spread them over two years
+        campaigns = Campaign.objects.filter(client=client).annotate(bucket=Mod('pk', 24))
+        for month in range(24):
+            campaigns.filter(bucket=month).update(created_at=timezone.now() - timedelta(days=30 * month))
+
+    def _legacy(self, queryset):
+        # The previous CampaignViewSet.stats implementation
+        return {
+            'total_campaigns': queryset.count(),
+            'active_campaigns': queryset.filter(status='active').count(),
+            'completed_campaigns': queryset.filter(status='completed').count(),
+            'total_budget': sum(c.budget for c in queryset),
+            'total_spent': sum(c.spent_amount for c in queryset),
+        }
+
+    def _measure(self, run, iterations):
+        timings = []
+        for _ in range(iterations):
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+        return len(captured), timings
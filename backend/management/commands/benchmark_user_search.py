@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from messages.models import OnlineStatus
+from search.users import find_users, prefix_index
+import random
+import statistics
+import string
+import time
+
+User = get_user_model()
+
+FIRST_NAMES = 'james mary john patricia robert jennifer michael linda david elizabeth sarah daniel'.split()
+LAST_NAMES = 'smith johnson williams brown jones garcia miller davis rodriguez martinez lee walker'.split()
+
+class Command(BaseCommand):
+    help = 'Benchmark ranked user search against the icontains OR it replaces'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--queries', nargs='+', default=['sarah', 'walk', 'jo', 'user_12345'])
+
+    def handle(self, *args, **options):
+        # Everything is created inside a transaction that is rolled back
+        with transaction.atomic():
+            started = time.perf_counter()
+            self._populate(options['users'], options['batch_size'])
+            self.stdout.write(f"Inserted {options['users']} users in {time.perf_counter() - started:.1f}s")
+            if connection.vendor != 'postgresql':
+                started = time.perf_counter()
+                prefix_index.lookup('')
+                self.stdout.write(f'Built the in-process prefix index in {time.perf_counter() - started:.1f}s')
+
+            self.stdout.write(f"{'query':>12} {'variant':>10} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+            for query in options['queries']:
+                cases = (
+                    ('icontains', lambda: self._legacy(query)),
+                    ('ranked', lambda: [u.online_status for u in find_users(query)]),
+                )
+                for name, run in cases:
+                    queries, timings = self._measure(run, options['iterations'])
+                    self.stdout.write(
+                        f'{query:>12} {name:>10} {queries:>8} '
+                        f'{statistics.median(timings):>8.2f} {max(timings):>8.2f}'
+                    )
+
+            transaction.set_rollback(True)
+
+    def _populate(self, count, batch_size):
+        for offset in range(0, count, batch_size):
+            users = User.objects.bulk_create([
+                User(
+                    username=f'user_{i}_{"".join(random.choices(string.ascii_lowercase, k=4))}',
+                    first_name=random.choice(FIRST_NAMES).title(),
+                    last_name=random.choice(LAST_NAMES).title(),
+                    email=f'user{i}@example.com',
+                    verification_status=random.choice(['verified', 'unverified']),
+                )
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+            if users[0].pk is None:
+                # Databases that can't return primary keys from bulk inserts
+                users = User.objects.order_by('-pk')[:len(users)]
+            OnlineStatus.objects.bulk_create([
+                OnlineStatus(user=user, is_online=random.random() < 0.05) for user in users
+            ])
+
+    def _legacy(self, query):
+        # The previous search_users implementation, including its per-row online status query
+        users = User.objects.filter(
+            Q(username__icontains=query) |
+            Q(first_name__icontains=query) |
+            Q(last_name__icontains=query) |
+            Q(email__icontains=query)
+        )[:10]
+        return [hasattr(user, 'online_status') and user.online_status.is_online for user in users]
+
+    def _measure(self, run, iterations):
+        timings = []
+        for _ in range(iterations):
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+        return len(captured), timings
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from video_requests.uploads import expire_uploads
+import time
+
+class Command(BaseCommand):
+    help = 'Delete the stored parts of chunked video uploads that expired unfinished'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        expired = expire_uploads(options['batch_size'])
+        self.stdout.write(f'Expired {expired} uploads in {time.perf_counter() - started:.1f}s')
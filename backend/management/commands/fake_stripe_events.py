@@ -0,0 +1,163 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from wallet.ledger import account_balance, create_pending_credit
+from wallet.models import Wallet, StripeEvent
+from wallet.webhooks import process_events
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.request import Request, urlopen
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import time
+import uuid
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Fire signed fake Stripe payment events at the webhook and measure its latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--wallets', type=int, default=10,
+                            help='Spread the payments over this many fresh wallets')
+        parser.add_argument('--amount', type=Decimal, default=Decimal('25.00'))
+        parser.add_argument('--failure-rate', type=float, default=0.1,
+                            help='Share of payments that fail instead of succeeding')
+        parser.add_argument('--duplicates', type=float, default=0.05,
+                            help='Share of events delivered twice, as Stripe does on retries')
+        parser.add_argument('--url', help='Post to a running server instead of in-process, '
+                                          'e.g. http://localhost:8000/api/webhooks/stripe/')
+        parser.add_argument('--secret', help='Signing secret; defaults to STRIPE_WEBHOOK_SECRET')
+        parser.add_argument('--settle', action='store_true',
+                            help='Drain the inbox afterwards and verify the resulting balances')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated users and events')
+
+    def handle(self, *args, **options):
+        secret = options['secret'] or settings.STRIPE_WEBHOOK_SECRET or 'whsec_fake'
+        tag = uuid.uuid4().hex[:8]
+        users = [
+            User.objects.create(username=f'fake_stripe_{tag}_{i}')
+            for i in range(options['wallets'])
+        ]
+
+        # Pending credits as add_funds would record them, then one event each
+        events, expected = [], {user.pk: Decimal('0.00') for user in users}
+        for i in range(options['events']):
+            user = random.choice(users)
+            intent_id = f'pi_fake_{tag}_{i}'
+            create_pending_credit(user, options['amount'], 'Add funds via Stripe',
+                                  reference=f'stripe_{intent_id}', stripe_payment_intent_id=intent_id)
+            succeeded = random.random() >= options['failure_rate']
+            if succeeded:
+                expected[user.pk] += options['amount']
+            events.append(self._event(intent_id, succeeded, options['amount']))
+        events += random.sample(events, int(len(events) * options['duplicates']))
+        random.shuffle(events)
+
+        with override_settings(STRIPE_WEBHOOK_SECRET=secret):
+            send = self._sender(options['url'], secret)
+            try:
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                    results = list(pool.map(send, events))
+                elapsed = time.perf_counter() - started
+
+                timings = sorted(ms for _, ms in results)
+                failures = sum(1 for status, _ in results if status != 200)
+                quantiles = statistics.quantiles(timings, n=100)
+                self.stdout.write(f'Deliveries: {len(events)} in {elapsed:.2f}s ({len(events) / elapsed:.0f}/s)')
+                self.stdout.write(
+                    f'Latency ms: p50 {quantiles[49]:.2f}  p95 {quantiles[94]:.2f}  '
+                    f'p99 {quantiles[98]:.2f}  max {timings[-1]:.2f}'
+                )
+                if failures:
+                    raise CommandError(f'{failures} deliveries were rejected')
+
+                if options['settle']:
+                    self._settle(users, expected)
+            finally:
+                if not options['keep']:
+                    StripeEvent.objects.filter(event_id__startswith=f'evt_fake_{tag}_').delete()
+                    User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def _event(self, intent_id, succeeded, amount):
+        return {
+            'id': f'evt_fake_{intent_id[8:]}',
+            'object': 'event',
+            'type': 'payment_intent.succeeded' if succeeded else 'payment_intent.payment_failed',
+            'created': int(time.time()),
+            'data': {'object': {
+                'id': intent_id,
+                'object': 'payment_intent',
+                'amount': int(amount * 100),
+                'currency': 'usd',
+                'status': 'succeeded' if succeeded else 'requires_payment_method',
+            }},
+        }
+
+    def _sender(self, url, secret):
+        def sign(body):
+            timestamp = int(time.time())
+            digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+            return f't={timestamp},v1={digest}'
+
+        if url:
+            def send(event):
+                body = json.dumps(event).encode()
+                request = Request(url, data=body, method='POST', headers={
+                    'Content-Type': 'application/json', 'Stripe-Signature': sign(body),
+                })
+                started = time.perf_counter()
+                with urlopen(request) as response:
+                    status = response.status
+                return status, (time.perf_counter() - started) * 1000
+            return send
+
+        path = reverse('stripe_webhook')
+
+        def send(event):
+            body = json.dumps(event).encode()
+            try:
+                started = time.perf_counter()
+                response = Client(HTTP_HOST='localhost').post(
+                    path, body, content_type='application/json', HTTP_STRIPE_SIGNATURE=sign(body)
+                )
+                return response.status_code, (time.perf_counter() - started) * 1000
+            finally:
+                connection.close()
+        return send
+
+    def _settle(self, users, expected):
+        started = time.perf_counter()
+        processed = 0
+        while True:
+            claimed = process_events()
+            if not claimed:
+                break
+            processed += claimed
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Settled {processed} events in {elapsed:.2f}s')
+
+        mismatches = 0
+        for wallet in Wallet.objects.filter(user__in=users):
+            if (
+                wallet.balance != expected[wallet.user_id]
+                or wallet.pending_balance != 0
+                or account_balance(wallet) != wallet.balance
+            ):
+                mismatches += 1
+                self.stderr.write(
+                    f'Wallet {wallet.pk}: balance {wallet.balance} (expected {expected[wallet.user_id]}), '
+                    f'pending {wallet.pending_balance}'
+                )
+        if mismatches:
+            raise CommandError(f'{mismatches} wallets did not settle correctly')
+        self.stdout.write(self.style.SUCCESS('All wallets settled'))
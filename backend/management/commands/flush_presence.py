@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from messages.presence import flush
+import time
+
+class Command(BaseCommand):
+    help = 'Write buffered presence heartbeats to OnlineStatus in one batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep flushing every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            flushed = flush()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Flushed {flushed} users in {elapsed * 1000:.1f}ms')
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
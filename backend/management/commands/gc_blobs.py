@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from files.storage import collect_garbage, recount_references
+from datetime import timedelta
+import time
+
+class Command(BaseCommand):
+    help = 'Recount references to content-addressed uploads and delete the files nothing uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unreferenced files this long before deleting them')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without changing anything')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        corrected = recount_references(dry_run=options['dry_run'])
+        removed, freed = collect_garbage(timedelta(hours=options['grace_hours']), dry_run=options['dry_run'])
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(
+            f'Corrected {corrected} reference counts. {verb} {removed} files '
+            f'({freed / 1024 ** 2:.1f} MiB) in {time.perf_counter() - started:.1f}s'
+        )
@@ -0,0 +1,409 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import DateTimeField, Max
+from django.utils import timezone
+from campaigns.models import Campaign
+from messages.models import Conversation, Message
+from notifications.models import Notification
+from video_requests.models import VideoRequest
+from wallet.models import Wallet, Transaction, LedgerEntry
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+import random
+import time
+
+User = get_user_model()
+
+FIRST_NAMES = ['Abebe', 'Ana', 'Chen', 'David', 'Fatima', 'Hana', 'James', 'Lina', 'Marta', 'Noah',
+               'Olga', 'Priya', 'Sara', 'Tomas', 'Yuki', 'Zara']
+LAST_NAMES = ['Alemu', 'Brown', 'Garcia', 'Kim', 'Kowalski', 'Mensah', 'Nguyen', 'Okafor', 'Rossi',
+              'Silva', 'Smith', 'Tesfaye', 'Wang', 'Yilmaz']
+WORDS = ('video campaign brand launch edit draft script shoot review cut deadline budget product audience '
+         'hook intro outro music caption thumbnail story reel color voice frame take scene client creator '
+         'final please thanks today tomorrow update change approve send asap nice great').split()
+
+# Models whose auto_now/auto_now_add timestamps are backfilled with generated history
+BACKDATED_MODELS = [User, Conversation, Message, Campaign, VideoRequest, Notification, Wallet, Transaction]
+
+@contextmanager
+def backdated(models):
+    """Let bulk_create keep the timestamps we set instead of stamping every row with now()"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+def skewed(rng, n, skew):
+    """Index in range(n) where low indexes are much more likely (power-law-ish)"""
+    return min(n - 1, int(n * rng.random() ** skew))
+
+def split(rng, total, parts, alpha):
+    """Split ``total`` over ``parts`` with Pareto-distributed weights"""
+    if not parts:
+        return []
+    weights = [rng.paretovariate(alpha) for _ in range(parts)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for _ in range(total - sum(counts)):
+        counts[rng.randrange(parts)] += 1
+    return counts
+
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible dataset for load and performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--conversations', type=int, default=2000)
+        parser.add_argument('--messages', type=int, default=100_000)
+        parser.add_argument('--campaigns', type=int, default=2000)
+        parser.add_argument('--video-requests', type=int, default=5000)
+        parser.add_argument('--transactions', type=int, default=20_000,
+                            help='Wallet transactions; each also posts two ledger entries')
+        parser.add_argument('--notifications', type=int, default=20_000)
+        parser.add_argument('--creator-ratio', type=float, default=0.3)
+        parser.add_argument('--days', type=int, default=365,
+                            help='History spread over this many days before --until')
+        parser.add_argument('--until', help='End of the generated history, YYYY-MM-DD (default: today)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='load',
+                            help='Username prefix; must not be in use already')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{self.prefix}_').exists():
+            raise CommandError(f'Users prefixed "{self.prefix}_" already exist; pick another --prefix')
+        if options['users'] < 2:
+            raise CommandError('--users must be at least 2')
+
+        until = datetime.strptime(options['until'], '%Y-%m-%d') if options['until'] else datetime.now()
+        self.end = timezone.make_aware(until.replace(hour=0, minute=0, second=0, microsecond=0))
+        self.span = options['days'] * 86400
+
+        if connection.vendor == 'sqlite':
+            # Generated data is disposable; skip the fsync on every commit
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        started = time.perf_counter()
+        self.created = 0
+        with backdated(BACKDATED_MODELS):
+            users = self._users(options['users'], options['creator_ratio'])
+            self._wallets(users, options['transactions'])
+            self._conversations(users, options['conversations'], options['messages'])
+            campaigns = self._campaigns(users, options['campaigns'])
+            self._video_requests(users, campaigns, options['video_requests'])
+            self._notifications(users, options['notifications'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {self.created} rows in {elapsed:.1f}s ({self.created / elapsed * 60:,.0f} rows/min)'
+        ))
+        self.stdout.write('Bulk inserts skip signals: run rebuild_search_index, reconcile_counters '
+                          'and rollup_analytics to refresh derived data')
+
+    # Helpers
+
+    def _when(self, start=None):
+        """A random moment in the generated history, optionally not before ``start``"""
+        if start is None:
+            return self.end - timedelta(seconds=self.rng.random() * self.span)
+        return start + (self.end - start) * self.rng.random()
+
+    def _text(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def _insert(self, model, objects):
+        """bulk_create an iterable in chunks, one transaction per chunk; returns the saved objects"""
+        objects = iter(objects)
+        saved = []
+        started = time.perf_counter()
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                saved.extend(model.objects.bulk_create(batch))
+        self._report(model, len(saved), started)
+        return saved
+
+    def _copy(self, model, fields, rows):
+        """executemany tuples of ``fields`` straight into the table, one transaction per chunk
+
+        At tens of millions of rows, model instances and bulk_create's per-field
+        preparation cost more than the inserts themselves. Columns not listed
+        get their model default, prepared once.
+        """
+        meta = model._meta
+        given = [meta.get_field(name) for name in fields]
+        rest = [
+            field for field in meta.concrete_fields
+            if field not in given and not (field.primary_key and field.auto_created) and field is not meta.auto_field
+        ]
+        defaults = tuple(field.get_db_prep_save(field.get_default(), connection) for field in rest)
+        dates = [i for i, field in enumerate(given) if isinstance(field, DateTimeField)]
+        adapt = connection.ops.adapt_datetimefield_value
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in given + rest)
+        placeholders = ', '.join(['%s'] * (len(given) + len(rest)))
+        sql = f'INSERT INTO {quote(meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+        rows = iter(rows)
+        count = 0
+        started = time.perf_counter()
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            if dates:
+                batch = [list(row) for row in batch]
+                for row in batch:
+                    for i in dates:
+                        row[i] = adapt(row[i])
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, [tuple(row) + defaults for row in batch])
+            count += len(batch)
+        self._report(model, count, started)
+        return count
+
+    def _report(self, model, count, started):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.created += count
+        self.stdout.write(f'{model._meta.label:>28} {count:>12,} rows {elapsed:>8.1f}s {count / elapsed:>12,.0f}/s')
+
+    # Tables
+
+    def _users(self, count, creator_ratio):
+        password = make_password('password123')
+        rng = self.rng
+
+        def build():
+            for i in range(count):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                joined = self._when()
+                yield User(
+                    username=f'{self.prefix}_{i}',
+                    email=f'{self.prefix}_{i}@example.com',
+                    password=password,
+                    first_name=first,
+                    last_name=last,
+                    user_type='creator' if rng.random() < creator_ratio else 'client',
+                    date_joined=joined,
+                    created_at=joined,
+                    updated_at=joined,
+                )
+
+        users = self._insert(User, build())
+        if users and users[0].pk is None:
+            # Backends that cannot return ids from a bulk insert
+            by_name = dict(User.objects.filter(username__startswith=f'{self.prefix}_').values_list('username', 'pk'))
+            for user in users:
+                user.pk = user.id = by_name[user.username]
+        return users
+
+    def _wallets(self, users, transactions):
+        """Wallets with skewed transaction histories, posted to the ledger so verify_ledger passes"""
+        rng = self.rng
+        per_wallet = split(rng, transactions, len(users), alpha=1.1)
+        # Transaction ids are assigned here so ledger entries can reference them without a round trip
+        next_id = (Transaction.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        first_id = next_id
+        wallets = []
+        history = []
+        journal = []
+
+        for user, txn_count in zip(users, per_wallet):
+            wallet = Wallet(user_id=user.pk, created_at=user.created_at, updated_at=user.created_at)
+            for moment in sorted(self._when(user.created_at) for _ in range(txn_count)):
+                if wallet.balance > 0 and rng.random() < 0.3:
+                    amount = min(Decimal(rng.randint(1, max(1, int(wallet.balance)))), wallet.balance)
+                    kind, category = 'debit', 'withdrawal'
+                    wallet.balance -= amount
+                    wallet.total_withdrawn += amount
+                else:
+                    amount = Decimal(int(rng.paretovariate(1.5) * 50)) + Decimal(rng.randint(0, 99)) / 100
+                    kind, category = 'credit', rng.choice(['payment', 'deposit', 'campaign_payment'])
+                    wallet.balance += amount
+                    wallet.total_earned += amount
+                description = f'{category.replace("_", " ").title()} {next_id}'
+                history.append((next_id, user.pk, kind, category, amount, amount, description,
+                                f'{self.prefix}_txn_{next_id}', 'completed', moment, moment))
+                wallet.updated_at = moment
+                next_id += 1
+            wallets.append(wallet)
+
+        wallets = self._insert(Wallet, wallets)
+        wallet_ids = {wallet.user_id: wallet.pk for wallet in wallets}
+        if None in wallet_ids.values():
+            wallet_ids = dict(Wallet.objects.filter(user__in=users).values_list('user_id', 'pk'))
+
+        def rows():
+            for row in history:
+                yield (row[0], wallet_ids[row[1]]) + row[2:]
+
+        self._copy(Transaction, ['id', 'wallet', 'transaction_type', 'category', 'amount', 'net_amount',
+                                 'description', 'reference', 'status', 'processed_at', 'created_at'], rows())
+        if next_id > first_id:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Transaction]):
+                    cursor.execute(sql)
+
+        def entries():
+            for txn_id, user_id, kind, _, amount, _, description, _, _, moment, _ in history:
+                inside, outside = ('credit', 'debit') if kind == 'credit' else ('debit', 'credit')
+                yield (txn_id, None, 'external', outside, amount, description, moment)
+                yield (txn_id, wallet_ids[user_id], 'available', inside, amount, description, moment)
+
+        self._copy(LedgerEntry, ['transaction', 'wallet', 'account', 'direction', 'amount', 'memo', 'created_at'],
+                   entries())
+
+    def _conversations(self, users, count, messages):
+        """Mostly direct chats, a long tail of groups; message volume is Pareto-distributed"""
+        rng = self.rng
+        members = []
+        spans = []
+
+        def build():
+            for _ in range(count):
+                size = 2 if rng.random() < 0.85 else min(50, 2 + int(rng.paretovariate(1.2)))
+                picked = {skewed(rng, len(users), 3) for _ in range(size)}
+                while len(picked) < 2:
+                    picked.add(rng.randrange(len(users)))
+                people = [users[i] for i in picked]
+                started = self._when(max(user.created_at for user in people))
+                ended = self._when(started)
+                members.append([user.pk for user in people])
+                spans.append((started, ended))
+                yield Conversation(
+                    conversation_type='direct' if len(people) == 2 else 'group',
+                    title='' if len(people) == 2 else self._text(2, 4).title(),
+                    created_by_id=people[0].pk,
+                    created_at=started,
+                    updated_at=ended,
+                )
+
+        conversations = self._insert(Conversation, build())
+        if conversations and conversations[0].pk is None:
+            raise CommandError('This database cannot return ids from bulk inserts')
+
+        Membership = Conversation.participants.through
+        self._copy(Membership, ['conversation', 'user'], (
+            (conversation.pk, user_id)
+            for conversation, user_ids in zip(conversations, members)
+            for user_id in user_ids
+        ))
+
+        # A pool of bodies is far cheaper than building a new sentence per message
+        bodies = [self._text(2, 30) for _ in range(2000)]
+
+        def build_messages():
+            per_conversation = split(rng, messages, len(conversations), alpha=1.2)
+            for conversation, user_ids, (started, ended), total in zip(conversations, members, spans, per_conversation):
+                step = (ended - started) / max(total, 1)
+                for i in range(total):
+                    yield conversation.pk, rng.choice(user_ids), rng.choice(bodies), started + step * i
+
+        self._copy(Message, ['conversation', 'sender', 'content', 'created_at'], build_messages())
+
+    def _campaigns(self, users, count):
+        rng = self.rng
+        clients = [user for user in users if user.user_type == 'client'] or users
+        creators = [user for user in users if user.user_type == 'creator'] or users
+        statuses = [value for value, _ in Campaign.STATUS_CHOICES]
+        types = [value for value, _ in Campaign.CAMPAIGN_TYPES]
+
+        def build():
+            for i in range(count):
+                client = clients[skewed(rng, len(clients), 2)]
+                created = self._when(client.created_at)
+                budget = Decimal(int(rng.paretovariate(1.3) * 500))
+                start = created.date() + timedelta(days=rng.randint(0, 14))
+                yield Campaign(
+                    title=f'{self._text(2, 5).title()} {i}',
+                    description=self._text(10, 60),
+                    client_id=client.pk,
+                    creator_id=creators[skewed(rng, len(creators), 2)].pk if rng.random() < 0.7 else None,
+                    status=rng.choice(statuses),
+                    campaign_type=rng.choice(types),
+                    budget=budget,
+                    spent_amount=(budget * Decimal(rng.randint(0, 100)) / 100).quantize(Decimal('0.01')),
+                    start_date=start,
+                    end_date=start + timedelta(days=rng.randint(7, 90)),
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        return self._insert(Campaign, build())
+
+    def _video_requests(self, users, campaigns, count):
+        rng = self.rng
+        clients = [user for user in users if user.user_type == 'client'] or users
+        creators = [user for user in users if user.user_type == 'creator'] or users
+        statuses = [value for value, _ in VideoRequest.STATUS_CHOICES]
+        priorities = [value for value, _ in VideoRequest.PRIORITY_CHOICES]
+
+        def build():
+            for i in range(count):
+                campaign = campaigns[skewed(rng, len(campaigns), 2)] if campaigns and rng.random() < 0.8 else None
+                client_id = campaign.client_id if campaign else rng.choice(clients).pk
+                creator_id = campaign.creator_id if campaign else None
+                if creator_id is None and rng.random() < 0.6:
+                    creator_id = creators[skewed(rng, len(creators), 2)].pk
+                created = self._when(campaign.created_at if campaign else None)
+                yield (
+                    f'{self._text(2, 5).title()} {i}',
+                    self._text(10, 60),
+                    client_id,
+                    creator_id,
+                    campaign.pk if campaign else None,
+                    rng.choice(statuses),
+                    rng.choice(priorities),
+                    Decimal(int(rng.paretovariate(1.5) * 100)),
+                    created + timedelta(days=rng.randint(3, 60)),
+                    rng.randint(0, 3),
+                    created,
+                    created,
+                )
+
+        self._copy(VideoRequest, ['title', 'description', 'client', 'creator', 'campaign', 'status', 'priority',
+                                  'budget', 'deadline', 'revision_count', 'created_at', 'updated_at'], build())
+
+    def _notifications(self, users, count):
+        rng = self.rng
+        types = [value for value, _ in Notification.NOTIFICATION_TYPES]
+        priorities = [value for value, _ in Notification.PRIORITY_CHOICES]
+
+        def build():
+            for _ in range(count):
+                recipient = users[skewed(rng, len(users), 2)]
+                created = self._when(recipient.created_at)
+                is_read = rng.random() < 0.7
+                yield (
+                    recipient.pk,
+                    rng.choice(types),
+                    self._text(2, 6).capitalize(),
+                    self._text(5, 20),
+                    rng.choices(priorities, weights=[30, 50, 15, 5])[0],
+                    is_read,
+                    self._when(created) if is_read else None,
+                    created,
+                )
+
+        self._copy(Notification, ['recipient', 'notification_type', 'title', 'message', 'priority', 'is_read',
+                                  'read_at', 'created_at'], build())
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from wallet.ledger import open_balances, take_snapshots
+from wallet.models import Wallet
+import time
+
+class Command(BaseCommand):
+    help = 'Snapshot ledger balances so balance reads only replay a short tail of entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Wallets snapshotted per aggregate query')
+        parser.add_argument('--min-entries', type=int, default=100,
+                            help='Skip accounts with fewer new entries than this since their last snapshot')
+        parser.add_argument('--open-balances', action='store_true',
+                            help='First post opening entries for wallets that predate the ledger')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        wallets = processed = snapshots = opened = 0
+        last_pk = 0
+        while True:
+            batch = list(Wallet.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            if options['open_balances']:
+                opened += sum(open_balances(wallet) for wallet in batch)
+            snapshots += take_snapshots([wallet.pk for wallet in batch], options['min_entries'])
+            wallets += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Processed {wallets} wallets')
+
+        elapsed = time.perf_counter() - started
+        if opened:
+            self.stdout.write(f'Opened {opened} wallets')
+        self.stdout.write(
+            self.style.SUCCESS(f'Took {snapshots} snapshots across {wallets} wallets in {elapsed:.2f}s')
+        )
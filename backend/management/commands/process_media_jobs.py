@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from video_requests.processing import abandon_job, claim_jobs, media_workers
+from video_requests.worker import init_worker, run_job
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from collections import Counter
+import multiprocessing
+import time
+
+class Command(BaseCommand):
+    help = 'Assemble chunked uploads, then extract metadata and render thumbnails and previews for queued video submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            help='Worker processes (default: MEDIA_WORKERS, or one per CPU)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the queue instead of exiting once it is drained')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Seconds to wait when the queue is empty (with --loop)')
+
+    def new_pool(self, concurrency):
+        # Spawned, not forked: workers open their own database connections
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=concurrency, mp_context=context, initializer=init_worker)
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or media_workers()
+        outcomes = Counter()
+        started = time.perf_counter()
+
+        # Jobs are submitted one at a time and a new one is claimed as soon as a
+        # worker frees up, so one long transcode never leaves the others idle
+        pool = self.new_pool(concurrency)
+        running = {}
+        try:
+            while True:
+                if len(running) < concurrency:
+                    for job_id in claim_jobs(concurrency - len(running)):
+                        running[pool.submit(run_job, job_id)] = job_id
+                if not running:
+                    if not options['loop']:
+                        break
+                    close_old_connections()
+                    time.sleep(options['sleep'])
+                    continue
+
+                # Wake up now and then to fill idle workers with newly queued jobs
+                done, _ = wait(running, timeout=options['sleep'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        outcomes[future.result()] += 1
+                    except BrokenProcessPool:
+                        broken = True
+                        outcomes[abandon_job(job_id, 'Worker process died')] += 1
+                    except Exception as e:
+                        outcomes[abandon_job(job_id, f'{type(e).__name__}: {e}')] += 1
+                if broken:
+                    # A worker crashed (e.g. OOM in ffmpeg); every job still on the pool is lost with it
+                    for job_id in running.values():
+                        outcomes[abandon_job(job_id, 'Worker process died')] += 1
+                    running.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.new_pool(concurrency)
+                    self.stderr.write('A worker process died; restarted the pool')
+                if done:
+                    self.stdout.write(f"Processed {sum(outcomes.values())} jobs "
+                                      f"({outcomes['done']} done, {outcomes['retry']} retrying, {outcomes['failed']} failed)")
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {sum(outcomes.values())} jobs in {elapsed:.2f}s with {concurrency} workers'
+        ))
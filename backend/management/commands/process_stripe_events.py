@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from wallet.webhooks import process_events
+import time
+
+class Command(BaseCommand):
+    help = 'Settle pending transactions from the Stripe webhook inbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Events claimed and settled per database transaction')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the inbox instead of exiting once it is drained')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait when the inbox is empty (with --loop)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        while True:
+            claimed = process_events(options['batch_size'])
+            total += claimed
+            if claimed:
+                self.stdout.write(f'Processed {total} events')
+                continue
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['sleep'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} events in {elapsed:.2f}s'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from search.backends import get_backend
+from search.documents import SOURCES, index_objects
+from search.models import SearchDocument
+import time
+
+class Command(BaseCommand):
+    help = 'Re-index campaigns, video requests and messages for full-text search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', dest='kinds',
+                            help=f'Only re-index this kind (repeatable): {", ".join(SOURCES)}')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or list(SOURCES)
+        unknown = set(kinds) - set(SOURCES)
+        if unknown:
+            raise CommandError(f'Unknown kind: {", ".join(sorted(unknown))}')
+
+        get_backend().install()
+        for kind in kinds:
+            started = time.perf_counter()
+            model = SOURCES[kind]['model']
+            indexed = 0
+            last_pk = 0
+            while True:
+                batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+                if not batch:
+                    break
+                indexed += index_objects(kind, batch)
+                last_pk = batch[-1].pk
+            # Documents whose source row is gone
+            stale = SearchDocument.objects.filter(kind=kind).exclude(
+                object_id__in=model.objects.values('pk')
+            ).delete()[0]
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{kind}: indexed {indexed}, removed {stale} stale in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from dashboard.counters import rebuild_counters
+import time
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized dashboard counters from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Users recomputed per aggregate query')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only reconcile this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = User.objects.order_by('pk')
+        if options['user_ids']:
+            queryset = queryset.filter(pk__in=options['user_ids'])
+
+        started = time.perf_counter()
+        processed = 0
+        last_pk = 0
+        while True:
+            user_ids = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not user_ids:
+                break
+            rebuild_counters(user_ids)
+            processed += len(user_ids)
+            last_pk = user_ids[-1]
+            self.stdout.write(f'Reconciled {processed} users')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled counters for {processed} users in {elapsed:.2f}s')
+        )
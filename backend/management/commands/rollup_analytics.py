@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from analytics.rollups import METRICS, refresh_metric
+import time
+
+class Command(BaseCommand):
+    help = 'Roll up transactions, campaigns and video requests changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metric', action='append', dest='metrics',
+                            help=f'Only refresh this metric (repeatable): {", ".join(METRICS)}')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Ignore the watermark and recompute every bucket')
+
+    def handle(self, *args, **options):
+        metrics = options['metrics'] or list(METRICS)
+        unknown = set(metrics) - set(METRICS)
+        if unknown:
+            raise CommandError(f'Unknown metric: {", ".join(sorted(unknown))}')
+
+        for metric in metrics:
+            started = time.perf_counter()
+            days = refresh_metric(metric, rebuild=options['rebuild'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{metric}: recomputed {days} days in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS('Analytics rollups are up to date'))
@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection, OperationalError
+from django.test.utils import setup_databases, teardown_databases
+from wallet.ledger import InsufficientFunds, account_balance, open_balances, withdraw
+from wallet.models import Wallet, Transaction
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Fire parallel withdrawals at one wallet in a scratch database and verify that no update is lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--withdrawals', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--amount', type=Decimal, default=Decimal('10.00'))
+        parser.add_argument('--balance', type=Decimal, default=Decimal('1000.00'),
+                            help='Starting balance; keep it below withdrawals * amount to exercise overdraft protection')
+        parser.add_argument('--duplicate-keys', type=int, default=0,
+                            help='Send every idempotency key this many extra times')
+
+    def handle(self, *args, **options):
+        # The journal is append-only, so the run cannot clean up after itself;
+        # it works on a throwaway test database instead of the real one
+        test_settings = connection.settings_dict['TEST']
+        scratch_dir = None
+        if connection.vendor == 'sqlite' and not test_settings['NAME']:
+            # A file, not SQLite's shared in-memory test database, whose table
+            # locks would fail most concurrent writers
+            scratch_dir = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(scratch_dir, 'stress_wallet.sqlite3')
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}, serialized_aliases=set()
+        )
+        try:
+            self.stress(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            connection.close()
+            if scratch_dir:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def stress(self, options):
+        amount = options['amount']
+        user = User.objects.create(username=f'stress_wallet_{uuid.uuid4().hex[:12]}')
+        wallet = Wallet.objects.create(user=user, balance=options['balance'])
+        open_balances(wallet)
+
+        keys = [uuid.uuid4().hex for _ in range(options['withdrawals'])]
+        keys = keys * (options['duplicate_keys'] + 1)
+        outcomes = {'completed': 0, 'replayed': 0, 'insufficient': 0, 'errors': 0}
+
+        def attempt(key):
+            try:
+                _, created = withdraw(user, amount, description='Stress test withdrawal', idempotency_key=key)
+                return 'completed' if created else 'replayed'
+            except InsufficientFunds:
+                return 'insufficient'
+            except OperationalError:
+                # e.g. SQLite "database is locked" under heavy write contention
+                return 'errors'
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for outcome in pool.map(attempt, keys):
+                outcomes[outcome] += 1
+        elapsed = time.perf_counter() - started
+
+        wallet.refresh_from_db()
+        debits = Transaction.objects.filter(wallet=wallet, transaction_type='debit', status='completed')
+        expected_balance = options['balance'] - amount * debits.count()
+
+        self.stdout.write(f'Attempts: {len(keys)} in {elapsed:.2f}s ({len(keys) / elapsed:.0f}/s)')
+        for name, count in outcomes.items():
+            self.stdout.write(f'  {name}: {count}')
+        self.stdout.write(f'Final balance: {wallet.balance} (expected {expected_balance})')
+        self.stdout.write(f'Total withdrawn: {wallet.total_withdrawn}')
+        ledger_balance = account_balance(wallet)
+        self.stdout.write(f'Ledger balance: {ledger_balance}')
+
+        if (
+            wallet.balance != expected_balance
+            or wallet.balance < 0
+            or debits.count() != outcomes['completed']
+            or wallet.total_withdrawn != amount * outcomes['completed']
+            or ledger_balance != wallet.balance
+        ):
+            raise CommandError('Lost update detected: wallet and ledger disagree')
+        self.stdout.write(self.style.SUCCESS('No lost updates'))
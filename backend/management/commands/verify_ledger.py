@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from wallet.ledger import SIGNED_AMOUNT, WALLET_ACCOUNTS
+from wallet.models import Wallet, LedgerEntry
+from decimal import Decimal
+import time
+
+# SQLite sums decimals as floats; compare at the precision amounts are stored with
+CENT = Decimal('0.01')
+
+class Command(BaseCommand):
+    help = 'Check that the ledger balances and agrees with the stored wallet balances'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per round trip while streaming')
+        parser.add_argument('--max-errors', type=int, default=50,
+                            help='Stop listing mismatches after this many')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunk_size = options['chunk_size']
+        errors = []
+
+        def report(message):
+            errors.append(message)
+            if len(errors) <= options['max_errors']:
+                self.stderr.write(message)
+
+        # Every posting is a balanced pair, so the journal as a whole and each
+        # transaction must sum to zero
+        unbalanced = LedgerEntry.objects.exclude(transaction=None).values('transaction_id').annotate(
+            total=Sum(SIGNED_AMOUNT)
+        ).exclude(total=0).order_by()
+        for row in unbalanced.iterator(chunk_size=chunk_size):
+            report(f'Transaction {row["transaction_id"]} is unbalanced by {row["total"]}')
+        total = (LedgerEntry.objects.aggregate(total=Sum(SIGNED_AMOUNT))['total'] or Decimal('0')).quantize(CENT)
+        if total:
+            report(f'Journal is unbalanced by {total}')
+
+        # One grouped aggregate over the journal, merge-joined with wallets by id;
+        # both sides stream in id order so memory stays flat
+        sums = LedgerEntry.objects.filter(account__in=WALLET_ACCOUNTS).values('wallet_id', 'account').annotate(
+            total=Sum(SIGNED_AMOUNT)
+        ).order_by('wallet_id', 'account').iterator(chunk_size=chunk_size)
+        wallets = Wallet.objects.order_by('pk').values_list('pk', 'balance', 'pending_balance').iterator(chunk_size=chunk_size)
+
+        row = next(sums, None)
+        checked = 0
+        for wallet_id, balance, pending_balance in wallets:
+            ledger = dict.fromkeys(WALLET_ACCOUNTS, Decimal('0.00'))
+            while row is not None and row['wallet_id'] <= wallet_id:
+                if row['wallet_id'] == wallet_id:
+                    ledger[row['account']] = row['total'].quantize(CENT)
+                row = next(sums, None)
+            for account, stored in (('available', balance), ('pending', pending_balance)):
+                if ledger[account] != stored:
+                    report(f'Wallet {wallet_id} {account}: ledger {ledger[account]}, stored {stored}')
+            checked += 1
+
+        elapsed = time.perf_counter() - started
+        if len(errors) > options['max_errors']:
+            self.stderr.write(f'... {len(errors) - options["max_errors"]} more')
+        if errors:
+            raise CommandError(f'{len(errors)} ledger mismatches across {checked} wallets')
+        self.stdout.write(self.style.SUCCESS(f'Verified {checked} wallets in {elapsed:.2f}s'))
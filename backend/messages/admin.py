@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversation, Message, MessageRead
+from .models import Conversation, Message, MessageRead, ReadWatermark
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
@@ -17,3 +17,8 @@ class MessageAdmin(admin.ModelAdmin):
 class MessageReadAdmin(admin.ModelAdmin):
     list_display = ('message', 'user', 'read_at')
     list_filter = ('read_at',)
+
+@admin.register(ReadWatermark)
+class ReadWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('conversation', 'user', 'last_read_id', 'updated_at')
+    search_fields = ('user__username',)
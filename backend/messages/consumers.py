@@ -0,0 +1,89 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import Conversation, Message
+from .presence import close_connection, open_connection
+from .realtime import conversation_group, publish_message
+
+class ConversationConsumer(AsyncJsonWebsocketConsumer):
+    """Real-time gateway for one conversation
+
+    Clients connect to ``ws/conversations/<id>/?token=<access token>`` and
+    receive ``message``, ``typing``, ``read`` and ``presence`` events. They may
+    send ``{"type": "message", "content": ...}``, ``{"type": "typing",
+    "is_typing": true}`` and ``{"type": "read"}``.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+        self.group_name = conversation_group(self.conversation_id)
+
+        if not self.user or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.conversation = await self.get_conversation()
+        if self.conversation is None:
+            await self.close(code=4403)
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await database_sync_to_async(open_connection)(self.user.id)
+        await self.broadcast({'type': 'presence', 'user_id': self.user.id, 'is_online': True})
+
+    async def disconnect(self, code):
+        if getattr(self, 'conversation', None) is None:
+            return
+        # Other tabs or devices may still be connected; only the last one signs off
+        remaining = await database_sync_to_async(close_connection)(self.user.id)
+        if not remaining:
+            await self.broadcast({'type': 'presence', 'user_id': self.user.id, 'is_online': False})
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        event_type = content.get('type')
+
+        if event_type == 'message':
+            if not content.get('content'):
+                await self.send_json({'type': 'error', 'error': 'Message content is required'})
+                return
+            await self.create_message(content['content'], content.get('message_type', 'text'))
+        elif event_type == 'typing':
+            await self.broadcast(
+                {'type': 'typing', 'user_id': self.user.id, 'is_typing': bool(content.get('is_typing', True))},
+                exclude_self=True,
+            )
+        elif event_type == 'read':
+            await self.mark_as_read()
+        else:
+            await self.send_json({'type': 'error', 'error': f'Unknown event type: {event_type}'})
+
+    async def conversation_event(self, event):
+        if event.get('exclude_channel') == self.channel_name:
+            return
+        await self.send_json(event['payload'])
+
+    async def broadcast(self, payload, exclude_self=False):
+        event = {'type': 'conversation.event', 'payload': payload}
+        if exclude_self:
+            event['exclude_channel'] = self.channel_name
+        await self.channel_layer.group_send(self.group_name, event)
+
+    @database_sync_to_async
+    def get_conversation(self):
+        return Conversation.objects.filter(pk=self.conversation_id, participants=self.user).first()
+
+    @database_sync_to_async
+    def create_message(self, content, message_type):
+        message = Message.objects.create(
+            conversation=self.conversation,
+            sender=self.user,
+            content=content,
+            message_type=message_type if message_type in dict(Message.MESSAGE_TYPES) else 'text',
+        )
+        publish_message(message)
+
+    @database_sync_to_async
+    def mark_as_read(self):
+        # Read receipts are published by the messages_read signal receiver
+        self.conversation.mark_as_read(self.user)
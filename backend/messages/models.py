@@ -1,10 +1,26 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Exists, F, OuterRef
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.dispatch import receiver, Signal
+from files.storage import KeepUploadName, upload_storage
+from .realtime import publish_read
 
 User = get_user_model()
 
+# Sent after a user reads a conversation in bulk (receipts are written with
+# bulk_create, so per-row post_save signals do not fire).
+# Arguments: conversation, user, message_ids (None in watermark mode), last_read_id
+messages_read = Signal()
+
+READ_RECEIPT_BATCH_SIZE = 1000
+
+def read_mode():
+    """'receipts' stores one MessageRead per message, 'watermark' one ReadWatermark per conversation"""
+    return getattr(settings, 'MESSAGES_READ_MODE', 'receipts')
+
 class Conversation(models.Model):
     CONVERSATION_TYPES = (
         ('direct', 'Direct'),
@@ -32,6 +48,59 @@ class Conversation(models.Model):
     @property
     def last_message(self):
         return self.messages.last()
+    
+    def mark_as_read(self, user):
+        """Mark every message from other participants as read by ``user``
+
+        Runs in a constant number of queries regardless of conversation size.
+        Returns the number of messages that were newly marked in receipts
+        mode, or None in watermark mode.
+        """
+        if read_mode() == 'watermark':
+            last_read_id = self.messages.order_by('-pk').values_list('pk', flat=True).first()
+            if last_read_id is None:
+                return None
+            moved = ReadWatermark.objects.filter(
+                conversation=self, user=user, last_read_id__lt=last_read_id
+            ).update(last_read_id=last_read_id)
+            if not moved:
+                ReadWatermark.objects.get_or_create(
+                    conversation=self, user=user, defaults={'last_read_id': last_read_id}
+                )
+            messages_read.send(
+                sender=Conversation, conversation=self, user=user,
+                message_ids=None, last_read_id=last_read_id,
+            )
+            return None
+        
+        message_ids = list(self.messages.unread_by(user).order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(message_ids), READ_RECEIPT_BATCH_SIZE):
+            MessageRead.objects.bulk_create(
+                [MessageRead(message_id=pk, user=user) for pk in message_ids[start:start + READ_RECEIPT_BATCH_SIZE]],
+                ignore_conflicts=True,
+            )
+        if message_ids:
+            messages_read.send(
+                sender=Conversation, conversation=self, user=user,
+                message_ids=message_ids, last_read_id=message_ids[-1],
+            )
+        return len(message_ids)
+
+class MessageQuerySet(models.QuerySet):
+    def unread_by(self, user):
+        """Messages from other senders that ``user`` has not read yet
+
+        ``user`` may be a User, a user id, or an OuterRef to one when used
+        inside a correlated subquery.
+        """
+        reader = OuterRef(user) if isinstance(user, F) else user
+        if read_mode() == 'watermark':
+            read = ReadWatermark.objects.filter(
+                conversation=OuterRef('conversation'), user=reader, last_read_id__gte=OuterRef('pk')
+            )
+        else:
+            read = MessageRead.objects.filter(message=OuterRef('pk'), user=reader)
+        return self.exclude(sender=user).filter(~Exists(read))
 
 class Message(models.Model):
     MESSAGE_TYPES = (
@@ -54,7 +123,10 @@ class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
     message_type = models.CharField(max_length=10, choices=MESSAGE_TYPES, default='text')
-    file_attachment = models.FileField(upload_to='message_files/', null=True, blank=True)
+    file_attachment = models.FileField(
+        upload_to=KeepUploadName('message_files'), storage=upload_storage, null=True, blank=True
+    )
+    file_name = models.CharField(max_length=255, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='sent')
     reply_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='replies')
     edited_at = models.DateTimeField(null=True, blank=True)
@@ -62,8 +134,14 @@ class Message(models.Model):
     metadata = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = MessageQuerySet.as_manager()
+    
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination of a conversation's history
+            models.Index(fields=['conversation', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} at {self.created_at}"
@@ -75,11 +153,26 @@ class MessageRead(models.Model):
     
     class Meta:
         unique_together = ['message', 'user']
+        indexes = [
+            # Reads by one user (unread counts); the unique index leads with message
+            models.Index(fields=['user', 'message']),
+        ]
+
+class ReadWatermark(models.Model):
+    """Highest message id a user has read in a conversation (watermark read mode)"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='read_watermarks')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='read_watermarks')
+    last_read_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['conversation', 'user']
 
 class OnlineStatus(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='online_status')
     is_online = models.BooleanField(default=False)
-    last_seen = models.DateTimeField(auto_now=True)
+    # Written in batches by messages.presence.flush, not on every heartbeat
+    last_seen = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
         return f"{self.user.username} - {'Online' if self.is_online else 'Offline'}"
@@ -89,3 +182,8 @@ class OnlineStatus(models.Model):
 def update_conversation_timestamp(sender, instance, created, **kwargs):
     if created:
         instance.conversation.save()  # This updates the updated_at field
+
+# Push read receipts to connected websocket clients
+@receiver(messages_read, sender=Conversation)
+def publish_read_receipt(sender, conversation, user, last_read_id, **kwargs):
+    publish_read(conversation.id, user.id, last_read_id)
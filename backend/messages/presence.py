@@ -0,0 +1,232 @@
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+FLUSH_LOCK_KEY = 'presence:flush-lock'
+
+logger = logging.getLogger('messages.presence')
+
+# Open websocket count per user, refreshed on every connect; only bounds how
+# long a count leaked by a crashed server lingers
+CONNECTIONS_TTL = 24 * 3600
+
+def connections_key(user_id):
+    return f'presence:connections:{user_id}'
+
+def presence_ttl():
+    return getattr(settings, 'PRESENCE_TTL', 60)
+
+class MemoryPresenceStore:
+    """Per-process heartbeat store; for development and single-process servers
+
+    Heartbeats are held in a dict and expire after ``PRESENCE_TTL`` seconds.
+    Changes since the last flush are tracked so they can be written to
+    OnlineStatus in one batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._dirty = {}
+
+    def heartbeat(self, user_id, now, is_online=True):
+        with self._lock:
+            if is_online:
+                self._seen[user_id] = now
+            else:
+                self._seen.pop(user_id, None)
+            self._dirty[user_id] = (now, is_online)
+
+    def last_seen(self, user_ids):
+        with self._lock:
+            return {user_id: self._seen[user_id] for user_id in user_ids if user_id in self._seen}
+
+    def pop_dirty(self):
+        cutoff = timezone.now() - timedelta(seconds=presence_ttl())
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._seen = {user_id: seen for user_id, seen in self._seen.items() if seen >= cutoff}
+        return dirty
+
+class RedisPresenceStore:
+    """Heartbeats in Redis sorted sets, shared by every process
+
+    ``presence:seen`` scores users by last heartbeat; ``presence:dirty`` is a
+    hash of changes not yet flushed, swapped out atomically by ``pop_dirty``
+    under a name unique to that flush, so concurrent flushers (the
+    flush_presence command and ``maybe_flush``) never clobber each other.
+    """
+    seen_key = 'presence:seen'
+    dirty_key = 'presence:dirty'
+
+    def __init__(self, url=None):
+        import redis
+        self.redis = redis.Redis.from_url(url or settings.REDIS_URL)
+
+    def heartbeat(self, user_id, now, is_online=True):
+        pipe = self.redis.pipeline(transaction=False)
+        if is_online:
+            pipe.zadd(self.seen_key, {user_id: now.timestamp()})
+        else:
+            pipe.zrem(self.seen_key, user_id)
+        pipe.hset(self.dirty_key, user_id, f'{now.timestamp()}:{int(is_online)}')
+        pipe.execute()
+
+    def last_seen(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        scores = self.redis.zmscore(self.seen_key, user_ids)
+        return {
+            user_id: datetime.fromtimestamp(score, dt_timezone.utc)
+            for user_id, score in zip(user_ids, scores)
+            if score is not None
+        }
+
+    def pop_dirty(self):
+        import redis
+        flushing = f'{self.dirty_key}:flushing:{uuid.uuid4().hex}'
+        try:
+            self.redis.rename(self.dirty_key, flushing)
+        except redis.ResponseError:
+            # Nothing to flush
+            return {}
+        pipe = self.redis.pipeline()
+        pipe.hgetall(flushing)
+        pipe.delete(flushing)
+        pipe.zremrangebyscore(self.seen_key, '-inf', timezone.now().timestamp() - presence_ttl())
+        changes = pipe.execute()[0]
+        dirty = {}
+        for user_id, value in changes.items():
+            timestamp, is_online = value.decode().split(':')
+            dirty[int(user_id)] = (datetime.fromtimestamp(float(timestamp), dt_timezone.utc), is_online == '1')
+        return dirty
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.PRESENCE_STORE)()
+    return _store
+
+def heartbeat(user_id, is_online=True):
+    """Record a heartbeat (or an explicit sign-off) without touching the database"""
+    get_store().heartbeat(user_id, timezone.now(), is_online)
+    maybe_flush()
+
+def open_connection(user_id):
+    """Count a websocket opened by ``user_id`` and record a heartbeat; returns the open count"""
+    key = connections_key(user_id)
+    cache.add(key, 0, CONNECTIONS_TTL)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, CONNECTIONS_TTL)
+        count = 1
+    cache.touch(key, CONNECTIONS_TTL)
+    heartbeat(user_id)
+    return count
+
+def close_connection(user_id):
+    """Count a closed websocket; signs the user off when it was their last one
+
+    Returns the number of connections the user still has open.
+    """
+    key = connections_key(user_id)
+    try:
+        remaining = cache.decr(key)
+    except ValueError:
+        remaining = 0
+    if remaining <= 0:
+        cache.delete(key)
+        heartbeat(user_id, is_online=False)
+        return 0
+    return remaining
+
+def get_presence(user_ids):
+    """Online flag and last-seen time for many users
+
+    Live heartbeats come from the store; users without one fall back to the
+    flushed OnlineStatus rows in a single query.
+    """
+    from .models import OnlineStatus
+    user_ids = set(user_ids)
+    cutoff = timezone.now() - timedelta(seconds=presence_ttl())
+    live = get_store().last_seen(user_ids)
+
+    presence = {
+        user_id: {'is_online': seen >= cutoff, 'last_seen': seen}
+        for user_id, seen in live.items()
+    }
+    missing = user_ids - presence.keys()
+    if missing:
+        for user_id, last_seen in OnlineStatus.objects.filter(user_id__in=missing).values_list('user_id', 'last_seen'):
+            presence[user_id] = {'is_online': False, 'last_seen': last_seen}
+    for user_id in user_ids - presence.keys():
+        presence[user_id] = {'is_online': False, 'last_seen': None}
+    return presence
+
+def flush():
+    """Write every heartbeat since the last flush to OnlineStatus in batches
+
+    Repeated heartbeats from the same user coalesce into one row update.
+    Returns the number of users written.
+    """
+    from .models import OnlineStatus
+    dirty = get_store().pop_dirty()
+
+    # Users whose heartbeats stopped without a sign-off
+    cutoff = timezone.now() - timedelta(seconds=presence_ttl())
+    OnlineStatus.objects.filter(is_online=True, last_seen__lt=cutoff).exclude(user_id__in=dirty).update(is_online=False)
+    if not dirty:
+        return 0
+
+    existing = {
+        status.user_id: status
+        for status in OnlineStatus.objects.filter(user_id__in=dirty).only('pk', 'user_id')
+    }
+    to_update, to_create = [], []
+    for user_id, (last_seen, is_online) in dirty.items():
+        status = existing.get(user_id) or OnlineStatus(user_id=user_id)
+        status.last_seen = last_seen
+        status.is_online = is_online
+        (to_update if status.pk else to_create).append(status)
+
+    if to_update:
+        OnlineStatus.objects.bulk_update(to_update, ['last_seen', 'is_online'], batch_size=1000)
+    if to_create:
+        OnlineStatus.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+    return len(dirty)
+
+def maybe_flush():
+    """Start a flush at most once per PRESENCE_FLUSH_INTERVAL, off the request path
+
+    The flush runs in a background thread, so the heartbeat that takes the
+    lock returns without waiting for the batch's writes. Keeps per-process
+    stores flushed without a separate worker; deployments running
+    ``flush_presence`` on a schedule can turn it off.
+    """
+    interval = getattr(settings, 'PRESENCE_FLUSH_INTERVAL', 30)
+    if interval and cache.add(FLUSH_LOCK_KEY, 1, interval):
+        threading.Thread(target=_background_flush, name='presence-flush', daemon=True).start()
+
+def _background_flush():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Presence flush failed')
+    finally:
+        # No request cycle closes this thread's connection
+        connection.close()
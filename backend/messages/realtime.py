@@ -0,0 +1,33 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+def conversation_group(conversation_id):
+    return f'conversation_{conversation_id}'
+
+def publish(conversation_id, payload):
+    """Fan an event out to every websocket subscribed to a conversation once the transaction commits"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    def send():
+        async_to_sync(channel_layer.group_send)(
+            conversation_group(conversation_id),
+            {'type': 'conversation.event', 'payload': payload},
+        )
+    transaction.on_commit(send)
+
+def publish_message(message):
+    from .serializers import MessageSerializer
+    publish(message.conversation_id, {
+        'type': 'message',
+        'message': dict(MessageSerializer(message).data),
+    })
+
+def publish_read(conversation_id, user_id, last_read_id):
+    publish(conversation_id, {
+        'type': 'read',
+        'user_id': user_id,
+        'last_read_id': last_read_id,
+    })
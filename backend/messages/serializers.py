@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from files.serializers import ImageVariantsField
 from .models import Conversation, Message, MessageRead
 
 User = get_user_model()
@@ -7,11 +8,12 @@ User = get_user_model()
 class MessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.get_full_name', read_only=True)
     sender_avatar = serializers.ImageField(source='sender.avatar', read_only=True)
+    sender_avatar_variants = ImageVariantsField(source='sender.avatar')
     
     class Meta:
         model = Message
         fields = '__all__'
-        read_only_fields = ('created_at',)
+        read_only_fields = ('file_name', 'created_at')
 
 class ConversationSerializer(serializers.ModelSerializer):
     participants = serializers.StringRelatedField(many=True, read_only=True)
@@ -24,13 +26,18 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at', 'updated_at')
     
     def get_last_message(self, obj):
-        last_message = obj.messages.last()
+        # Prefetched by ConversationViewSet.get_queryset
+        if hasattr(obj, 'prefetched_last_message'):
+            last_message = next(iter(obj.prefetched_last_message), None)
+        else:
+            last_message = obj.messages.select_related('sender').last()
         if last_message:
             return MessageSerializer(last_message).data
         return None
     
     def get_unread_count(self, obj):
+        # Annotated by ConversationViewSet.get_queryset
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
         user = self.context['request'].user
-        return obj.messages.exclude(sender=user).exclude(
-            read_by__user=user
-        ).count()
+        return obj.messages.unread_by(user).count()
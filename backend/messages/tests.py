@@ -0,0 +1,165 @@
+from urllib.parse import parse_qs, urlsplit
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.middleware import JWTAuthMiddleware
+from .models import Conversation, Message
+from .routing import websocket_urlpatterns
+
+User = get_user_model()
+
+class ConversationListQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123')
+        self.other = User.objects.create_user(username='bob', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def add_conversations(self, count):
+        for _ in range(count):
+            conversation = Conversation.objects.create(created_by=self.other)
+            conversation.participants.add(self.user, self.other)
+            for n in range(3):
+                Message.objects.create(conversation=conversation, sender=self.other, content=f'Message {n}')
+    
+    def list_conversations(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/conversations/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+    
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.add_conversations(2)
+        small_page_queries, results = self.list_conversations()
+        self.assertEqual(len(results), 2)
+        
+        self.add_conversations(18)
+        full_page_queries, results = self.list_conversations()
+        self.assertEqual(len(results), 20)
+        
+        self.assertEqual(small_page_queries, full_page_queries)
+    
+    def test_unread_count_and_last_message(self):
+        self.add_conversations(1)
+        _, results = self.list_conversations()
+        self.assertEqual(results[0]['unread_count'], 3)
+        self.assertEqual(results[0]['last_message']['content'], 'Message 2')
+
+class MessagePaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123')
+        self.conversation = Conversation.objects.create(created_by=self.user)
+        self.conversation.participants.add(self.user)
+        for n in range(5):
+            Message.objects.create(conversation=self.conversation, sender=self.user, content=f'Message {n}')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/conversations/{self.conversation.pk}/messages/'
+    
+    def test_pages_walk_back_through_history(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual([m['content'] for m in response.data['results']], ['Message 3', 'Message 4'])
+        self.assertIsNone(response.data['next'])
+        
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([m['content'] for m in response.data['results']], ['Message 1', 'Message 2'])
+        self.assertIsNotNone(response.data['next'])
+    
+    def test_before_and_after_together_are_rejected(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        cursor = parse_qs(urlsplit(response.data['previous']).query)['before'][0]
+        response = self.client.get(self.url, {'before': cursor, 'after': cursor})
+        self.assertEqual(response.status_code, 400)
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    PRESENCE_STORE='messages.presence.MemoryPresenceStore',
+    PRESENCE_FLUSH_INTERVAL=0,
+)
+class ConversationConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='password123')
+        self.bob = User.objects.create_user(username='bob', password='password123')
+        self.mallory = User.objects.create_user(username='mallory', password='password123')
+        self.conversation = Conversation.objects.create(created_by=self.alice)
+        self.conversation.participants.add(self.alice, self.bob)
+        self.application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+    
+    def communicator(self, user=None, token=None, conversation_id=None):
+        if user is not None:
+            token = str(AccessToken.for_user(user))
+        path = f'/ws/conversations/{conversation_id or self.conversation.pk}/'
+        if token:
+            path += f'?token={token}'
+        return WebsocketCommunicator(self.application, path)
+    
+    async def receive(self, communicator, event_type):
+        """The next event of ``event_type``, skipping any others"""
+        while True:
+            event = await communicator.receive_json_from(timeout=2)
+            if event['type'] == event_type:
+                return event
+    
+    async def test_rejects_missing_or_invalid_token(self):
+        for communicator in (self.communicator(), self.communicator(token='not-a-token')):
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+    
+    async def test_rejects_non_participant(self):
+        communicator = self.communicator(self.mallory)
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+    
+    async def test_rejects_missing_conversation(self):
+        communicator = self.communicator(self.alice, conversation_id=self.conversation.pk + 100)
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+    
+    async def test_message_fans_out_to_participants(self):
+        alice, bob = self.communicator(self.alice), self.communicator(self.bob)
+        self.assertTrue((await alice.connect())[0])
+        self.assertTrue((await bob.connect())[0])
+        
+        await alice.send_json_to({'type': 'message', 'content': 'Hello'})
+        for communicator in (alice, bob):
+            event = await self.receive(communicator, 'message')
+            self.assertEqual(event['message']['content'], 'Hello')
+            self.assertEqual(event['message']['sender'], self.alice.pk)
+        self.assertTrue(await database_sync_to_async(
+            Message.objects.filter(conversation=self.conversation, content='Hello').exists
+        )())
+        
+        await alice.disconnect()
+        await bob.disconnect()
+    
+    async def test_offline_only_after_last_connection_closes(self):
+        bob = self.communicator(self.bob)
+        first, second = self.communicator(self.alice), self.communicator(self.alice)
+        for communicator in (bob, first, second):
+            await communicator.connect()
+        
+        await first.disconnect()
+        # Ordered behind anything the first disconnect broadcast
+        await second.send_json_to({'type': 'typing'})
+        events = []
+        while not events or events[-1]['type'] != 'typing':
+            events.append(await bob.receive_json_from(timeout=2))
+        self.assertNotIn({'type': 'presence', 'user_id': self.alice.pk, 'is_online': False}, events)
+        
+        await second.disconnect()
+        event = await self.receive(bob, 'presence')
+        self.assertEqual(event, {'type': 'presence', 'user_id': self.alice.pk, 'is_online': False})
+        await bob.disconnect()
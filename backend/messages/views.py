@@ -2,27 +2,65 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Max
-from .models import Conversation, Message, MessageRead
+from django.db.models import F, Func, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from .models import Conversation, Message
+from .pagination import MessageKeysetPagination
+from .realtime import publish_message
 from .serializers import ConversationSerializer, MessageSerializer
 
 class ConversationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = ConversationSerializer
     
+    # Actions that only look up the conversation and never serialize it
+    lookup_only_actions = ('messages', 'send_message', 'mark_as_read')
+    
+    # Checked by monitoring.tests (with a cold cache, so including the authentication query)
+    query_budgets = {'list': 5, 'retrieve': 5, 'messages': 3}
+    
     def get_queryset(self):
+        user = self.request.user
+        if self.action in self.lookup_only_actions:
+            return Conversation.objects.filter(participants=user)
+        
+        conversation_messages = Message.objects.filter(conversation=OuterRef('pk')).order_by()
+        
+        # Everything the serializer needs is fetched with a fixed number of
+        # queries per page: one for conversations (with last message time and
+        # unread count as subqueries), one for participants and one for the
+        # last message of every conversation on the page.
         return Conversation.objects.filter(
-            participants=self.request.user
+            participants=user
         ).annotate(
-            last_message_time=Max('messages__created_at')
+            last_message_time=Subquery(
+                conversation_messages.order_by('-created_at').values('created_at')[:1]
+            ),
+            unread_count=Coalesce(
+                Subquery(
+                    conversation_messages.unread_by(user).annotate(
+                        count=Func(F('pk'), function='COUNT')
+                    ).values('count')
+                ),
+                0,
+            ),
+        ).prefetch_related(
+            'participants',
+            Prefetch(
+                'messages',
+                queryset=Message.objects.select_related('sender').order_by('-created_at', '-pk')[:1],
+                to_attr='prefetched_last_message',
+            ),
         ).order_by('-last_message_time')
     
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
         conversation = self.get_object()
-        messages = conversation.messages.all()
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = conversation.messages.select_related('sender')
+        paginator = MessageKeysetPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        serializer = MessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
@@ -42,7 +80,8 @@ class ConversationViewSet(viewsets.ModelViewSet):
             # Mark conversation as updated
             conversation.save()
             
-            # Send real-time notification here (WebSocket)
+            # Push to websocket subscribers of this conversation
+            publish_message(message)
             
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -50,13 +89,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         conversation = self.get_object()
-        messages = conversation.messages.exclude(sender=request.user)
-        
-        for message in messages:
-            MessageRead.objects.get_or_create(
-                message=message,
-                user=request.user
-            )
+        conversation.mark_as_read(request.user)
         
         return Response({'message': 'Messages marked as read'})
 
@@ -67,4 +100,4 @@ class MessageViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return Message.objects.filter(
             conversation__participants=self.request.user
-        )
+        ).select_related('sender')
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    name = 'monitoring'
+
+    def ready(self):
+        from .metrics import metrics_enabled
+        from .timing import instrument_serializers
+        if metrics_enabled():
+            instrument_serializers()
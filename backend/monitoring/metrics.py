@@ -0,0 +1,84 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# name -> (help text, buckets)
+REQUEST_METRICS = {
+    'http_request_duration_seconds': ('Total request latency', LATENCY_BUCKETS),
+    'http_request_db_seconds': ('Time spent executing SQL', LATENCY_BUCKETS),
+    'http_request_serializer_seconds': ('Time spent in DRF serializer.data', LATENCY_BUCKETS),
+    'http_request_queries': ('SQL queries per request', QUERY_BUCKETS),
+}
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    """In-process histograms keyed by metric name and (view, method, status) labels
+
+    Each worker process keeps its own; Prometheus sums them across scrapes
+    of every worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, labels, values):
+        with self._lock:
+            for name, value in values.items():
+                key = (name, labels)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(REQUEST_METRICS[name][1])
+                histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        with self._lock:
+            snapshot = sorted(
+                (name, labels, list(h.counts), h.sum, h.count, h.buckets)
+                for (name, labels), h in self._histograms.items()
+            )
+        lines = []
+        current = None
+        for name, labels, counts, total, count, buckets in snapshot:
+            if name != current:
+                lines.append(f'# HELP {name} {REQUEST_METRICS[name][0]}')
+                lines.append(f'# TYPE {name} histogram')
+                current = name
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label_text}}} {total}')
+            lines.append(f'{name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+registry = Registry()
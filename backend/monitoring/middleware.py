@@ -0,0 +1,76 @@
+import logging
+import time
+
+from django.db import connection
+
+from .metrics import metrics_enabled, registry
+from .timing import serializer_seconds
+
+logger = logging.getLogger('monitoring')
+
+def get_query_budget(request):
+    """Budget declared by the viewset as ``query_budgets = {'<action>': n}``, if any"""
+    match = getattr(request, 'resolver_match', None)
+    view = getattr(match, 'func', None)
+    budgets = getattr(getattr(view, 'cls', None), 'query_budgets', None)
+    actions = getattr(view, 'actions', None)
+    if not budgets or not actions:
+        return None
+    return budgets.get(actions.get(request.method.lower()))
+
+class QueryMetricsMiddleware:
+    """Record query count, DB time, serializer time and latency per view
+
+    Observations go to the in-process histograms in monitoring.metrics. The
+    response carries ``query_count`` and ``query_budget`` for tests (see
+    monitoring.testing); going over budget is logged.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics_enabled():
+            return self.get_response(request)
+
+        db = {'queries': 0, 'seconds': 0.0}
+
+        def count_queries(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db['seconds'] += time.perf_counter() - started
+                db['queries'] += 1
+
+        serializer_total = [0.0]
+        token = serializer_seconds.set(serializer_total)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                response = self.get_response(request)
+        finally:
+            serializer_seconds.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        labels = (
+            ('view', match.view_name if match else 'unmatched'),
+            ('method', request.method),
+            ('status', f'{response.status_code // 100}xx'),
+        )
+        registry.observe(labels, {
+            'http_request_duration_seconds': elapsed,
+            'http_request_db_seconds': db['seconds'],
+            'http_request_serializer_seconds': serializer_total[0],
+            'http_request_queries': db['queries'],
+        })
+
+        response.query_count = db['queries']
+        response.query_budget = get_query_budget(request)
+        if response.query_budget is not None and db['queries'] > response.query_budget:
+            logger.warning(
+                '%s %s ran %d queries, over its budget of %d',
+                request.method, request.path, db['queries'], response.query_budget,
+            )
+        return response
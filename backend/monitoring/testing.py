@@ -0,0 +1,23 @@
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+def assert_within_query_budget(response, budget=None):
+    """Fail when a request ran more queries than its viewset action declares
+
+    Works on any test client response that passed through
+    QueryMetricsMiddleware. ``budget`` overrides the declared one.
+    """
+    count = getattr(response, 'query_count', None)
+    if count is None:
+        raise AssertionError('Response was not instrumented; is QueryMetricsMiddleware enabled?')
+    budget = budget if budget is not None else response.query_budget
+    if budget is None:
+        raise AssertionError('No query budget declared for this action (set query_budgets on the viewset)')
+    if count > budget:
+        raise QueryBudgetExceeded(f'{count} queries, over the budget of {budget}')
+
+class QueryBudgetTestMixin:
+    """``self.assertWithinQueryBudget(self.client.get(url))`` for TestCase classes"""
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        assert_within_query_budget(response, budget)
@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.urls import router
+from campaigns.models import Campaign
+from messages.models import Conversation, Message
+from notifications.models import Notification
+from video_requests.models import VideoRequest
+from wallet.ledger import create_pending_credit
+from .testing import QueryBudgetTestMixin
+
+User = get_user_model()
+
+@override_settings(METRICS_ENABLED=True)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Every action with a declared query budget, requested with a real JWT"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create_user(username='client', password='password123', user_type='client')
+        cls.creator = User.objects.create_user(username='creator', password='password123', user_type='creator')
+        cls.campaign = Campaign.objects.create(
+            title='Launch', description='', client=cls.client_user, creator=cls.creator,
+            campaign_type='video_marketing', budget=500,
+            start_date=date.today(), end_date=date.today() + timedelta(days=30),
+        )
+        cls.video_request = VideoRequest.objects.create(
+            title='Teaser', description='', client=cls.client_user, creator=cls.creator, campaign=cls.campaign,
+            budget=100, deadline=timezone.now() + timedelta(days=7),
+        )
+        cls.conversation = Conversation.objects.create(created_by=cls.client_user)
+        cls.conversation.participants.add(cls.client_user, cls.creator)
+        for n in range(5):
+            Message.objects.create(conversation=cls.conversation, sender=cls.creator, content=f'Message {n}')
+        for n in range(5):
+            Notification.objects.create(recipient=cls.client_user, notification_type='message', title='New', message=str(n))
+        cls.transaction, _ = create_pending_credit(cls.client_user, '25.00', 'Top up', 'budget-test')
+    
+    def setUp(self):
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.client_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    
+    def requests(self):
+        """(basename, action, url) for every budgeted action"""
+        return [
+            ('campaign', 'list', '/api/campaigns/'),
+            ('campaign', 'retrieve', f'/api/campaigns/{self.campaign.pk}/'),
+            ('campaign', 'stats', '/api/campaigns/stats/'),
+            ('videorequest', 'list', '/api/video-requests/'),
+            ('videorequest', 'retrieve', f'/api/video-requests/{self.video_request.pk}/'),
+            ('videorequest', 'stats', '/api/video-requests/stats/'),
+            ('conversation', 'list', '/api/conversations/'),
+            ('conversation', 'retrieve', f'/api/conversations/{self.conversation.pk}/'),
+            ('conversation', 'messages', f'/api/conversations/{self.conversation.pk}/messages/'),
+            ('notification', 'list', '/api/notifications/'),
+            ('notification', 'unread_count', '/api/notifications/unread_count/'),
+            ('transaction', 'list', '/api/transactions/'),
+            ('transaction', 'retrieve', f'/api/transactions/{self.transaction.pk}/'),
+        ]
+    
+    def test_every_budget_is_exercised(self):
+        declared = {
+            (basename, action)
+            for _, viewset, basename in router.registry
+            for action in getattr(viewset, 'query_budgets', {})
+        }
+        self.assertEqual(declared, {(basename, action) for basename, action, _ in self.requests()})
+    
+    def test_actions_stay_within_budget(self):
+        for basename, action, url in self.requests():
+            with self.subTest(f'{basename}.{action}'):
+                # Cold caches, so the budget covers loading the user and any cached counts
+                cache.clear()
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+    
+    def test_over_budget_fails(self):
+        response = self.client.get('/api/campaigns/')
+        with self.assertRaises(AssertionError):
+            self.assertWithinQueryBudget(response, budget=response.query_count - 1)
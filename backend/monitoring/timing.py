@@ -0,0 +1,35 @@
+import time
+from contextvars import ContextVar
+
+from rest_framework.serializers import BaseSerializer
+
+# Accumulated per request by QueryMetricsMiddleware
+serializer_seconds = ContextVar('serializer_seconds', default=None)
+_depth = ContextVar('serializer_depth', default=0)
+
+def instrument_serializers():
+    """Time ``serializer.data`` for every DRF serializer
+
+    ``Serializer.data`` and ``ListSerializer.data`` both end in
+    ``BaseSerializer.data``, which runs ``to_representation``; wrapping that one
+    property covers every response without touching individual serializers.
+    """
+    original = BaseSerializer.data
+    if getattr(original.fget, 'instrumented', False):
+        return
+
+    def data(self):
+        totals = serializer_seconds.get()
+        depth = _depth.get()
+        if totals is None or depth:
+            return original.fget(self)
+        token = _depth.set(depth + 1)
+        started = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            totals[0] += time.perf_counter() - started
+            _depth.reset(token)
+
+    data.instrumented = True
+    BaseSerializer.data = property(data)
@@ -0,0 +1,29 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .delivery import get_counts, notification_group
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes new notifications and badge count changes to the signed-in user
+
+    Clients connect to ``ws/notifications/?token=<access token>`` and receive
+    the current counts, then ``notification`` and ``counts`` events.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if not self.user or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = notification_group(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        counts = await database_sync_to_async(get_counts)(self.user.id)
+        await self.send_json({'type': 'counts', **counts})
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_event(self, event):
+        await self.send_json(event['payload'])
@@ -0,0 +1,265 @@
+import time
+import uuid
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+UNREAD_KEY = 'notifications:unread:{}'
+URGENT_KEY = 'notifications:urgent:{}'
+# Changes on every committed count change; see get_counts
+STAMP_KEY = 'notifications:counts-stamp:{}'
+COUNTS_TIMEOUT = 60 * 60 * 24
+BROADCAST_CHUNK_SIZE = 2000
+
+def notification_group(user_id):
+    return f'notifications_{user_id}'
+
+def get_counts(user_id):
+    """Unread and urgent badge counts for a user, served from the cache
+
+    Only a cold cache touches the database, with one conditional aggregate.
+    A write that commits while the counts are being rebuilt finds nothing to
+    update, so the rebuild checks the user's stamp afterwards and drops what
+    it cached if the stamp moved.
+    """
+    keys = (UNREAD_KEY.format(user_id), URGENT_KEY.format(user_id))
+    cached = cache.get_many(keys)
+    if len(cached) == len(keys):
+        return {'unread_count': cached[keys[0]], 'urgent_count': cached[keys[1]]}
+
+    from .models import Notification
+    stamp_key = STAMP_KEY.format(user_id)
+    stamp = cache.get(stamp_key)
+    counts = Notification.objects.filter(recipient_id=user_id, is_read=False).aggregate(
+        unread_count=Count('pk'),
+        urgent_count=Count('pk', filter=Q(priority='urgent')),
+    )
+    # add() keeps any value a concurrent writer cached in the meantime
+    cache.add(keys[0], counts['unread_count'], COUNTS_TIMEOUT)
+    cache.add(keys[1], counts['urgent_count'], COUNTS_TIMEOUT)
+    if cache.get(stamp_key) != stamp:
+        cache.delete_many(keys)
+    return counts
+
+def _restamp(user_ids):
+    # Called on commit, before the cached counts are touched, so a rebuild
+    # that read the old stamp always sees the new one when it checks
+    stamp = uuid.uuid4().hex
+    cache.set_many({STAMP_KEY.format(user_id): stamp for user_id in user_ids}, COUNTS_TIMEOUT)
+
+def invalidate_counts(user_id):
+    """Drop the cached counts now and again once the transaction commits
+
+    The second delete catches a read that re-cached the old counts in between.
+    """
+    keys = [UNREAD_KEY.format(user_id), URGENT_KEY.format(user_id)]
+    cache.delete_many(keys)
+
+    def apply():
+        _restamp([user_id])
+        cache.delete_many(keys)
+    transaction.on_commit(apply)
+
+def _shift_counts(user_id, unread=0, urgent=0):
+    """Atomically apply deltas to the cached counts once the transaction commits
+
+    A rolled-back write never touches the cache. A key that is not cached is
+    left alone; the next read rebuilds it, and the new stamp stops a rebuild
+    already under way from caching pre-commit counts. Counts are not clamped,
+    so drift shows up as a negative badge rather than being hidden.
+    """
+    def apply():
+        _restamp([user_id])
+        for key, delta in ((UNREAD_KEY, unread), (URGENT_KEY, urgent)):
+            if not delta:
+                continue
+            try:
+                cache.incr(key.format(user_id), delta)
+            except ValueError:
+                pass
+    transaction.on_commit(apply)
+
+def push(user_id, payload):
+    """Send an event to the user's notification websockets once the transaction commits
+
+    ``payload`` may be a callable, which is then built at send time.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    def send():
+        async_to_sync(channel_layer.group_send)(
+            notification_group(user_id),
+            {'type': 'notification.event', 'payload': payload() if callable(payload) else payload},
+        )
+    transaction.on_commit(send)
+
+def push_many(user_ids, payload):
+    """Send the same event to many users' websockets in one event-loop hop"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not user_ids:
+        return
+
+    async def send_all():
+        event = {'type': 'notification.event', 'payload': payload}
+        for user_id in user_ids:
+            await channel_layer.group_send(notification_group(user_id), event)
+    transaction.on_commit(lambda: async_to_sync(send_all)())
+
+def _push_counts(user_id, unread, urgent):
+    # Counts are read on commit, after _shift_counts has applied the deltas
+    push(user_id, lambda: {
+        'type': 'counts',
+        'delta': {'unread_count': unread, 'urgent_count': urgent},
+        **get_counts(user_id),
+    })
+
+def notification_created(notification):
+    from .serializers import NotificationSerializer
+
+    if notification.is_read:
+        return
+    urgent = 1 if notification.priority == 'urgent' else 0
+    _shift_counts(notification.recipient_id, unread=1, urgent=urgent)
+    data = dict(NotificationSerializer(notification).data)
+    push(notification.recipient_id, lambda: {
+        'type': 'notification',
+        'notification': data,
+        'delta': {'unread_count': 1, 'urgent_count': urgent},
+        **get_counts(notification.recipient_id),
+    })
+
+def mark_read(notification):
+    """Mark one notification as read; a repeated call is a no-op"""
+    from .models import Notification
+
+    now = timezone.now()
+    updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True, read_at=now)
+    notification.is_read, notification.read_at = True, notification.read_at or now
+    if updated:
+        urgent = -1 if notification.priority == 'urgent' else 0
+        _shift_counts(notification.recipient_id, unread=-1, urgent=urgent)
+        _push_counts(notification.recipient_id, -1, urgent)
+    return updated
+
+def mark_all_read(user_id):
+    """Mark all of a user's notifications as read; returns how many changed"""
+    from .models import Notification
+
+    now = timezone.now()
+    unread = Notification.objects.filter(recipient_id=user_id, is_read=False)
+    # Both updates commit together with the count deltas, or not at all
+    with transaction.atomic():
+        urgent = unread.filter(priority='urgent').update(is_read=True, read_at=now)
+        updated = urgent + unread.update(is_read=True, read_at=now)
+        if updated:
+            _shift_counts(user_id, unread=-updated, urgent=-urgent)
+            _push_counts(user_id, -updated, -urgent)
+    return updated
+
+def wants_notification(notification_types, notification_type):
+    """Apply NotificationPreference.notification_types (a {type: bool} map or a list of types)"""
+    if not notification_types:
+        return True
+    if isinstance(notification_types, dict):
+        return notification_types.get(notification_type, True) is not False
+    return notification_type in notification_types
+
+def in_quiet_hours(now, start, end, tz_name=None):
+    """Whether ``now`` falls in the user's quiet hours, evaluated in their profile timezone"""
+    if start is None or end is None:
+        return False
+    try:
+        local = now.astimezone(ZoneInfo(tz_name or 'UTC')).time()
+    except (ZoneInfoNotFoundError, ValueError):
+        local = now.time()
+    if start <= end:
+        return start <= local < end
+    return local >= start or local < end
+
+def broadcast(recipients, notification_type, title, message, priority='medium', sender=None,
+              action_url='', metadata=None, chunk_size=BROADCAST_CHUNK_SIZE):
+    """Fan one notification out to every user in the ``recipients`` queryset
+
+    Recipients are streamed in primary-key order, ``chunk_size`` at a time, with
+    their preferences joined in, so memory stays bounded by one chunk. Users who
+    opted out of ``notification_type`` are skipped. Users in their quiet hours
+    still get the notification but no real-time push. Each chunk is written
+    with a single bulk_create, and the chunk's cached badge counts are dropped
+    so they are rebuilt on the next read.
+    """
+    from .models import Notification
+
+    started = time.perf_counter()
+    now = timezone.now()
+    stats = {'recipients': 0, 'created': 0, 'skipped': 0, 'quiet': 0}
+    rows = recipients.order_by('pk').values_list(
+        'pk',
+        'notification_preferences__notification_types',
+        'notification_preferences__quiet_hours_start',
+        'notification_preferences__quiet_hours_end',
+        'profile__timezone',
+    )
+    payload = {
+        'type': 'notification',
+        'notification': {
+            'notification_type': notification_type,
+            'title': title,
+            'message': message,
+            'priority': priority,
+            'action_url': action_url,
+            'created_at': now.isoformat(),
+        },
+        'delta': {'unread_count': 1, 'urgent_count': 1 if priority == 'urgent' else 0},
+    }
+
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+
+        notifications, push_to = [], []
+        for user_id, notification_types, quiet_start, quiet_end, tz_name in chunk:
+            if not wants_notification(notification_types, notification_type):
+                stats['skipped'] += 1
+                continue
+            notifications.append(Notification(
+                recipient_id=user_id,
+                sender=sender,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                priority=priority,
+                action_url=action_url,
+                metadata=metadata or {},
+            ))
+            if in_quiet_hours(now, quiet_start, quiet_end, tz_name):
+                stats['quiet'] += 1
+            else:
+                push_to.append(user_id)
+
+        Notification.objects.bulk_create(notifications)
+        stale = [key.format(n.recipient_id) for n in notifications for key in (UNREAD_KEY, URGENT_KEY)]
+        cache.delete_many(stale)
+
+        def apply(stale=stale, user_ids=[n.recipient_id for n in notifications]):
+            _restamp(user_ids)
+            cache.delete_many(stale)
+        transaction.on_commit(apply)
+        push_many(push_to, payload)
+
+        stats['recipients'] += len(chunk)
+        stats['created'] += len(notifications)
+
+    elapsed = time.perf_counter() - started
+    stats['elapsed_seconds'] = round(elapsed, 3)
+    stats['per_second'] = round(stats['created'] / elapsed) if elapsed else stats['created']
+    return stats
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 User = get_user_model()
 
@@ -35,6 +37,12 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Unread lists and badge counts
+            models.Index(fields=['recipient', 'is_read', '-created_at']),
+            # Urgent badge count
+            models.Index(fields=['recipient', 'is_read', 'priority']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.recipient.username}"
@@ -50,3 +58,16 @@ class NotificationPreference(models.Model):
     
     def __str__(self):
         return f"{self.user.username}'s Notification Preferences"
+
+# Update cached badge counts and push new notifications to the recipient
+@receiver(post_save, sender=Notification)
+def deliver_notification(sender, instance, created, **kwargs):
+    if created:
+        from .delivery import notification_created
+        notification_created(instance)
+
+# Deletes from anywhere (admin, cascades, bulk deletes) leave the cached counts stale
+@receiver(post_delete, sender=Notification)
+def forget_counts(sender, instance, **kwargs):
+    from .delivery import invalidate_counts
+    invalidate_counts(instance.recipient_id)
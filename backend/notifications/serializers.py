@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from django.contrib.auth import get_user_model
 from .models import Notification, NotificationPreference
 
+User = get_user_model()
+
 class NotificationSerializer(serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.get_full_name', read_only=True)
     
@@ -14,3 +17,27 @@ class NotificationPreferenceSerializer(serializers.ModelSerializer):
         model = NotificationPreference
         fields = '__all__'
         read_only_fields = ('user',)
+
+class NotificationBroadcastSerializer(serializers.Serializer):
+    notification_type = serializers.ChoiceField(choices=Notification.NOTIFICATION_TYPES)
+    title = serializers.CharField(max_length=200)
+    message = serializers.CharField()
+    priority = serializers.ChoiceField(choices=Notification.PRIORITY_CHOICES, default='medium')
+    action_url = serializers.URLField(required=False, allow_blank=True, default='')
+    metadata = serializers.JSONField(required=False, default=dict)
+    
+    # Recipient filters; active, non-suspended users only
+    user_type = serializers.ChoiceField(choices=User.USER_TYPES, required=False)
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    verified_only = serializers.BooleanField(default=False)
+    
+    def get_recipients(self):
+        data = self.validated_data
+        recipients = User.objects.filter(is_active=True, is_suspended=False)
+        if data.get('user_type'):
+            recipients = recipients.filter(user_type=data['user_type'])
+        if data.get('user_ids'):
+            recipients = recipients.filter(pk__in=data['user_ids'])
+        if data['verified_only']:
+            recipients = recipients.filter(verification_status='verified')
+        return recipients
@@ -1,34 +1,58 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from .delivery import broadcast as broadcast_notification, get_counts, invalidate_counts, mark_read, mark_all_read
 from .models import Notification, NotificationPreference
-from .serializers import NotificationSerializer, NotificationPreferenceSerializer
+from .serializers import NotificationSerializer, NotificationPreferenceSerializer, NotificationBroadcastSerializer
 
 class NotificationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = NotificationSerializer
     
+    # Checked by monitoring.tests (with a cold cache, so including the authentication query)
+    query_budgets = {'list': 3, 'unread_count': 2}
+    
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
     
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_counts(self.request.user.id)
+    
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.read_at = timezone.now()
-        notification.save()
+        mark_read(notification)
         
         return Response({'message': 'Notification marked as read'})
     
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        notifications = self.get_queryset().filter(is_read=False)
-        notifications.update(is_read=True, read_at=timezone.now())
+        updated = mark_all_read(request.user.id)
         
-        return Response({'message': f'{notifications.count()} notifications marked as read'})
+        return Response({'message': f'{updated} notifications marked as read'})
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'unread_count': count})
+        # Served from the cache; no database round-trip once warm
+        return Response(get_counts(request.user.id))
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def broadcast(self, request):
+        """Send one notification to every user matching the filters (staff only)"""
+        serializer = NotificationBroadcastSerializer(data=request.data)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            stats = broadcast_notification(
+                serializer.get_recipients(),
+                notification_type=data['notification_type'],
+                title=data['title'],
+                message=data['message'],
+                priority=data['priority'],
+                sender=request.user,
+                action_url=data['action_url'],
+                metadata=data['metadata'],
+            )
+            return Response(stats, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
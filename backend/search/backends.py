@@ -0,0 +1,185 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import SearchDocument
+
+DOCUMENTS_TABLE = SearchDocument._meta.db_table
+HIGHLIGHT_START, HIGHLIGHT_STOP = '<mark>', '</mark>'
+# The database marks matches with private-use characters; the snippet is
+# escaped before they become tags, so user text can never inject HTML
+_START_SENTINEL, _STOP_SENTINEL = '\ue000', '\ue001'
+
+def strip_sentinels(text):
+    """Drop the sentinel characters from indexed text so they only ever mark matches"""
+    return text.replace(_START_SENTINEL, '').replace(_STOP_SENTINEL, '')
+
+def render_highlight(snippet):
+    """HTML-escape a snippet and turn the sentinel markers into <mark> tags"""
+    return str(escape(snippet or '')).replace(_START_SENTINEL, HIGHLIGHT_START).replace(_STOP_SENTINEL, HIGHLIGHT_STOP)
+
+class BaseSearchBackend:
+    """Full-text index over SearchDocument rows
+
+    ``matches`` returns a SearchDocument queryset usable as a subquery;
+    ``search`` returns ranked ``(object_id, rank, highlight)`` tuples limited
+    to the object ids in ``visible`` (a ``values('pk')`` queryset, or None for
+    no restriction). ``highlight`` is escaped HTML whose only tags are <mark>.
+    """
+
+    def install(self):
+        pass
+
+    def after_index(self, document_ids):
+        pass
+
+    def matches(self, kind, query):
+        raise NotImplementedError
+
+    def search(self, kind, query, visible, limit):
+        raise NotImplementedError
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector column with a GIN index, websearch query syntax and ts_rank"""
+    config = 'english'
+
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS search_document_vector_gin '
+                f'ON {DOCUMENTS_TABLE} USING gin (vector)'
+            )
+
+    def after_index(self, document_ids):
+        SearchDocument.objects.filter(pk__in=document_ids).update(
+            vector=SearchVector('title', weight='A', config=self.config)
+            + SearchVector('body', weight='B', config=self.config)
+        )
+
+    def _query(self, query):
+        return SearchQuery(query, search_type='websearch', config=self.config)
+
+    def matches(self, kind, query):
+        return SearchDocument.objects.filter(kind=kind, vector=self._query(query))
+
+    def search(self, kind, query, visible, limit):
+        search_query = self._query(query)
+        rows = self.matches(kind, query)
+        if visible is not None:
+            rows = rows.filter(object_id__in=visible)
+        rows = rows.annotate(
+            rank=SearchRank(F('vector'), search_query),
+            highlight=SearchHeadline(
+                'body', search_query, config=self.config,
+                start_sel=_START_SENTINEL, stop_sel=_STOP_SENTINEL, max_words=30, min_words=10,
+            ),
+        ).order_by('-rank')[:limit]
+        return [(row.object_id, row.rank, render_highlight(row.highlight)) for row in rows]
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """External-content FTS5 table kept in sync with SearchDocument by triggers"""
+    table = 'search_document_fts'
+
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [self.table])
+            if cursor.fetchone():
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+                f"title, body, content='{DOCUMENTS_TABLE}', content_rowid='id', "
+                f"tokenize='porter unicode61')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {self.table}_ai AFTER INSERT ON {DOCUMENTS_TABLE} BEGIN "
+                f"INSERT INTO {self.table}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {self.table}_ad AFTER DELETE ON {DOCUMENTS_TABLE} BEGIN "
+                f"INSERT INTO {self.table}({self.table}, rowid, title, body) "
+                f"VALUES ('delete', old.id, old.title, old.body); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {self.table}_au AFTER UPDATE ON {DOCUMENTS_TABLE} BEGIN "
+                f"INSERT INTO {self.table}({self.table}, rowid, title, body) "
+                f"VALUES ('delete', old.id, old.title, old.body); "
+                f"INSERT INTO {self.table}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+            )
+            cursor.execute(f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')")
+
+    def _query(self, query):
+        # Quote every term so user input can't use FTS5 syntax; prefix-match the last one
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return None
+        quoted = ['"{}"'.format(term) for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def matches(self, kind, query):
+        match = self._query(query)
+        if match is None:
+            return SearchDocument.objects.none()
+        return SearchDocument.objects.filter(
+            kind=kind,
+            id__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match]),
+        )
+
+    def search(self, kind, query, visible, limit):
+        match = self._query(query)
+        if match is None:
+            return []
+        restriction, params = '', []
+        if visible is not None:
+            visible_sql, params = visible.query.sql_with_params()
+            restriction = f'AND d.object_id IN ({visible_sql}) '
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.object_id, bm25({self.table}, 10.0, 1.0) AS rank, "
+                f"snippet({self.table}, 1, %s, %s, '…', 16) "
+                f"FROM {self.table} JOIN {DOCUMENTS_TABLE} d ON d.id = {self.table}.rowid "
+                f"WHERE {self.table} MATCH %s AND d.kind = %s {restriction}"
+                f"ORDER BY rank LIMIT %s",
+                [_START_SENTINEL, _STOP_SENTINEL, match, kind, *params, limit],
+            )
+            # bm25 is lower-is-better; flip it so higher always ranks first
+            return [
+                (object_id, -rank, render_highlight(highlight))
+                for object_id, rank, highlight in cursor.fetchall()
+            ]
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Unindexed icontains fallback for other databases"""
+
+    def matches(self, kind, query):
+        documents = SearchDocument.objects.filter(kind=kind)
+        for term in query.split():
+            documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+        return documents
+
+    def search(self, kind, query, visible, limit):
+        rows = self.matches(kind, query)
+        if visible is not None:
+            rows = rows.filter(object_id__in=visible)
+        rows = rows.order_by('-updated_at')[:limit]
+        return [(row.object_id, 0, render_highlight(row.body[:200])) for row in rows]
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+    'basic': BasicSearchBackend,
+}
+
+def get_backend():
+    name = getattr(settings, 'SEARCH_BACKEND', '') or connection.vendor
+    return BACKENDS.get(name, BasicSearchBackend)()
+
+def install_backend(**kwargs):
+    from .users import install_user_indexes
+    get_backend().install()
+    install_user_indexes()
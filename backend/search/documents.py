@@ -0,0 +1,124 @@
+from django.db import transaction
+
+from campaigns.models import Campaign
+from messages.models import Message
+from video_requests.models import VideoRequest
+
+from .backends import get_backend, strip_sentinels
+from .models import SearchDocument
+
+def _assigned(model, user):
+    # Same visibility as CampaignViewSet / VideoRequestViewSet
+    if user.user_type == 'client':
+        return model.objects.filter(client=user)
+    elif user.user_type == 'creator':
+        return model.objects.filter(creator=user)
+    return model.objects.all()
+
+# kind -> how to index, scope and present one source model
+SOURCES = {
+    'campaign': {
+        'model': Campaign,
+        'text': lambda obj: (obj.title, obj.description),
+        'visible': lambda user: _assigned(Campaign, user),
+        'related': ('client',),
+        'result': lambda obj: {
+            'title': obj.title,
+            'description': obj.description,
+            'metadata': {
+                'client': obj.client.username,
+                'budget': obj.budget,
+                'status': obj.status,
+                'campaign_type': obj.campaign_type,
+            },
+        },
+    },
+    'video_request': {
+        'model': VideoRequest,
+        'text': lambda obj: (obj.title, obj.description),
+        'visible': lambda user: _assigned(VideoRequest, user),
+        'related': ('client',),
+        'result': lambda obj: {
+            'title': obj.title,
+            'description': obj.description,
+            'metadata': {
+                'client': obj.client.username,
+                'budget': obj.budget,
+                'deadline': obj.deadline,
+                'priority': obj.priority,
+                'status': obj.status,
+            },
+        },
+    },
+    'message': {
+        'model': Message,
+        'text': lambda obj: ('', obj.content),
+        'visible': lambda user: Message.objects.filter(conversation__participants=user, is_deleted=False),
+        # Soft-deleted messages are dropped from the index
+        'searchable': lambda obj: not obj.is_deleted,
+        'related': ('sender',),
+        'result': lambda obj: {
+            'title': f'Message from {obj.sender.username}',
+            'description': obj.content,
+            'metadata': {
+                'conversation': obj.conversation_id,
+                'sender': obj.sender.username,
+                'created_at': obj.created_at,
+            },
+        },
+    },
+}
+
+KINDS_BY_MODEL = {source['model']: kind for kind, source in SOURCES.items()}
+
+def index_objects(kind, objects):
+    """Upsert the search documents of many objects of one kind
+
+    Objects the source marks as not ``searchable`` lose their document instead.
+    """
+    text = SOURCES[kind]['text']
+    searchable = SOURCES[kind].get('searchable')
+    if searchable is not None:
+        remove_objects(kind, [obj.pk for obj in objects if not searchable(obj)])
+        objects = [obj for obj in objects if searchable(obj)]
+    documents = []
+    for obj in objects:
+        title, body = map(strip_sentinels, text(obj))
+        documents.append(SearchDocument(kind=kind, object_id=obj.pk, title=title[:200], body=body))
+    if not documents:
+        return 0
+    with transaction.atomic():
+        SearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['title', 'body', 'updated_at'],
+        )
+        get_backend().after_index(
+            SearchDocument.objects.filter(kind=kind, object_id__in=[d.object_id for d in documents]).values('pk')
+        )
+    return len(documents)
+
+def remove_objects(kind, object_ids):
+    if not object_ids:
+        return
+    SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+def search(user, query, kinds=None, limit=20):
+    """Ranked, highlighted results per kind, limited to what ``user`` can see"""
+    backend = get_backend()
+    results = {}
+    for kind in kinds or SOURCES:
+        source = SOURCES[kind]
+        visible = source['visible'](user).order_by().values('pk')
+        if not visible.query.where:
+            # Unrestricted (staff): skip the semi-join
+            visible = None
+        hits = backend.search(kind, query, visible, limit)
+        objects = source['model'].objects.select_related(*source['related']).in_bulk([h[0] for h in hits])
+        results[kind] = [
+            {'id': object_id, 'rank': rank, 'highlight': highlight, **source['result'](objects[object_id])}
+            for object_id, rank, highlight in hits
+            if object_id in objects
+        ]
+    return results
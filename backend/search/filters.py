@@ -0,0 +1,19 @@
+from rest_framework import filters
+
+from .backends import get_backend
+from .documents import KINDS_BY_MODEL
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """SearchFilter answered from the full-text index instead of icontains scans
+
+    Keeps the ``?search=`` parameter and leaves ordering to OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        kind = KINDS_BY_MODEL.get(queryset.model)
+        if kind is None:
+            return super().filter_queryset(request, queryset, view)
+        return queryset.filter(pk__in=get_backend().matches(kind, query).values('object_id'))
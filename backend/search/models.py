@@ -0,0 +1,28 @@
+from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+
+class SearchDocument(models.Model):
+    """Searchable text of one campaign, video request or message
+
+    Kept in sync by search.signals. The full-text index over these rows is
+    backend specific: a GIN-indexed ``vector`` on PostgreSQL, an FTS5 table
+    maintained by triggers on SQLite (see search.backends).
+    """
+    KINDS = (
+        ('campaign', 'Campaign'),
+        ('video_request', 'Video Request'),
+        ('message', 'Message'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200, blank=True)
+    body = models.TextField(blank=True)
+    vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['kind', 'object_id']
+    
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
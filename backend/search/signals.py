@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from campaigns.models import Campaign
+from messages.models import Message
+from video_requests.models import VideoRequest
+
+from .documents import KINDS_BY_MODEL, index_objects, remove_objects
+
+@receiver(post_save, sender=Campaign)
+@receiver(post_save, sender=VideoRequest)
+@receiver(post_save, sender=Message)
+def index_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_objects(KINDS_BY_MODEL[sender], [instance])
+
+@receiver(post_delete, sender=Campaign)
+@receiver(post_delete, sender=VideoRequest)
+@receiver(post_delete, sender=Message)
+def remove_deleted(sender, instance, **kwargs):
+    remove_objects(KINDS_BY_MODEL[sender], [instance.pk])
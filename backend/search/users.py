@@ -0,0 +1,164 @@
+import threading
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+User = get_user_model()
+
+INDEXED_FIELDS = ('username', 'first_name', 'last_name', 'email')
+# Not searched, but find_users filters on them, so changes rebuild the prefix index too
+FILTERED_FIELDS = ('user_type', 'is_active')
+PREFIX_INDEX_VERSION_KEY = 'search:users:version'
+MAX_CANDIDATES = 200
+
+# Trigram indexes matching the ``UPPER(col::text) LIKE UPPER(...)`` SQL that
+# Django generates for icontains/istartswith on PostgreSQL
+TRIGRAM_INDEX_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    *[
+        f'CREATE INDEX IF NOT EXISTS accounts_user_{field}_trgm '
+        f'ON {User._meta.db_table} USING gin (UPPER(({field})::text) gin_trgm_ops)'
+        for field in INDEXED_FIELDS
+    ],
+]
+
+def install_user_indexes():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for sql in TRIGRAM_INDEX_SQL:
+                cursor.execute(sql)
+
+class PrefixIndex:
+    """Sorted (token, user id) list for prefix lookups without a trigram index
+
+    Development fallback: built once per process from every indexed field and
+    rebuilt lazily when a user's indexed fields change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = []
+        self._ids = []
+        self._user_types = {}
+        self._version = None
+
+    def _build(self):
+        entries = []
+        user_types = {}
+        rows = User.objects.filter(is_active=True).values_list('pk', 'user_type', *INDEXED_FIELDS)
+        for pk, user_type, *values in rows.iterator(chunk_size=10000):
+            user_types[pk] = user_type
+            tokens = set()
+            for value in values:
+                value = value.lower()
+                tokens.add(value)
+                tokens.update(value.replace('@', ' ').replace('.', ' ').split())
+            entries.extend((token, pk) for token in tokens if token)
+        entries.sort()
+        self._tokens = [token for token, _ in entries]
+        self._ids = [pk for _, pk in entries]
+        self._user_types = user_types
+
+    def lookup(self, prefix, limit=MAX_CANDIDATES, user_type=None, exclude=()):
+        """Up to ``limit`` ids of users with a token starting with ``prefix``
+
+        ``user_type`` and ``exclude`` (ids) are applied before the limit, so a
+        common prefix cannot crowd out the users the caller is looking for.
+        """
+        version = cache.get(PREFIX_INDEX_VERSION_KEY, 0)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build()
+                    self._version = version
+
+        prefix = prefix.lower()
+        tokens, ids, user_types = self._tokens, self._ids, self._user_types
+        found = []
+        seen = set(exclude)
+        i = bisect_left(tokens, prefix)
+        while i < len(tokens) and tokens[i].startswith(prefix) and len(found) < limit:
+            pk = ids[i]
+            if pk not in seen and (not user_type or user_types.get(pk) == user_type):
+                found.append(pk)
+            seen.add(pk)
+            i += 1
+        return found
+
+prefix_index = PrefixIndex()
+
+def _invalidate_prefix_index():
+    try:
+        cache.incr(PREFIX_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(PREFIX_INDEX_VERSION_KEY, 1, None)
+
+@receiver(post_init, sender=User)
+def remember_indexed_fields(sender, instance, **kwargs):
+    instance._search_indexed = tuple(instance.__dict__.get(field) for field in INDEXED_FIELDS + FILTERED_FIELDS)
+
+@receiver(post_save, sender=User)
+def reindex_changed_user(sender, instance, created, **kwargs):
+    # Logins save the user too; only name/email/type changes touch the index
+    indexed = tuple(getattr(instance, field) for field in INDEXED_FIELDS + FILTERED_FIELDS)
+    if created or indexed != instance._search_indexed:
+        _invalidate_prefix_index()
+    instance._search_indexed = indexed
+
+@receiver(post_delete, sender=User)
+def reindex_deleted_user(sender, instance, **kwargs):
+    _invalidate_prefix_index()
+
+def _candidates(query, exclude=None, user_type=None):
+    if connection.vendor == 'postgresql':
+        if len(query) < 3:
+            # Too short for trigrams; anchored prefixes keep the match set small
+            return (
+                Q(username__istartswith=query) | Q(first_name__istartswith=query)
+                | Q(last_name__istartswith=query) | Q(email__istartswith=query)
+            )
+        return (
+            Q(username__icontains=query) | Q(first_name__icontains=query)
+            | Q(last_name__icontains=query) | Q(email__icontains=query)
+        )
+    return Q(pk__in=prefix_index.lookup(
+        query, user_type=user_type, exclude=() if exclude is None else (exclude.pk,)
+    ))
+
+def find_users(query, exclude=None, user_type=None, limit=10):
+    """Users matching ``query``, best first, with online status joined in
+
+    Ranked by match quality (exact username, then prefixes, then substrings),
+    then verified accounts and recent activity.
+    """
+    recently = timezone.now() - timedelta(days=7)
+    users = User.objects.filter(
+        _candidates(query, exclude, user_type), is_active=True
+    ).select_related('online_status')
+    if exclude is not None:
+        users = users.exclude(pk=exclude.pk)
+    if user_type:
+        users = users.filter(user_type=user_type)
+
+    match = Case(
+        When(username__iexact=query, then=Value(100)),
+        When(username__istartswith=query, then=Value(60)),
+        When(Q(first_name__istartswith=query) | Q(last_name__istartswith=query), then=Value(40)),
+        When(email__istartswith=query, then=Value(30)),
+        default=Value(10),
+        output_field=IntegerField(),
+    )
+    verified = Case(When(verification_status='verified', then=Value(15)), default=Value(0))
+    activity = Case(
+        When(online_status__is_online=True, then=Value(10)),
+        When(online_status__last_seen__gte=recently, then=Value(5)),
+        default=Value(0),
+    )
+    return users.annotate(search_rank=match + verified + activity).order_by('-search_rank', 'username')[:limit]
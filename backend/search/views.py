@@ -0,0 +1,43 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .documents import SOURCES, search as search_documents
+
+MAX_LIMIT = 50
+
+def _type(kind):
+    return kind.replace('_', '-')
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """Unified full-text search over campaigns, video requests and messages"""
+    query = request.query_params.get('q', '').strip()
+    if len(query) < 2:
+        return Response({'error': 'Query must be at least 2 characters'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    types = request.query_params.getlist('type')
+    kinds = [kind for kind in SOURCES if _type(kind) in types] if types else list(SOURCES)
+    if types and len(kinds) != len(set(types)):
+        return Response({'error': 'Invalid type'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), MAX_LIMIT)
+    except ValueError:
+        limit = 20
+    
+    grouped = search_documents(request.user, query, kinds, limit)
+    results = [
+        {'type': _type(kind), **result}
+        for kind, kind_results in grouped.items()
+        for result in kind_results
+    ]
+    results.sort(key=lambda result: result['rank'], reverse=True)
+    
+    return Response({
+        'query': query,
+        'counts': {_type(kind): len(kind_results) for kind, kind_results in grouped.items()},
+        'results': results,
+    })
@@ -24,6 +24,7 @@ THIRD_PARTY_APPS = [
     'rest_framework_simplejwt',
     'corsheaders',
     'django_filters',
+    'channels',
 ]
 
 LOCAL_APPS = [
@@ -33,11 +34,17 @@ LOCAL_APPS = [
     'wallet',
     'notifications',
     'video_requests',
+    'dashboard',
+    'analytics',
+    'search',
+    'monitoring',
+    'files',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'monitoring.middleware.QueryMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -67,6 +74,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
 
 # Database
 DATABASES = {
@@ -119,16 +127,27 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 # Media files
-MEDIA_URL = '/media/'
+# Served through files.views.media, which checks the user may see the file
+MEDIA_URL = '/api/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media URLs are signed (files.signing) so <img> and <video> elements can load
+# them without an Authorization header; each URL stays valid for between one
+# and two of these periods, in seconds.
+MEDIA_URL_MAX_AGE = config('MEDIA_URL_MAX_AGE', default=3600, cast=int)
+
+STORAGES = {
+    'default': {'BACKEND': 'files.storage.SignedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -151,6 +170,11 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Seconds an authenticated user (with profile) is served from the cache
+# instead of the database; 0 disables. Saves invalidate it, queryset
+# .update() calls only expire with the timeout.
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=30, cast=int)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -162,3 +186,108 @@ CORS_ALLOW_CREDENTIALS = True
 # Stripe Settings
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+
+# Redis
+# Backs the cache and the channel layer in production. Leave empty in
+# development and tests to use per-process in-memory backends instead.
+REDIS_URL = config('REDIS_URL', default='')
+
+# Cache (notification badge counts, ...)
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Presence
+# Heartbeats live in PRESENCE_STORE and expire after PRESENCE_TTL seconds;
+# OnlineStatus rows are written in batches, by a background thread, at most
+# every PRESENCE_FLUSH_INTERVAL seconds (0 leaves flushing to `flush_presence`,
+# which needs the shared Redis store).
+if REDIS_URL:
+    PRESENCE_STORE = 'messages.presence.RedisPresenceStore'
+else:
+    PRESENCE_STORE = 'messages.presence.MemoryPresenceStore'
+PRESENCE_TTL = config('PRESENCE_TTL', default=60, cast=int)
+PRESENCE_FLUSH_INTERVAL = config('PRESENCE_FLUSH_INTERVAL', default=30, cast=int)
+
+# Channels (websocket fan-out)
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Messages Settings
+# 'receipts' stores a MessageRead row per message; 'watermark' stores one
+# last-read message id per (conversation, user) in messages.ReadWatermark.
+# Run `python manage.py reconcile_counters` after switching modes.
+MESSAGES_READ_MODE = config('MESSAGES_READ_MODE', default='receipts')
+
+# Dashboard Settings
+# Serve dashboard figures from the denormalized dashboard.UserCounters table.
+# Run `python manage.py reconcile_counters` after enabling.
+DASHBOARD_COUNTERS_ENABLED = config('DASHBOARD_COUNTERS_ENABLED', default=False, cast=bool)
+
+# Chunked video uploads (video_requests.uploads): part size, largest accepted
+# file, and seconds an unfinished upload is kept before expire_uploads
+# removes its parts.
+VIDEO_UPLOAD_CHUNK_SIZE = config('VIDEO_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+VIDEO_UPLOAD_MAX_SIZE = config('VIDEO_UPLOAD_MAX_SIZE', default=10 * 1024 ** 3, cast=int)
+VIDEO_UPLOAD_EXPIRY = config('VIDEO_UPLOAD_EXPIRY', default=24 * 3600, cast=int)
+
+# Media processing (video_requests.processing): worker processes for
+# process_media_jobs (0 = one per CPU), the ffmpeg/ffprobe binaries and the
+# per-command timeout in seconds.
+MEDIA_WORKERS = config('MEDIA_WORKERS', default=0, cast=int)
+FFMPEG_BINARY = config('FFMPEG_BINARY', default='ffmpeg')
+FFPROBE_BINARY = config('FFPROBE_BINARY', default='ffprobe')
+MEDIA_JOB_TIMEOUT = config('MEDIA_JOB_TIMEOUT', default=600, cast=int)
+
+# Content-addressed uploads (files.storage): submission videos, message
+# attachments and avatars are stored once per distinct content and shared by
+# every row that uploads the same bytes. Run `python manage.py gc_blobs`
+# periodically to delete files nothing refers to any more.
+DEDUPLICATE_UPLOADS = config('DEDUPLICATE_UPLOADS', default=True, cast=bool)
+
+# Media serving (files.views): how permitted downloads are sent. 'x-accel-redirect'
+# (nginx, with MEDIA_ACCEL_PREFIX an internal location aliasing MEDIA_ROOT),
+# 'x-sendfile' (Apache mod_xsendfile, lighttpd), or empty to stream from
+# Django with Range support.
+MEDIA_SENDFILE = config('MEDIA_SENDFILE', default='')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
+# Image variants (files.images): resized WebP/JPEG copies of avatars and video
+# thumbnails, rendered on first request and kept on disk under
+# MEDIA_ROOT/.variants up to this many bytes, least recently used first out.
+IMAGE_VARIANT_CACHE_SIZE = config('IMAGE_VARIANT_CACHE_SIZE', default=1024 ** 3, cast=int)
+
+# Monitoring
+# Per-view query count, DB/serializer time and latency histograms, served to
+# staff in Prometheus format at /api/metrics/.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+
+# Search Settings
+# Full-text backend: 'postgresql', 'sqlite' (FTS5) or 'basic' (icontains).
+# Empty picks the one matching the database. Run `python manage.py
+# rebuild_search_index` after switching or bulk-loading data.
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='')
@@ -1,19 +1,21 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 # Import viewsets
 from campaigns.views import CampaignViewSet
 from messages.views import ConversationViewSet, MessageViewSet
-from wallet.views import WalletViewSet, TransactionViewSet, PaymentMethodViewSet
+from wallet.views import WalletViewSet, TransactionViewSet, PaymentMethodViewSet, stripe_webhook
 from video_requests.views import VideoRequestViewSet
 from notifications.views import NotificationViewSet
+from analytics.views import analytics
+from search.views import search
+from monitoring.views import metrics
+from files.views import media
 
 # Import API views
-from .api_views import dashboard_stats, recent_activity, update_online_status, search_users
+from .api_views import dashboard_stats, recent_activity, update_online_status, user_presence, search_users
 
 # Create router
 router = DefaultRouter()
@@ -41,8 +43,13 @@ urlpatterns = [
     path('api/dashboard/stats/', dashboard_stats, name='dashboard_stats'),
     path('api/dashboard/activity/', recent_activity, name='recent_activity'),
     path('api/users/online-status/', update_online_status, name='update_online_status'),
+    path('api/users/presence/', user_presence, name='user_presence'),
     path('api/users/search/', search_users, name='search_users'),
+    path('api/analytics/', analytics, name='analytics'),
+    path('api/search/', search, name='search'),
+    path('api/metrics/', metrics, name='metrics'),
+    path('api/media/<path:name>', media, name='media'),
+    
+    # Webhooks
+    path('api/webhooks/stripe/', stripe_webhook, name='stripe_webhook'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from campaigns.models import Campaign
+from files.storage import KeepUploadName, upload_storage
+import math
+import uuid
 
 User = get_user_model()
 
@@ -39,18 +43,43 @@ class VideoRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-role lists and stats filtered by status (see audit_indexes)
+            models.Index(fields=['client', 'status']),
+            models.Index(fields=['creator', 'status']),
+            # Incremental analytics rollups (see analytics.rollups)
+            models.Index(fields=['updated_at']),
+        ]
     
     def __str__(self):
         return self.title
 
 class VideoSubmission(models.Model):
+    PROCESSING_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    
     video_request = models.ForeignKey(VideoRequest, on_delete=models.CASCADE, related_name='submissions')
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
-    video_file = models.FileField(upload_to='video_submissions/')
+    video_file = models.FileField(upload_to=KeepUploadName('video_submissions'), storage=upload_storage)
+    file_name = models.CharField(max_length=255, blank=True)
     thumbnail = models.ImageField(upload_to='video_thumbnails/', null=True, blank=True)
     description = models.TextField(blank=True)
     version = models.PositiveIntegerField(default=1)
     is_final = models.BooleanField(default=False)
+    # Filled in by chunked uploads (video_requests.uploads)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    checksum = models.CharField(max_length=64, blank=True)
+    # Filled in by the media worker (video_requests.processing)
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    video_codec = models.CharField(max_length=50, blank=True)
+    preview = models.FileField(upload_to='video_previews/', null=True, blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -59,6 +88,99 @@ class VideoSubmission(models.Model):
     def __str__(self):
         return f"Submission for {self.video_request.title} - v{self.version}"
 
+class UploadSession(models.Model):
+    """A resumable, chunked upload of a submission video (see video_requests.uploads)"""
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('assembling', 'Assembling'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+        ('failed', 'Failed'),
+    )
+    
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    video_request = models.ForeignKey(VideoRequest, on_delete=models.CASCADE, related_name='upload_sessions')
+    creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    # Given on completion and applied when the queued assembly runs
+    description = models.TextField(blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    submission = models.OneToOneField(VideoSubmission, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_session')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            # expire_uploads sweeps abandoned sessions
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"Upload {self.upload_id} - {self.filename} ({self.status})"
+    
+    @property
+    def part_count(self):
+        return max(1, math.ceil(self.size / self.chunk_size))
+    
+    def part_size(self, number):
+        """Expected byte count of part ``number`` (1-based); only the last part may be short"""
+        if number < self.part_count:
+            return self.chunk_size
+        return self.size - self.chunk_size * (self.part_count - 1)
+
+class UploadPart(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='parts')
+    number = models.PositiveIntegerField()
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    # Storage name of the part file
+    name = models.CharField(max_length=255)
+    uploaded_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['session', 'number']
+        ordering = ['number']
+
+class MediaJob(models.Model):
+    """Queued processing of a submission's video: metadata, thumbnail and preview
+
+    A job with an ``upload`` instead assembles that chunked upload into a new
+    submission, which then gets a processing job of its own. Claimed and run
+    by the ``process_media_jobs`` worker; failures are retried with a growing
+    delay (see video_requests.processing).
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    submission = models.ForeignKey(VideoSubmission, on_delete=models.CASCADE, null=True, blank=True, related_name='media_jobs')
+    upload = models.ForeignKey(UploadSession, on_delete=models.CASCADE, null=True, blank=True, related_name='media_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        if self.upload_id:
+            return f"Media job {self.pk} assembling upload {self.upload_id} ({self.status})"
+        return f"Media job {self.pk} for submission {self.submission_id} ({self.status})"
+
 class VideoReview(models.Model):
     REVIEW_STATUS_CHOICES = (
         ('approved', 'Approved'),
@@ -0,0 +1,216 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from files.images import warm_variants
+
+from .models import MediaJob, VideoSubmission
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+
+# Jobs stuck in 'processing' this long belong to a dead worker and are reclaimed
+STALE_AFTER = timedelta(hours=1)
+
+THUMBNAIL_WIDTH = 640
+PREVIEW_HEIGHT = 480
+PREVIEW_BITRATE = '800k'
+
+class ProcessingError(Exception):
+    pass
+
+def ffmpeg_binary():
+    return getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+
+def ffprobe_binary():
+    return getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+
+def media_workers():
+    """Worker processes for process_media_jobs; MEDIA_WORKERS=0 means one per CPU"""
+    return getattr(settings, 'MEDIA_WORKERS', 0) or os.cpu_count() or 1
+
+def enqueue(submission):
+    """Queue a submission for processing; the caller's request returns straight away"""
+    VideoSubmission.objects.filter(pk=submission.pk).update(processing_status='pending')
+    submission.processing_status = 'pending'
+    return MediaJob.objects.create(submission=submission)
+
+def claim_jobs(limit):
+    """Mark up to ``limit`` due jobs as processing and return their ids
+
+    Uses ``SKIP LOCKED`` where supported so several workers can share the queue.
+    Stale jobs are reclaimed only while they have attempts left; one that has
+    used them all (say, it keeps crashing its worker) is marked failed instead.
+    """
+    now = timezone.now()
+    stale = Q(status='processing', locked_at__lt=now - STALE_AFTER)
+    with transaction.atomic():
+        exhausted = MediaJob.objects.filter(stale, attempts__gte=MAX_ATTEMPTS)
+        VideoSubmission.objects.filter(media_jobs__in=exhausted).update(processing_status='failed')
+        for upload_id in exhausted.exclude(upload=None).values_list('upload_id', flat=True):
+            _fail_upload(upload_id)
+        exhausted.update(status='failed', error='Worker did not finish the job', locked_at=None, finished_at=now)
+
+        queryset = MediaJob.objects.filter(
+            Q(status='pending', next_attempt_at__lte=now) | stale
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        job_ids = list(queryset.values_list('pk', flat=True)[:limit])
+        if job_ids:
+            MediaJob.objects.filter(pk__in=job_ids).update(
+                status='processing', locked_at=now, attempts=F('attempts') + 1
+            )
+            VideoSubmission.objects.filter(media_jobs__in=job_ids).update(processing_status='processing')
+    return job_ids
+
+def _run(command):
+    timeout = getattr(settings, 'MEDIA_JOB_TIMEOUT', 600)
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except FileNotFoundError:
+        raise ProcessingError(f'{command[0]} is not installed')
+    except subprocess.TimeoutExpired:
+        raise ProcessingError(f'{os.path.basename(command[0])} timed out after {timeout}s')
+    if result.returncode != 0:
+        raise ProcessingError(result.stderr.decode(errors='replace').strip()[-2000:] or f'{command[0]} failed')
+    return result.stdout
+
+@contextmanager
+def local_path(field_file):
+    """A filesystem path for a stored file, downloading it first if the storage is remote"""
+    try:
+        path = field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+
+    suffix = os.path.splitext(field_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        with field_file.storage.open(field_file.name, 'rb') as source:
+            shutil.copyfileobj(source, tmp, 1024 * 1024)
+        tmp.flush()
+        yield tmp.name
+
+def probe(path):
+    output = _run([
+        ffprobe_binary(), '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,codec_name:format=duration', '-of', 'json', path,
+    ])
+    try:
+        info = json.loads(output)
+        stream = info['streams'][0]
+    except (ValueError, KeyError, IndexError):
+        raise ProcessingError('No video stream found')
+    duration = info.get('format', {}).get('duration')
+    return {
+        'duration': float(duration) if duration not in (None, 'N/A') else None,
+        'width': stream.get('width'),
+        'height': stream.get('height'),
+        'video_codec': stream.get('codec_name', '')[:50],
+    }
+
+def render_thumbnail(path, duration, output):
+    # A frame a little way in is more representative than the (often black) first one
+    offset = min(1.0, (duration or 0) / 10)
+    _run([
+        ffmpeg_binary(), '-v', 'error', '-ss', f'{offset:.2f}', '-i', path,
+        '-frames:v', '1', '-vf', f'scale={THUMBNAIL_WIDTH}:-2', '-y', output,
+    ])
+
+def render_preview(path, output):
+    _run([
+        ffmpeg_binary(), '-v', 'error', '-i', path,
+        '-vf', f'scale=-2:{PREVIEW_HEIGHT}', '-c:v', 'libx264', '-preset', 'veryfast',
+        '-b:v', PREVIEW_BITRATE, '-maxrate', PREVIEW_BITRATE, '-bufsize', '1600k',
+        '-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart', '-y', output,
+    ])
+
+def process_submission(submission):
+    """Extract metadata and render the thumbnail, its variants and the preview of one submission"""
+    stem = os.path.splitext(os.path.basename(submission.video_file.name))[0]
+    with local_path(submission.video_file) as path, tempfile.TemporaryDirectory() as workdir:
+        metadata = probe(path)
+        for name, value in metadata.items():
+            setattr(submission, name, value)
+
+        if not submission.thumbnail:
+            thumbnail = os.path.join(workdir, f'{stem}.jpg')
+            render_thumbnail(path, metadata['duration'], thumbnail)
+            with open(thumbnail, 'rb') as fh:
+                submission.thumbnail.save(f'{stem}.jpg', File(fh), save=False)
+
+        preview = os.path.join(workdir, f'{stem}-preview.mp4')
+        render_preview(path, preview)
+        if submission.preview:
+            submission.preview.delete(save=False)
+        with open(preview, 'rb') as fh:
+            submission.preview.save(f'{stem}-preview.mp4', File(fh), save=False)
+
+    submission.processing_status = 'ready'
+    submission.save(update_fields=[*metadata, 'thumbnail', 'preview', 'processing_status'])
+    # List pages ask for the small variants straight away; render them here rather than in a request
+    warm_variants(submission.thumbnail)
+
+def run_job(job_id):
+    """Process one claimed job; on failure schedule a retry with exponential backoff
+
+    Runs in a worker process, so it loads everything by id and returns the
+    final job status. An upload that cannot be assembled (a checksum
+    mismatch) is not retried.
+    """
+    # uploads imports enqueue from here
+    from .uploads import UploadError, assemble_upload
+
+    job = MediaJob.objects.select_related('submission', 'upload__video_request').get(pk=job_id)
+    try:
+        if job.upload_id:
+            assemble_upload(job.upload)
+        else:
+            process_submission(job.submission)
+    except UploadError as e:
+        return _fail(job, str(e), final=True)
+    except Exception as e:
+        return _fail(job, str(e))
+
+    MediaJob.objects.filter(pk=job.pk).update(status='done', error='', locked_at=None, finished_at=timezone.now())
+    return 'done'
+
+def abandon_job(job_id, error):
+    """Record a failed attempt for a job whose worker died; returns 'retry' or 'failed'"""
+    return _fail(MediaJob.objects.get(pk=job_id), error)
+
+def _fail_upload(upload_id):
+    from .uploads import fail_upload
+    fail_upload(upload_id)
+
+def _fail(job, error, final=False):
+    now = timezone.now()
+    failed = final or job.attempts >= MAX_ATTEMPTS
+    MediaJob.objects.filter(pk=job.pk).update(
+        status='failed' if failed else 'pending',
+        error=error[:5000],
+        next_attempt_at=now + RETRY_DELAY * 2 ** (job.attempts - 1),
+        locked_at=None,
+        finished_at=now if failed else None,
+    )
+    if job.upload_id:
+        if failed:
+            _fail_upload(job.upload_id)
+    else:
+        VideoSubmission.objects.filter(pk=job.submission_id).update(
+            processing_status='failed' if failed else 'pending'
+        )
+    return 'failed' if failed else 'retry'
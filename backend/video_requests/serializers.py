@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import VideoRequest, VideoSubmission, VideoReview
+from files.serializers import ImageVariantsField
+from .models import VideoRequest, VideoSubmission, VideoReview, UploadSession
 
 class VideoRequestSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.get_full_name', read_only=True)
@@ -13,11 +14,26 @@ class VideoRequestSerializer(serializers.ModelSerializer):
 
 class VideoSubmissionSerializer(serializers.ModelSerializer):
     creator_name = serializers.CharField(source='creator.get_full_name', read_only=True)
+    thumbnail_variants = ImageVariantsField(source='thumbnail')
     
     class Meta:
         model = VideoSubmission
         fields = '__all__'
-        read_only_fields = ('submitted_at', 'version')
+        read_only_fields = ('submitted_at', 'version', 'file_name', 'file_size', 'checksum', 'processing_status',
+                            'duration', 'width', 'height', 'video_codec', 'preview')
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    part_count = serializers.IntegerField(read_only=True)
+    received_parts = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = ['upload_id', 'video_request', 'filename', 'content_type', 'size', 'chunk_size',
+                  'part_count', 'received_parts', 'status', 'submission', 'created_at', 'expires_at']
+        read_only_fields = fields
+    
+    def get_received_parts(self, obj):
+        return [part.number for part in obj.parts.all()]
 
 class VideoReviewSerializer(serializers.ModelSerializer):
     reviewer_name = serializers.CharField(source='reviewer.get_full_name', read_only=True)
@@ -0,0 +1,256 @@
+import hashlib
+import io
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MediaJob, UploadPart, UploadSession, VideoSubmission
+from .processing import enqueue
+
+# Bytes read from the request or a part file at a time
+READ_SIZE = 64 * 1024
+
+MIN_CHUNK_SIZE = 256 * 1024
+PARTS_DIR = 'uploads'
+
+class UploadError(Exception):
+    pass
+
+def chunk_size_setting():
+    return getattr(settings, 'VIDEO_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+
+def max_size_setting():
+    return getattr(settings, 'VIDEO_UPLOAD_MAX_SIZE', 10 * 1024 ** 3)
+
+class HashingReader(File):
+    """Read-once file over a stream that hashes and counts what passes through
+
+    Storage backends pull it through ``chunks()``, so at most READ_SIZE bytes
+    are held at a time. Reading past ``limit`` bytes fails instead of
+    silently accepting an oversized body.
+    """
+
+    def __init__(self, stream, limit, name=None):
+        super().__init__(stream, name)
+        self.limit = limit
+        self.size = limit
+        self.read_bytes = 0
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        want = self.limit - self.read_bytes + 1
+        data = self.file.read(want if size is None or size < 0 else min(size, want))
+        self.read_bytes += len(data)
+        if self.read_bytes > self.limit:
+            raise UploadError('Part is larger than expected')
+        self.digest.update(data)
+        return data
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation('HashingReader is read-once')
+
+    def chunks(self, chunk_size=None):
+        while True:
+            data = self.read(chunk_size or READ_SIZE)
+            if not data:
+                return
+            yield data
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+class ConcatenatedParts(File):
+    """The parts of an upload read back-to-back as one file, one READ_SIZE block at a time"""
+
+    def __init__(self, parts, size, name):
+        super().__init__(None, name)
+        self.parts = parts
+        self.size = size
+        self.digest = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for part in self.parts:
+            with default_storage.open(part.name, 'rb') as fh:
+                while True:
+                    data = fh.read(chunk_size or READ_SIZE)
+                    if not data:
+                        break
+                    self.digest.update(data)
+                    yield data
+
+    def __iter__(self):
+        return self.chunks()
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+def start_upload(video_request, creator, filename, size, content_type=''):
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be an integer number of bytes')
+    if size <= 0:
+        raise UploadError('size must be positive')
+    if size > max_size_setting():
+        raise UploadError(f'Files are limited to {max_size_setting()} bytes')
+    filename = os.path.basename(filename or '')
+    if not filename:
+        raise UploadError('filename is required')
+
+    return UploadSession.objects.create(
+        video_request=video_request,
+        creator=creator,
+        filename=filename[:255],
+        content_type=(content_type or '')[:100],
+        size=size,
+        chunk_size=max(MIN_CHUNK_SIZE, chunk_size_setting()),
+        expires_at=timezone.now() + timedelta(seconds=getattr(settings, 'VIDEO_UPLOAD_EXPIRY', 24 * 3600)),
+    )
+
+def write_part(session, number, stream, length=None, sha256=None):
+    """Stream one part into storage; re-sending a part replaces it
+
+    ``length`` (the Content-Length) and ``sha256`` are checked when given.
+    """
+    if session.status != 'uploading':
+        raise UploadError(f'Upload is {session.status}')
+    if session.expires_at <= timezone.now():
+        raise UploadError('Upload has expired')
+    if not 1 <= number <= session.part_count:
+        raise UploadError(f'Part number must be between 1 and {session.part_count}')
+    expected = session.part_size(number)
+    if length is not None and length != expected:
+        raise UploadError(f'Part {number} must be {expected} bytes')
+
+    reader = HashingReader(stream, expected)
+    # A fresh name per attempt, so a retry never collides with the part it replaces
+    name = f'{PARTS_DIR}/{session.upload_id}/{number:06d}-{uuid.uuid4().hex[:8]}'
+    try:
+        name = default_storage.save(name, reader)
+        if reader.read_bytes != expected:
+            raise UploadError(f'Part {number} must be {expected} bytes, got {reader.read_bytes}')
+        if sha256 and sha256.lower() != reader.hexdigest():
+            raise UploadError(f'Checksum mismatch for part {number}')
+        with transaction.atomic():
+            # The session row lock serializes concurrent PUTs of the same part,
+            # which would otherwise both insert it, and keeps parts from
+            # landing once completion has started
+            locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if locked.status != 'uploading':
+                raise UploadError(f'Upload is {locked.status}')
+            previous = UploadPart.objects.filter(session=session, number=number).first()
+            UploadPart.objects.update_or_create(
+                session=session, number=number,
+                defaults={'size': reader.read_bytes, 'sha256': reader.hexdigest(), 'name': name},
+            )
+    except Exception:
+        default_storage.delete(name)
+        raise
+
+    if previous is not None:
+        default_storage.delete(previous.name)
+    return reader.hexdigest()
+
+def complete_upload(session, description='', sha256=None):
+    """Queue the assembly of a fully uploaded session; returns straight away
+
+    Joining the parts copies the whole file, far too slow for a request, so a
+    MediaJob does it (see assemble_upload). The session is ``assembling``
+    until then; clients poll it for the ``submission``.
+    """
+    received = set(session.parts.values_list('number', flat=True))
+    missing = sorted(set(range(1, session.part_count + 1)) - received)
+    if missing:
+        raise UploadError(f'Missing parts: {", ".join(map(str, missing[:20]))}')
+
+    with transaction.atomic():
+        updated = UploadSession.objects.filter(pk=session.pk, status='uploading').update(
+            status='assembling', description=description or '', sha256=(sha256 or '').lower(),
+        )
+        if not updated:
+            raise UploadError(f'Upload is {UploadSession.objects.get(pk=session.pk).status}')
+        MediaJob.objects.create(upload=session)
+    session.status, session.description, session.sha256 = 'assembling', description or '', (sha256 or '').lower()
+    return session
+
+def assemble_upload(session):
+    """Join the parts into the submission's video file and create the VideoSubmission
+
+    Run by the media worker. The parts are streamed through once, which also
+    yields the whole-file checksum. Nothing is written to VideoSubmission
+    until the file is complete; a checksum mismatch fails the upload for good.
+    """
+    parts = list(session.parts.order_by('number'))
+    submission = VideoSubmission(
+        video_request=session.video_request,
+        creator=session.creator,
+        description=session.description,
+        file_size=session.size,
+    )
+    content = ConcatenatedParts(parts, session.size, session.filename)
+    submission.video_file.save(session.filename, content, save=False)
+    try:
+        if session.sha256 and session.sha256 != content.hexdigest():
+            raise UploadError('Checksum mismatch for the assembled file')
+        submission.checksum = content.hexdigest()
+
+        with transaction.atomic():
+            locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if locked.status != 'assembling':
+                raise UploadError(f'Upload is {locked.status}')
+            submission.save()
+            UploadSession.objects.filter(pk=session.pk).update(status='completed', submission=submission)
+            UploadPart.objects.filter(session=session).delete()
+            video_request = session.video_request
+            video_request.status = 'review'
+            video_request.save()
+            enqueue(submission)
+    except Exception:
+        submission.video_file.delete(save=False)
+        raise
+
+    transaction.on_commit(lambda: discard_parts(parts))
+    session.status, session.submission = 'completed', submission
+    return submission
+
+def fail_upload(session_id):
+    """Give up on assembling an upload and delete its parts"""
+    parts = list(UploadPart.objects.filter(session_id=session_id))
+    if UploadSession.objects.filter(pk=session_id, status='assembling').update(status='failed'):
+        discard_parts(parts)
+        UploadPart.objects.filter(session_id=session_id).delete()
+
+def abort_upload(session):
+    parts = list(session.parts.all())
+    updated = UploadSession.objects.filter(pk=session.pk, status='uploading').update(status='aborted')
+    if not updated:
+        raise UploadError(f'Upload is {session.status}')
+    discard_parts(parts)
+    session.parts.all().delete()
+    session.status = 'aborted'
+
+def discard_parts(parts):
+    for part in parts:
+        default_storage.delete(part.name)
+
+def expire_uploads(batch_size=500):
+    """Delete the parts of unfinished sessions past their expiry; returns the number expired"""
+    expired = 0
+    while True:
+        sessions = list(
+            UploadSession.objects.filter(status='uploading', expires_at__lte=timezone.now())
+            .prefetch_related('parts')[:batch_size]
+        )
+        if not sessions:
+            return expired
+        for session in sessions:
+            discard_parts(session.parts.all())
+        UploadPart.objects.filter(session__in=sessions).delete()
+        UploadSession.objects.filter(pk__in=[session.pk for session in sessions]).update(status='aborted')
+        expired += len(sessions)
@@ -4,25 +4,46 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from .models import VideoRequest, VideoSubmission, VideoReview
-from .serializers import VideoRequestSerializer, VideoSubmissionSerializer, VideoReviewSerializer
+from django.db.models import Count
+import io
+from dashboard.aggregates import InvalidGrouping, count_where, status_buckets, summarize, total
+from search.filters import FullTextSearchFilter
+from . import uploads
+from .processing import enqueue
+from .models import VideoRequest, VideoSubmission, VideoReview, UploadSession
+from .serializers import VideoRequestSerializer, VideoSubmissionSerializer, VideoReviewSerializer, UploadSessionSerializer
+
+UPLOAD_ID = r'(?P<upload_id>[0-9a-f-]{36})'
+
+STATS_METRICS = {
+    'total_requests': Count('pk'),
+    'pending_requests': count_where(status='pending'),
+    'in_progress_requests': count_where(status='in_progress'),
+    'completed_requests': count_where(status='completed'),
+    'total_budget': total('budget'),
+    **status_buckets(VideoRequest.STATUS_CHOICES),
+}
 
 class VideoRequestViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = VideoRequestSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'priority', 'client', 'creator']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'deadline', 'budget']
     ordering = ['-created_at']
     
+    # Checked by monitoring.tests (with a cold cache, so including the authentication query)
+    query_budgets = {'list': 3, 'retrieve': 2, 'stats': 2}
+    
     def get_queryset(self):
         user = self.request.user
+        video_requests = VideoRequest.objects.select_related('client', 'creator', 'campaign')
         if user.user_type == 'client':
-            return VideoRequest.objects.filter(client=user)
+            return video_requests.filter(client=user)
         elif user.user_type == 'creator':
-            return VideoRequest.objects.filter(creator=user)
-        return VideoRequest.objects.all()
+            return video_requests.filter(creator=user)
+        return video_requests
     
     def perform_create(self, serializer):
         serializer.save(client=self.request.user)
@@ -68,21 +89,120 @@ class VideoRequestViewSet(viewsets.ModelViewSet):
             submission = serializer.save()
             video_request.status = 'review'
             video_request.save()
+            enqueue(submission)
             
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    # Chunked, resumable uploads for large videos: start, PUT each part, complete.
+    # GET on the upload lists the parts received so far, for resuming.
+    
+    def get_upload(self, request, upload_id):
+        video_request = self.get_object()
+        return UploadSession.objects.filter(
+            upload_id=upload_id, video_request=video_request, creator=request.user
+        ).prefetch_related('parts').first()
+    
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def start_upload(self, request, pk=None):
+        """Start a chunked upload: {filename, size, content_type}"""
+        video_request = self.get_object()
+        
+        if video_request.creator != request.user:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            session = uploads.start_upload(
+                video_request,
+                request.user,
+                request.data.get('filename'),
+                request.data.get('size'),
+                request.data.get('content_type', ''),
+            )
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'], url_path=f'uploads/{UPLOAD_ID}')
+    def upload_status(self, request, pk=None, upload_id=None):
+        session = self.get_upload(request, upload_id)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadSessionSerializer(session).data)
+    
+    @upload_status.mapping.delete
+    def abort_upload(self, request, pk=None, upload_id=None):
+        session = self.get_upload(request, upload_id)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            uploads.abort_upload(session)
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['put'], url_path=f'uploads/{UPLOAD_ID}/parts/(?P<part_number>[0-9]+)')
+    def upload_part(self, request, pk=None, upload_id=None, part_number=None):
+        """Raw part bytes as the body; an X-Content-SHA256 header is verified if sent"""
+        session = self.get_upload(request, upload_id)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        length = request.META.get('CONTENT_LENGTH')
+        try:
+            sha256 = uploads.write_part(
+                session,
+                int(part_number),
+                request.stream or io.BytesIO(),
+                length=int(length) if length else None,
+                sha256=request.META.get('HTTP_X_CONTENT_SHA256'),
+            )
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'part': int(part_number), 'sha256': sha256})
+    
+    @action(detail=True, methods=['post'], url_path=f'uploads/{UPLOAD_ID}/complete')
+    def complete_upload(self, request, pk=None, upload_id=None):
+        """Queue the assembly of the parts into a submission: {description, sha256}
+
+        Returns the upload, now ``assembling``; poll it until it is
+        ``completed`` (with its ``submission``) or ``failed``.
+        """
+        session = self.get_upload(request, upload_id)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            session = uploads.complete_upload(
+                session,
+                description=request.data.get('description', ''),
+                sha256=request.data.get('sha256'),
+            )
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_202_ACCEPTED)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        user = request.user
-        queryset = self.get_queryset()
-        
-        stats = {
-            'total_requests': queryset.count(),
-            'pending_requests': queryset.filter(status='pending').count(),
-            'in_progress_requests': queryset.filter(status='in_progress').count(),
-            'completed_requests': queryset.filter(status='completed').count(),
-            'total_budget': sum(vr.budget for vr in queryset),
-        }
+        """Totals and per-status counts in one query
+
+        ``?group_by=priority`` (or ``status``) and ``?period=month`` split the
+        figures into groups.
+        """
+        try:
+            stats = summarize(
+                self.get_queryset(),
+                STATS_METRICS,
+                group_by=request.query_params.getlist('group_by'),
+                allowed_groups=('priority', 'status'),
+                period=request.query_params.get('period'),
+            )
+        except InvalidGrouping as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+        if isinstance(stats, list):
+            return Response({'groups': stats})
         return Response(stats)
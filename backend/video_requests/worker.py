@@ -0,0 +1,13 @@
+"""Entry points for process_media_jobs' worker processes
+
+Spawned workers unpickle these before Django is set up, so this module must
+not import models at the top level.
+"""
+
+def init_worker():
+    import django
+    django.setup()
+
+def run_job(job_id):
+    from .processing import run_job
+    return run_job(job_id)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wallet, Transaction, PaymentMethod
+from .models import Wallet, Transaction, PaymentMethod, LedgerEntry, BalanceSnapshot, StripeEvent
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
@@ -19,3 +19,29 @@ class PaymentMethodAdmin(admin.ModelAdmin):
     list_display = ('user', 'method_type', 'is_primary', 'is_verified', 'created_at')
     list_filter = ('method_type', 'is_primary', 'is_verified')
     search_fields = ('user__username',)
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('transaction', 'wallet', 'account', 'direction', 'amount', 'created_at')
+    list_filter = ('account', 'direction')
+    search_fields = ('transaction__reference', 'wallet__user__username')
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('wallet', 'account', 'balance', 'last_entry_id', 'as_of')
+    list_filter = ('account',)
+    search_fields = ('wallet__user__username',)
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id',)
+    readonly_fields = ('received_at', 'processed_at')
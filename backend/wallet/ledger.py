@@ -0,0 +1,313 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Wallet, Transaction, LedgerEntry, BalanceSnapshot
+
+WALLET_ACCOUNTS = ('available', 'pending')
+
+# Credits minus debits, i.e. what the platform owes on a wallet account
+SIGNED_AMOUNT = Case(
+    When(direction='credit', then=F('amount')),
+    default=F('amount') * -1,
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+class LedgerError(Exception):
+    pass
+
+class InsufficientFunds(LedgerError):
+    pass
+
+class WalletFrozen(LedgerError):
+    pass
+
+def make_reference(prefix, idempotency_key=None):
+    """Transaction.reference is unique, so a client-supplied key makes retries idempotent"""
+    return f'{prefix}_{idempotency_key or uuid.uuid4().hex}'[:100]
+
+def _existing(reference, wallet):
+    existing = Transaction.objects.filter(reference=reference).first()
+    if existing is not None and existing.wallet_id != wallet.pk:
+        raise LedgerError('Idempotency key already used')
+    return existing
+
+def _pair(amount, debit, credit, txn, memo, now):
+    return [
+        LedgerEntry(transaction=txn, wallet=wallet, account=account, direction=direction,
+                    amount=amount, memo=memo[:200], created_at=now)
+        for direction, (wallet, account) in (('debit', debit), ('credit', credit))
+    ]
+
+def post(amount, debit, credit, txn=None, memo=''):
+    """Append a balanced debit/credit pair to the journal
+
+    ``debit`` and ``credit`` are ``(wallet, account)`` pairs; use ``None`` as the
+    wallet for the 'external' account.
+    """
+    LedgerEntry.objects.bulk_create(_pair(amount, debit, credit, txn, memo, timezone.now()))
+
+def open_balances(wallet):
+    """Post opening entries for whatever part of a wallet's stored balances predates the journal
+
+    Each account is credited the amount its stored balance exceeds its
+    journal balance by, so a wallet that already made a few ledger postings
+    is opened too, and running this again posts nothing. A journal balance
+    above the stored one is real drift and is left for verify_ledger to
+    report. Holds the wallet row lock, like every other posting.
+    """
+    opened = False
+    with transaction.atomic():
+        wallet = Wallet.objects.select_for_update().get(pk=wallet.pk)
+        for account, stored in (('available', wallet.balance), ('pending', wallet.pending_balance)):
+            amount = stored - account_balance(wallet, account)
+            if amount > 0:
+                post(amount, debit=(None, 'external'), credit=(wallet, account), memo='Opening balance')
+                opened = True
+    return opened
+
+def account_balance(wallet, account='available', as_of=None):
+    """Balance of a wallet account from the journal, optionally as of a point in time
+
+    Reads the latest snapshot taken at or before ``as_of`` and adds only the
+    entries posted after it, so the cost does not grow with wallet history.
+    """
+    snapshots = BalanceSnapshot.objects.filter(wallet=wallet, account=account)
+    entries = LedgerEntry.objects.filter(wallet=wallet, account=account)
+    if as_of is not None:
+        snapshots = snapshots.filter(as_of__lte=as_of)
+        entries = entries.filter(created_at__lte=as_of)
+
+    snapshot = snapshots.order_by('-as_of', '-last_entry_id').first()
+    if snapshot is not None:
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+    tail = entries.aggregate(total=Coalesce(Sum(SIGNED_AMOUNT), Value(Decimal('0.00'))))['total']
+    return (snapshot.balance if snapshot else Decimal('0.00')) + tail
+
+def take_snapshots(wallet_ids, min_entries=1):
+    """Snapshot wallet accounts that gained at least ``min_entries`` entries since their last snapshot
+
+    Only the entries after each account's previous snapshot are read, in one
+    grouped query for the whole batch of wallets.
+
+    Entry ids are assigned before commit, so an entry with a lower id could
+    still commit after a snapshot taken past it and be skipped for good. Every
+    posting updates its wallet row before writing entries, so holding the
+    wallet row locks while reading means no entry of these wallets is in
+    flight.
+    """
+    with transaction.atomic():
+        list(Wallet.objects.select_for_update().filter(pk__in=wallet_ids).order_by('pk').values_list('pk'))
+        return _take_snapshots(wallet_ids, min_entries)
+
+def _take_snapshots(wallet_ids, min_entries):
+    latest = {}
+    for snapshot in BalanceSnapshot.objects.filter(wallet_id__in=wallet_ids).order_by('last_entry_id'):
+        latest[(snapshot.wallet_id, snapshot.account)] = snapshot
+
+    # Entries after the newest snapshot of their own account; all accounts in one pass
+    snapshotted_up_to = BalanceSnapshot.objects.filter(
+        wallet_id=OuterRef('wallet_id'), account=OuterRef('account'),
+    ).order_by('-last_entry_id').values('last_entry_id')[:1]
+
+    tails = LedgerEntry.objects.filter(
+        wallet_id__in=wallet_ids,
+        account__in=WALLET_ACCOUNTS,
+        id__gt=Coalesce(Subquery(snapshotted_up_to), Value(0)),
+    ).values('wallet_id', 'account').annotate(
+        count=Count('id'),
+        total=Sum(SIGNED_AMOUNT),
+        last_entry_id=Max('id'),
+        as_of=Max('created_at'),
+    ).order_by()
+
+    snapshots = []
+    for tail in tails:
+        if tail['count'] < min_entries:
+            continue
+        previous = latest.get((tail['wallet_id'], tail['account']))
+        snapshots.append(BalanceSnapshot(
+            wallet_id=tail['wallet_id'],
+            account=tail['account'],
+            balance=(previous.balance if previous else Decimal('0.00')) + tail['total'],
+            last_entry_id=tail['last_entry_id'],
+            as_of=tail['as_of'],
+        ))
+    BalanceSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+def withdraw(user, amount, description, idempotency_key=None, **transaction_fields):
+    """Debit a wallet and record the withdrawal, without any lost update
+
+    The balance check and the decrement are one conditional UPDATE
+    (``balance >= amount``), so concurrent withdrawals serialize on the wallet
+    row inside the database and can never overdraw it. Retrying with the same
+    idempotency key returns the original transaction instead of debiting twice.
+    """
+    amount = Decimal(amount)
+    # Keys are only unique per client, so namespace them by user like add_funds does
+    reference = make_reference(f'withdrawal_{user.pk}', idempotency_key) if idempotency_key else make_reference('withdrawal')
+    wallet, _ = Wallet.objects.get_or_create(user=user)
+
+    existing = _existing(reference, wallet)
+    if existing is not None:
+        return existing, False
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            debited = Wallet.objects.filter(
+                pk=wallet.pk, is_frozen=False, balance__gte=amount
+            ).update(
+                balance=F('balance') - amount,
+                total_withdrawn=F('total_withdrawn') + amount,
+                updated_at=now,
+            )
+            if not debited:
+                wallet.refresh_from_db(fields=['is_frozen'])
+                if wallet.is_frozen:
+                    raise WalletFrozen('Wallet is frozen')
+                raise InsufficientFunds('Insufficient funds')
+
+            txn = Transaction.objects.create(
+                wallet=wallet,
+                transaction_type='debit',
+                category='withdrawal',
+                amount=amount,
+                description=description,
+                reference=reference,
+                status='completed',
+                processed_at=now,
+                **transaction_fields
+            )
+            post(amount, debit=(wallet, 'available'), credit=(None, 'external'), txn=txn, memo=description)
+    except IntegrityError:
+        # A concurrent retry with the same key won the race; ours was rolled back
+        existing = _existing(reference, wallet)
+        if existing is None:
+            raise
+        return existing, False
+
+    return txn, True
+
+def create_pending_credit(user, amount, description, reference, **transaction_fields):
+    """Record a credit that settles later (e.g. a Stripe payment intent)
+
+    The amount is added to ``pending_balance`` in the same transaction.
+    Idempotent on ``reference``.
+    """
+    amount = Decimal(amount)
+    wallet, _ = Wallet.objects.get_or_create(user=user)
+    existing = _existing(reference, wallet)
+    if existing is not None:
+        return existing, False
+    try:
+        with transaction.atomic():
+            Wallet.objects.filter(pk=wallet.pk).update(
+                pending_balance=F('pending_balance') + amount,
+                updated_at=timezone.now(),
+            )
+            txn = Transaction.objects.create(
+                wallet=wallet,
+                transaction_type='credit',
+                category='deposit',
+                amount=amount,
+                description=description,
+                reference=reference,
+                status='pending',
+                **transaction_fields
+            )
+            post(amount, debit=(None, 'external'), credit=(wallet, 'pending'), txn=txn, memo=description)
+    except IntegrityError:
+        existing = _existing(reference, wallet)
+        if existing is None:
+            raise
+        return existing, False
+    return txn, True
+
+def _resolve_pending_credits(payment_intent_ids, status, account):
+    """Move pending credits for the given payment intents out of ``pending_balance``
+
+    Works on the whole batch at once: one locking SELECT, one UPDATE for all
+    touched wallets, one for the transactions and one INSERT for the journal.
+    Transactions that are no longer pending are skipped, so replays are safe.
+    Returns the payment intent ids that were resolved.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        credits = list(
+            Transaction.objects.select_for_update().select_related('wallet').filter(
+                stripe_payment_intent_id__in=payment_intent_ids,
+                transaction_type='credit',
+                status='pending',
+            )
+        )
+        if not credits:
+            return set()
+
+        totals = defaultdict(Decimal)
+        for credit in credits:
+            totals[credit.wallet_id] += credit.amount
+
+        def per_wallet(totals):
+            return Case(
+                *[When(pk=wallet_id, then=Value(total)) for wallet_id, total in totals.items()],
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+
+        changes = {'pending_balance': F('pending_balance') - per_wallet(totals), 'updated_at': now}
+        if account == 'available':
+            changes['balance'] = F('balance') + per_wallet(totals)
+        Wallet.objects.filter(pk__in=totals).update(**changes)
+
+        Transaction.objects.filter(pk__in=[credit.pk for credit in credits]).update(
+            status=status, processed_at=now
+        )
+        LedgerEntry.objects.bulk_create([
+            entry
+            for credit in credits
+            for entry in _pair(
+                credit.amount,
+                debit=(credit.wallet, 'pending'),
+                credit=(credit.wallet if account == 'available' else None, account),
+                txn=credit,
+                memo=credit.description,
+                now=now,
+            )
+        ])
+    return {credit.stripe_payment_intent_id for credit in credits}
+
+def settle_pending_credits(payment_intent_ids):
+    """Make succeeded payments spendable: pending -> available"""
+    return _resolve_pending_credits(payment_intent_ids, 'completed', 'available')
+
+def fail_pending_credits(payment_intent_ids):
+    """Release cancelled payments: pending -> external"""
+    return _resolve_pending_credits(payment_intent_ids, 'failed', 'external')
+
+def note_failed_attempts(payment_intent_ids):
+    """Record a failed charge attempt on pending credits without resolving them
+
+    A failed attempt is not final: the customer can retry and the same
+    payment intent can still succeed, so the credit stays pending. Returns
+    the payment intent ids that were noted.
+    """
+    now = timezone.now().isoformat()
+    credits = list(Transaction.objects.filter(
+        stripe_payment_intent_id__in=payment_intent_ids,
+        transaction_type='credit',
+        status='pending',
+    ))
+    for credit in credits:
+        credit.metadata = {
+            **credit.metadata,
+            'failed_attempts': credit.metadata.get('failed_attempts', 0) + 1,
+            'last_failed_at': now,
+        }
+    Transaction.objects.bulk_update(credits, ['metadata'])
+    return {credit.stripe_payment_intent_id for credit in credits}
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from decimal import Decimal
 
 User = get_user_model()
@@ -79,6 +80,10 @@ class Transaction(models.Model):
             models.Index(fields=['wallet', 'status']),
             models.Index(fields=['reference']),
             models.Index(fields=['created_at']),
+            # Incremental analytics rollups (see analytics.rollups)
+            models.Index(fields=['processed_at']),
+            # Webhook settlement locks pending credits by payment intent
+            models.Index(fields=['stripe_payment_intent_id']),
         ]
     
     def __str__(self):
@@ -140,3 +145,100 @@ class WalletLimit(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.limit_type}: ${self.amount}"
+
+class LedgerEntry(models.Model):
+    """One line of the append-only double-entry journal
+
+    Every balance movement posts a debit and a credit of the same amount.
+    Wallet accounts ('available', 'pending') hold what the platform owes the
+    user, so their balance is credits minus debits. 'external' is the outside
+    world (card networks, banks) and carries no wallet.
+    """
+    ACCOUNTS = (
+        ('available', 'Available'),
+        ('pending', 'Pending'),
+        ('external', 'External'),
+    )
+    
+    DIRECTIONS = (
+        ('debit', 'Debit'),
+        ('credit', 'Credit'),
+    )
+    
+    # PROTECT: deleting a wallet or transaction must not take one leg of a posting with it
+    transaction = models.ForeignKey(Transaction, on_delete=models.PROTECT, null=True, blank=True, related_name='entries')
+    wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, null=True, blank=True, related_name='entries')
+    account = models.CharField(max_length=10, choices=ACCOUNTS)
+    direction = models.CharField(max_length=6, choices=DIRECTIONS)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    memo = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'Ledger Entries'
+        indexes = [
+            # Snapshot tails: entries after a snapshot's last_entry_id
+            models.Index(fields=['wallet', 'account', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.direction.title()} {self.account} ${self.amount}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Ledger entries are append-only')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('Ledger entries are append-only')
+
+class BalanceSnapshot(models.Model):
+    """Balance of one wallet account up to and including ``last_entry_id``"""
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='snapshots')
+    account = models.CharField(max_length=10, choices=LedgerEntry.ACCOUNTS)
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    last_entry_id = models.BigIntegerField()
+    as_of = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-as_of']
+        indexes = [
+            models.Index(fields=['wallet', 'account', 'as_of']),
+        ]
+    
+    def __str__(self):
+        return f"{self.wallet} {self.account} ${self.balance} @ {self.as_of}"
+
+class StripeEvent(models.Model):
+    """Inbox of received Stripe webhook events
+
+    The webhook only verifies and stores events; the ``process_stripe_events``
+    worker applies them. The unique event id makes Stripe's redeliveries no-ops.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    )
+    
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
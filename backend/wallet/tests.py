@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import ProtectedError
+from django.test import TestCase
+
+from .ledger import account_balance, create_pending_credit, open_balances, take_snapshots, withdraw
+from .models import StripeEvent, Wallet
+from .webhooks import process_events
+
+User = get_user_model()
+
+class StripeEventProcessingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123')
+        self.credit, _ = create_pending_credit(
+            self.user, '25.00', 'Add funds via Stripe', 'stripe_pi_1', stripe_payment_intent_id='pi_1'
+        )
+    
+    def receive(self, event_type, created, intent_id='pi_1'):
+        StripeEvent.objects.create(
+            event_id=f'evt_{event_type}_{created}',
+            event_type=event_type,
+            payload={'type': event_type, 'created': created, 'data': {'object': {'id': intent_id}}},
+        )
+    
+    def assert_credit(self, status, balance, pending_balance):
+        self.credit.refresh_from_db()
+        wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual(self.credit.status, status)
+        self.assertEqual(wallet.balance, Decimal(balance))
+        self.assertEqual(wallet.pending_balance, Decimal(pending_balance))
+    
+    def test_payment_failed_then_succeeded_credits_the_wallet(self):
+        self.receive('payment_intent.payment_failed', 100)
+        process_events()
+        self.assert_credit('pending', '0.00', '25.00')
+        self.assertEqual(self.credit.metadata['failed_attempts'], 1)
+        
+        self.receive('payment_intent.succeeded', 200)
+        process_events()
+        self.assert_credit('completed', '25.00', '0.00')
+        self.assertEqual(set(StripeEvent.objects.values_list('status', flat=True)), {'processed'})
+    
+    def test_batch_is_applied_in_created_order(self):
+        # Delivered out of order: the cancel was created first, so it wins
+        self.receive('payment_intent.succeeded', 200)
+        self.receive('payment_intent.canceled', 100)
+        process_events()
+        self.assert_credit('failed', '0.00', '0.00')
+        self.assertEqual(
+            dict(StripeEvent.objects.values_list('event_type', 'status')),
+            {'payment_intent.canceled': 'processed', 'payment_intent.succeeded': 'ignored'},
+        )
+    
+    def test_event_before_its_transaction_is_retried(self):
+        # The webhook beat add_funds: no transaction for this intent yet
+        self.receive('payment_intent.succeeded', 100, intent_id='pi_2')
+        process_events()
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertEqual(event.error, 'No matching transaction')
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='password123')
+        self.wallet = Wallet.objects.create(user=self.user, balance=Decimal('100.00'))
+    
+    def test_open_balances_after_earlier_postings(self):
+        withdraw(self.user, '30.00', 'Withdrawal')
+        self.wallet.refresh_from_db()
+        
+        self.assertTrue(open_balances(self.wallet))
+        self.assertEqual(account_balance(self.wallet), Decimal('70.00'))
+        self.assertFalse(open_balances(self.wallet))
+    
+    def test_snapshot_plus_tail_matches_the_journal(self):
+        open_balances(self.wallet)
+        withdraw(self.user, '10.00', 'Withdrawal')
+        self.assertEqual(take_snapshots([self.wallet.pk]), 1)
+        withdraw(self.user, '5.00', 'Withdrawal')
+        
+        self.assertEqual(account_balance(self.wallet), Decimal('85.00'))
+        self.assertEqual(take_snapshots([self.wallet.pk]), 1)
+        self.assertEqual(account_balance(self.wallet), Decimal('85.00'))
+    
+    def test_journal_survives_user_deletion_attempts(self):
+        open_balances(self.wallet)
+        with self.assertRaises(ProtectedError):
+            self.user.delete()
@@ -2,14 +2,27 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 import stripe
 from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.utils.dateparse import parse_datetime
+from .ledger import (
+    InsufficientFunds, LedgerError, WalletFrozen,
+    account_balance, create_pending_credit, make_reference, withdraw,
+)
 from .models import Wallet, Transaction, PaymentMethod
 from .serializers import WalletSerializer, TransactionSerializer, PaymentMethodSerializer
+from .webhooks import InvalidEvent, receive_event
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+# Largest amount Stripe accepts for a USD charge, well inside Transaction.amount
+MAX_AMOUNT = Decimal('999999.99')
+
 class WalletViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = WalletSerializer
@@ -20,34 +33,61 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def balance(self, request):
         wallet, created = Wallet.objects.get_or_create(user=request.user)
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            # Historical balance from the ledger: latest snapshot plus the entries after it
+            as_of = parse_datetime(as_of)
+            if as_of is None:
+                return Response({'error': 'Invalid as_of timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(as_of):
+                as_of = timezone.make_aware(as_of)
+            return Response({
+                'as_of': as_of,
+                'balance': account_balance(wallet, 'available', as_of),
+                'pending_balance': account_balance(wallet, 'pending', as_of),
+            })
         serializer = self.get_serializer(wallet)
         return Response(serializer.data)
     
+    def get_amount(self, request):
+        try:
+            amount = Decimal(str(request.data.get('amount', 0)))
+            if not amount.is_finite() or not 0 < amount <= MAX_AMOUNT:
+                return None
+            amount = amount.quantize(Decimal('0.01'))
+        except InvalidOperation:
+            return None
+        return amount if amount > 0 else None
+    
+    def get_idempotency_key(self, request):
+        # Retries with the same key never create a second transaction
+        return request.headers.get('Idempotency-Key') or request.data.get('idempotency_key')
+    
     @action(detail=False, methods=['post'])
     def add_funds(self, request):
-        amount = Decimal(str(request.data.get('amount', 0)))
+        amount = self.get_amount(request)
         
-        if amount <= 0:
+        if amount is None:
             return Response({'error': 'Invalid amount'}, status=status.HTTP_400_BAD_REQUEST)
         
+        idempotency_key = self.get_idempotency_key(request)
+        
         try:
             # Create Stripe payment intent
             intent = stripe.PaymentIntent.create(
                 amount=int(amount * 100),  # Convert to cents
                 currency='usd',
-                metadata={'user_id': request.user.id}
+                metadata={'user_id': request.user.id},
+                idempotency_key=make_reference(f'add_funds_{request.user.id}', idempotency_key) if idempotency_key else None,
             )
             
             # Create pending transaction
-            wallet, created = Wallet.objects.get_or_create(user=request.user)
-            transaction = Transaction.objects.create(
-                wallet=wallet,
-                transaction_type='credit',
-                amount=amount,
-                description=f'Add funds via Stripe',
+            transaction, created = create_pending_credit(
+                request.user,
+                amount,
+                description='Add funds via Stripe',
                 reference=f'stripe_{intent.id}',
                 stripe_payment_intent_id=intent.id,
-                status='pending'
             )
             
             return Response({
@@ -57,54 +97,55 @@ class WalletViewSet(viewsets.ReadOnlyModelViewSet):
             
         except stripe.error.StripeError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except LedgerError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
     
     @action(detail=False, methods=['post'])
     def withdraw_funds(self, request):
-        amount = Decimal(str(request.data.get('amount', 0)))
+        amount = self.get_amount(request)
         payment_method_id = request.data.get('payment_method_id')
         
-        wallet, created = Wallet.objects.get_or_create(user=request.user)
-        
-        if amount > wallet.balance:
-            return Response({'error': 'Insufficient funds'}, status=status.HTTP_400_BAD_REQUEST)
+        if amount is None:
+            return Response({'error': 'Invalid amount'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
             payment_method = PaymentMethod.objects.get(
                 id=payment_method_id, 
                 user=request.user
             )
-            
-            # Create withdrawal transaction
-            transaction = Transaction.objects.create(
-                wallet=wallet,
-                transaction_type='debit',
-                amount=amount,
-                description=f'Withdrawal to {payment_method.method_type}',
-                reference=f'withdrawal_{transaction.id}',
-                status='pending'
-            )
-            
-            # Process withdrawal (implement actual payment processing)
-            # For now, we'll mark as completed
-            transaction.status = 'completed'
-            transaction.save()
-            
-            # Update wallet balance
-            wallet.balance -= amount
-            wallet.total_withdrawn += amount
-            wallet.save()
-            
-            return Response({'message': 'Withdrawal processed successfully'})
-            
         except PaymentMethod.DoesNotExist:
             return Response({'error': 'Payment method not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Process withdrawal (implement actual payment processing)
+        # For now, the debit is recorded as completed
+        try:
+            transaction, created = withdraw(
+                request.user,
+                amount,
+                description=f'Withdrawal to {payment_method.method_type}',
+                idempotency_key=self.get_idempotency_key(request),
+            )
+        except InsufficientFunds:
+            return Response({'error': 'Insufficient funds'}, status=status.HTTP_400_BAD_REQUEST)
+        except WalletFrozen:
+            return Response({'error': 'Wallet is frozen'}, status=status.HTTP_403_FORBIDDEN)
+        except LedgerError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'message': 'Withdrawal processed successfully',
+            'transaction_id': transaction.id,
+        })
 
 class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = TransactionSerializer
     
+    # Checked by monitoring.tests (with a cold cache, so including the authentication query)
+    query_budgets = {'list': 3, 'retrieve': 2}
+    
     def get_queryset(self):
-        return Transaction.objects.filter(wallet__user=self.request.user)
+        return Transaction.objects.filter(wallet__user=self.request.user).select_related('wallet__user')
 
 class PaymentMethodViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -115,3 +156,18 @@ class PaymentMethodViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """Store a verified Stripe event and acknowledge it
+
+    Plain Django view to keep the hot path short; settlement happens in the
+    ``process_stripe_events`` worker.
+    """
+    try:
+        receive_event(request.body, request.headers.get('Stripe-Signature', ''))
+    except InvalidEvent:
+        return HttpResponse(status=400)
+    return HttpResponse(status=200)
@@ -0,0 +1,148 @@
+import json
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .ledger import fail_pending_credits, note_failed_attempts, settle_pending_credits
+from .models import StripeEvent, Transaction
+
+SIGNATURE_TOLERANCE = 300
+MAX_ATTEMPTS = 10
+RETRY_DELAY = timedelta(seconds=30)
+
+# Event type -> function applying it to pending credits by payment intent id.
+# Only success and cancellation are final; a failed attempt can still be
+# followed by payment_intent.succeeded, so the credit stays pending.
+HANDLERS = {
+    'payment_intent.succeeded': settle_pending_credits,
+    'payment_intent.payment_failed': note_failed_attempts,
+    'payment_intent.canceled': fail_pending_credits,
+}
+
+class InvalidEvent(Exception):
+    pass
+
+def receive_event(payload, signature):
+    """Verify a webhook delivery and store it in the inbox
+
+    This is all the webhook request does: one HMAC check, one JSON parse and
+    one INSERT that silently skips redelivered events. Returns the event id.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise InvalidEvent('STRIPE_WEBHOOK_SECRET is not configured')
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode('utf-8'), signature, settings.STRIPE_WEBHOOK_SECRET, SIGNATURE_TOLERANCE
+        )
+        event = json.loads(payload)
+        event_id, event_type = event['id'], event['type']
+    except (stripe.error.SignatureVerificationError, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise InvalidEvent(str(e)) from e
+
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event_id, event_type=event_type, payload=event)],
+        ignore_conflicts=True,
+    )
+    return event_id
+
+def _payment_intent_id(event):
+    return event.payload.get('data', {}).get('object', {}).get('id')
+
+def _runs(events):
+    """Split events, in the order Stripe created them, into runs of one type"""
+    runs = []
+    for event in sorted(events, key=lambda event: (event.payload.get('created') or 0, event.pk)):
+        if runs and runs[-1][0] == event.event_type:
+            runs[-1][1].append(event)
+        else:
+            runs.append((event.event_type, [event]))
+    return runs
+
+def _settle(handler, events):
+    """Run one handler over ``events``; returns the (processed, ignored, retry) events"""
+    intent_ids = {_payment_intent_id(event) for event in events} - {None}
+    resolved = handler(intent_ids)
+    known = set(Transaction.objects.filter(
+        stripe_payment_intent_id__in=intent_ids - resolved
+    ).values_list('stripe_payment_intent_id', flat=True))
+    processed, ignored, retry = [], [], []
+    for event in events:
+        intent_id = _payment_intent_id(event)
+        if intent_id in resolved:
+            processed.append(event)
+        elif intent_id in known or intent_id is None:
+            # Already settled by an earlier delivery, or nothing to settle
+            ignored.append(event)
+        else:
+            retry.append(event)
+    return processed, ignored, retry
+
+def process_events(batch_size=500):
+    """Apply one batch of pending inbox events and return how many were claimed
+
+    Events are claimed with ``SKIP LOCKED`` where the database supports it, so
+    several workers can drain the inbox side by side. Events are applied in
+    the order Stripe created them, so a cancel and a success in one batch
+    resolve as they would one at a time; each run of consecutive events of
+    one type is settled with one batched ledger call in its own savepoint. If
+    that call fails, its events are retried one at a time so a bad event
+    only holds up itself. Events that fail, or whose transaction does not exist yet (the
+    webhook beat ``add_funds``), are retried with a growing delay and marked
+    failed after MAX_ATTEMPTS.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = StripeEvent.objects.filter(status='pending', next_attempt_at__lte=now).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        events = list(queryset[:batch_size])
+        if not events:
+            return 0
+
+        for event in events:
+            event.error = ''
+
+        processed, ignored, retry = [], [], []
+        for event_type, typed_events in _runs(events):
+            handler = HANDLERS.get(event_type)
+            if handler is None:
+                ignored += typed_events
+                continue
+
+            try:
+                with transaction.atomic():
+                    outcome = _settle(handler, typed_events)
+            except Exception:
+                outcome = ([], [], [])
+                for event in typed_events:
+                    try:
+                        with transaction.atomic():
+                            single = _settle(handler, [event])
+                    except Exception as e:
+                        event.error = f'{type(e).__name__}: {e}'[:5000]
+                        single = ([], [], [event])
+                    for settled, events_out in zip(outcome, single):
+                        settled += events_out
+            processed += outcome[0]
+            ignored += outcome[1]
+            retry += outcome[2]
+
+        StripeEvent.objects.filter(pk__in=[e.pk for e in processed]).update(
+            status='processed', attempts=F('attempts') + 1, error='', processed_at=now
+        )
+        StripeEvent.objects.filter(pk__in=[e.pk for e in ignored]).update(
+            status='ignored', attempts=F('attempts') + 1, error='', processed_at=now
+        )
+        for event in retry:
+            event.attempts += 1
+            event.next_attempt_at = now + RETRY_DELAY * event.attempts
+            event.error = event.error or 'No matching transaction'
+            if event.attempts >= MAX_ATTEMPTS:
+                event.status = 'failed'
+                event.processed_at = now
+        StripeEvent.objects.bulk_update(retry, ['attempts', 'next_attempt_at', 'error', 'status', 'processed_at'])
+    return len(events)
@@ -13,6 +13,7 @@ import { ScrollArea } from "@/components/ui/scroll-area"
 import { Send, Paperclip, Phone, Video, MoreVertical, Search } from "lucide-react"
 import { chatService, type ChatConversation, type ChatMessage } from "@/lib/chat"
 import { formatDistanceToNow } from "@/lib/time"
+import { mediaUrl } from "@/lib/api"
 
 export function RealTimeChat() {
   const [conversations, setConversations] = useState<ChatConversation[]>([])
@@ -108,7 +109,7 @@ export function RealTimeChat() {
                 >
                   <div className="relative">
                     <Avatar>
-                      <AvatarImage src={otherParticipant?.avatar || "/placeholder.svg"} />
+                      <AvatarImage src={mediaUrl(otherParticipant?.avatar) || "/placeholder.svg"} />
                       <AvatarFallback>
                         {otherParticipant?.name
                           .split(" ")
@@ -152,7 +153,7 @@ export function RealTimeChat() {
             <CardHeader className="flex flex-row items-center space-y-0 pb-4">
               <div className="flex items-center space-x-3 flex-1">
                 <Avatar>
-                  <AvatarImage src={getOtherParticipant(selectedConversation)?.avatar || "/placeholder.svg"} />
+                  <AvatarImage src={mediaUrl(getOtherParticipant(selectedConversation)?.avatar) || "/placeholder.svg"} />
                   <AvatarFallback>
                     {getOtherParticipant(selectedConversation)
                       ?.name.split(" ")
@@ -154,8 +154,14 @@ class ApiClient {
     return this.request("/conversations/")
   }
 
-  async getMessages(conversationId: number) {
-    return this.request(`/conversations/${conversationId}/messages/`)
+  // Paginated: { next, previous, results }, results oldest first. Without a
+  // cursor this is the newest page; pass `before` (from `previous`) for older
+  // history or `after` (from `next`) for newer messages, never both.
+  async getMessages(conversationId: number, params?: { before?: string; after?: string; page_size?: number }) {
+    const queryString = params ? `?${new URLSearchParams(params as Record<string, any>).toString()}` : ""
+    return this.request<{ next: string | null; previous: string | null; results: any[] }>(
+      `/conversations/${conversationId}/messages/${queryString}`,
+    )
   }
 
   async sendMessage(conversationId: number, content: string, messageType = "text") {
@@ -174,6 +180,17 @@ class ApiClient {
     })
   }
 
+  // Search
+  // Results of every type, best first. `highlight` is escaped HTML whose only
+  // tags are <mark> around the matched terms.
+  async search(q: string, types?: string[]) {
+    const params = new URLSearchParams({ q })
+    types?.forEach((type) => params.append("type", type))
+    return this.request<{ query: string; counts: Record<string, number>; results: any[] }>(
+      `/search/?${params.toString()}`,
+    )
+  }
+
   // Wallet
   async getWalletBalance() {
     return this.request("/wallet/balance/")
@@ -213,5 +230,13 @@ class ApiClient {
   }
 }
 
+// Media URLs from the API are signed, so <img> and <video> can load them
+// without an Authorization header. Relative ones (/api/media/...) are served
+// by the API host, not this app; anything else is returned unchanged.
+export function mediaUrl(url?: string | null): string | undefined {
+  if (!url) return undefined
+  return url.startsWith("/api/") ? new URL(url, API_BASE_URL).toString() : url
+}
+
 export const apiClient = new ApiClient(API_BASE_URL)
 export default apiClient
@@ -23,6 +23,10 @@ python manage.py makemigrations messages
 python manage.py makemigrations wallet
 python manage.py makemigrations notifications
 python manage.py makemigrations video_requests
+python manage.py makemigrations dashboard
+python manage.py makemigrations analytics
+python manage.py makemigrations search
+python manage.py makemigrations files
 
 # Apply migrations
 python manage.py migrate